@@ -0,0 +1,131 @@
+"""
+Processamento de uploads em lote (vários arquivos ou um ZIP de extratos).
+Cada arquivo é parseado em paralelo num pool de processos com o ProcessadorExtratos;
+o resultado de cada arquivo é independente (um PDF inválido não derruba o lote).
+"""
+
+import io
+import os
+import threading
+import zipfile
+from concurrent.futures import BrokenExecutor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Optional
+
+from processor import ProcessadorExtratos
+from learned_categories import obter_indice_categorias
+
+UPLOAD_WORKERS = int(os.environ.get("UPLOAD_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Limites para ZIPs (protege contra zip bombs)
+MAX_ARQUIVOS_LOTE = 100
+MAX_BYTES_DESCOMPACTADOS = 200 * 1024 * 1024
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _obter_pool():
+    """Pool de processos compartilhado; cai para threads onde multiprocessing não está disponível"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = ProcessPoolExecutor(max_workers=UPLOAD_WORKERS)
+            except (OSError, NotImplementedError) as e:
+                print(f"Aviso: pool de processos indisponível, usando threads ({e})")
+                _pool = ThreadPoolExecutor(max_workers=UPLOAD_WORKERS)
+        return _pool
+
+
+def encerrar_pool():
+    """Encerra o pool do lote (fim do processo); o próximo lote cria outro"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+def expandir_arquivos(arquivos: list[tuple[str, bytes]]) -> list[tuple[str, bytes]]:
+    """Substitui cada .zip pelos PDFs/CSVs que ele contém (nome "arquivo.zip/extrato.pdf")"""
+    expandidos = []
+    for nome, conteudo in arquivos:
+        if not nome.lower().endswith(".zip"):
+            expandidos.append((nome, conteudo))
+            continue
+
+        try:
+            with zipfile.ZipFile(io.BytesIO(conteudo)) as zf:
+                membros = [
+                    m for m in zf.infolist()
+                    if not m.is_dir()
+                    and not os.path.basename(m.filename).startswith(".")
+                    and not m.filename.startswith("__MACOSX/")
+                    and ProcessadorExtratos.tipo_arquivo(m.filename)
+                ]
+                if sum(m.file_size for m in membros) > MAX_BYTES_DESCOMPACTADOS:
+                    raise ValueError("ZIP muito grande depois de descompactado")
+                for membro in membros:
+                    expandidos.append((f"{nome}/{membro.filename}", zf.read(membro)))
+        except zipfile.BadZipFile:
+            # Vira um erro do próprio arquivo no resultado do lote
+            expandidos.append((nome, conteudo))
+
+    if len(expandidos) > MAX_ARQUIVOS_LOTE:
+        raise ValueError(f"Lote com {len(expandidos)} arquivos (máximo {MAX_ARQUIVOS_LOTE})")
+    return expandidos
+
+
+def _processar_arquivo(nome: str, conteudo: bytes, categorias_usuario: Optional[list]) -> dict:
+    """Tarefa do worker: parseia um arquivo e devolve o resultado (nunca levanta exceção)"""
+    try:
+        if nome.lower().endswith(".zip"):
+            raise ValueError("ZIP inválido ou corrompido")
+        # Dentro do worker a extração de cada PDF é serial (o paralelismo é entre arquivos)
+        processador = ProcessadorExtratos(categorias_usuario, workers_pdf=1)
+        # Categorias aprendidas são aplicadas no processo principal (o índice é por processo)
+        transacoes = processador.processar_arquivo(nome, conteudo, aprendidas=False)
+        return {"arquivo": nome, "status": "ok", "transacoes": transacoes, "erro": None}
+    except Exception as e:
+        return {"arquivo": nome, "status": "erro", "transacoes": [], "erro": str(e)}
+
+
+def processar_lote(arquivos: list[tuple[str, bytes]], categorias_usuario: Optional[list] = None) -> list[dict]:
+    """
+    Parseia os arquivos concorrentemente no pool.
+    Retorna um resultado por arquivo, na ordem de entrada (ZIPs já expandidos).
+    """
+    arquivos = expandir_arquivos(arquivos)
+    if len(arquivos) == 1:
+        resultados = [_processar_arquivo(arquivos[0][0], arquivos[0][1], categorias_usuario)]
+    else:
+        resultados = _processar_no_pool(arquivos, categorias_usuario)
+
+    indice = obter_indice_categorias()
+    for resultado in resultados:
+        indice.aplicar(resultado["transacoes"])
+    return resultados
+
+
+def _processar_no_pool(arquivos: list[tuple[str, bytes]], categorias_usuario: Optional[list]) -> list[dict]:
+    pool = _obter_pool()
+    futuros = [pool.submit(_processar_arquivo, nome, conteudo, categorias_usuario) for nome, conteudo in arquivos]
+
+    resultados = []
+    for (nome, _), futuro in zip(arquivos, futuros):
+        try:
+            resultados.append(futuro.result())
+        except Exception as e:
+            # Worker morreu (ex: falta de memória) durante este arquivo
+            resultados.append({"arquivo": nome, "status": "erro", "transacoes": [], "erro": str(e)})
+            if isinstance(e, BrokenExecutor):
+                _descartar_pool(pool)
+    return resultados
+
+
+def _descartar_pool(pool):
+    """Um pool quebrado não aceita mais tarefas: o próximo lote cria outro"""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
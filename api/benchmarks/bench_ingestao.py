@@ -0,0 +1,184 @@
+"""
+Benchmark da ingestão de extratos, etapa por etapa, com extratos sintéticos
+(Neon, genérico e fatura de cartão) de 1 mil a 1 milhão de linhas.
+
+Mede separadamente extrair_texto_pdf, parsear_transacoes_pdf, processar_csv e
+categorizar_transacao: tempo, linhas/s e pico de memória (tracemalloc, numa
+segunda execução para não distorcer o tempo). Cada execução é anexada a um
+arquivo JSONL com o commit atual; --comparar mostra a variação contra a última
+execução de outro commit.
+
+Uso:
+    python api/benchmarks/bench_ingestao.py [--tamanhos 1000,10000,100000,1000000]
+        [--etapas pdf,parse,csv,categorizar] [--formatos neon,generica,fatura]
+        [--max-linhas-pdf 10000] [--sem-memoria] [--saida arquivo.jsonl] [--comparar]
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from processor import ProcessadorExtratos
+from synthetic import gerar_csv, gerar_linhas, gerar_pdf, gerar_texto
+
+DIRETORIO = os.path.dirname(os.path.abspath(__file__))
+SAIDA_PADRAO = os.path.join(DIRETORIO, "resultados", "ingestao.jsonl")
+
+ETAPAS = ("pdf", "parse", "csv", "categorizar")
+LINHAS_POR_PAGINA = 45
+
+# Variação de tempo acima disso aparece como regressão no --comparar
+LIMIAR_REGRESSAO = 0.10
+
+
+def commit_atual() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=DIRETORIO,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "desconhecido"
+
+
+def medir(funcao, medir_memoria: bool) -> tuple[float, int | None]:
+    """Retorna (segundos, pico de memória em bytes ou None)"""
+    inicio = time.perf_counter()
+    funcao()
+    segundos = time.perf_counter() - inicio
+
+    pico = None
+    if medir_memoria:
+        tracemalloc.start()
+        try:
+            funcao()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return segundos, pico
+
+
+def casos(etapas, tamanhos, formatos, max_linhas_pdf):
+    """(etapa, formato, linhas, preparar) — preparar gera a entrada fora da medição"""
+    for tamanho in tamanhos:
+        for etapa in etapas:
+            if etapa == "csv":
+                yield etapa, "csv", tamanho, lambda t=tamanho: gerar_csv(t)
+            elif etapa == "categorizar":
+                yield etapa, "-", tamanho, lambda t=tamanho: [
+                    (linha.split(" ", 1)[1].rsplit(" ", 1)[0], -1.0) for linha in gerar_linhas(t)
+                ]
+            elif etapa == "pdf":
+                if tamanho > max_linhas_pdf:
+                    continue
+                yield etapa, "neon", tamanho, lambda t=tamanho: gerar_pdf(gerar_linhas(t, "neon"), LINHAS_POR_PAGINA)
+            else:
+                for formato in formatos:
+                    yield etapa, formato, tamanho, lambda t=tamanho, f=formato: gerar_texto(t, f)
+
+
+def executar(processador: ProcessadorExtratos, etapa: str, entrada):
+    if etapa == "pdf":
+        return lambda: processador.extrair_texto_pdf(entrada)
+    if etapa == "parse":
+        return lambda: processador.parsear_transacoes_pdf(entrada)
+    if etapa == "csv":
+        return lambda: processador.processar_csv(entrada)
+    return lambda: [processador.categorizar_transacao(d, v) for d, v in entrada]
+
+
+def ler_anteriores(caminho: str) -> list[dict]:
+    if not os.path.exists(caminho):
+        return []
+    with open(caminho, encoding="utf-8") as f:
+        return [json.loads(linha) for linha in f if linha.strip()]
+
+
+def comparar(execucao: dict, anteriores: list[dict]):
+    base = next((e for e in reversed(anteriores) if e["commit"] != execucao["commit"]), None)
+    if base is None:
+        print("\nNenhuma execução de outro commit para comparar.")
+        return
+
+    print(f"\nComparação com {base['commit']} ({base['data']}):")
+    tempos_base = {(r["etapa"], r["formato"], r["linhas"]): r["segundos"] for r in base["resultados"]}
+    regressoes = 0
+    for r in execucao["resultados"]:
+        anterior = tempos_base.get((r["etapa"], r["formato"], r["linhas"]))
+        if not anterior:
+            continue
+        variacao = r["segundos"] / anterior - 1
+        marca = ""
+        if variacao > LIMIAR_REGRESSAO:
+            marca = "  <-- regressão"
+            regressoes += 1
+        print(f"{r['etapa']:>12} {r['formato']:>9} {r['linhas']:>9} {anterior:>10.3f}s -> {r['segundos']:>8.3f}s {variacao:>+7.1%}{marca}")
+    print(f"{regressoes} regressões acima de {LIMIAR_REGRESSAO:.0%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", default="1000,10000,100000")
+    parser.add_argument("--etapas", default=",".join(ETAPAS))
+    parser.add_argument("--formatos", default="neon,generica,fatura", help="formatos de texto da etapa parse")
+    parser.add_argument("--max-linhas-pdf", type=int, default=10000,
+                        help="acima disso a etapa pdf é pulada (o pdfplumber faz ~200 linhas/s)")
+    parser.add_argument("--sem-memoria", action="store_true", help="não mede o pico de memória")
+    parser.add_argument("--saida", default=SAIDA_PADRAO)
+    parser.add_argument("--comparar", action="store_true", help="compara com a última execução de outro commit")
+    args = parser.parse_args()
+
+    etapas = [e for e in args.etapas.split(",") if e]
+    desconhecidas = set(etapas) - set(ETAPAS)
+    if desconhecidas:
+        parser.error(f"etapas desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    # Extração serial: o benchmark de paralelismo é o bench_pdf_parallel.py
+    processador = ProcessadorExtratos(workers_pdf=1)
+    execucao = {
+        "commit": commit_atual(),
+        "data": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "resultados": [],
+    }
+
+    print(f"{'etapa':>12} {'formato':>9} {'linhas':>9} {'tempo (s)':>10} {'linhas/s':>12} {'pico (MB)':>10}")
+    for etapa, formato, linhas, preparar in casos(
+        etapas, [int(t) for t in args.tamanhos.split(",")], args.formatos.split(","), args.max_linhas_pdf
+    ):
+        entrada = preparar()
+        segundos, pico = medir(executar(processador, etapa, entrada), not args.sem_memoria)
+        del entrada
+
+        resultado = {
+            "etapa": etapa, "formato": formato, "linhas": linhas,
+            "segundos": round(segundos, 4),
+            "linhas_por_segundo": round(linhas / segundos, 1),
+            "pico_memoria_bytes": pico,
+        }
+        execucao["resultados"].append(resultado)
+        pico_mb = f"{pico / 1024 / 1024:.1f}" if pico is not None else "-"
+        print(f"{etapa:>12} {formato:>9} {linhas:>9} {segundos:>10.3f} {resultado['linhas_por_segundo']:>12,.0f} {pico_mb:>10}")
+
+    anteriores = ler_anteriores(args.saida)
+    os.makedirs(os.path.dirname(os.path.abspath(args.saida)), exist_ok=True)
+    with open(args.saida, "a", encoding="utf-8") as f:
+        f.write(json.dumps(execucao, ensure_ascii=False) + "\n")
+    print(f"\nResultados anexados em {args.saida}")
+
+    if args.comparar:
+        comparar(execucao, anteriores)
+
+
+if __name__ == "__main__":
+    main()
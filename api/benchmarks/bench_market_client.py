@@ -0,0 +1,205 @@
+"""
+Benchmark dos clientes HTTP do market_service: cliente novo por chamada x cliente compartilhado.
+
+Sobe um servidor HTTPS local que imita a brapi (/v2/stocks/quote), com certificado
+autoassinado, atrás de um proxy TCP que atrasa cada pacote em rtt/2 (simula a distância
+até o upstream: o handshake TCP + TLS custa idas e voltas que o keep-alive economiza).
+Cada chamada passa por get_stock_quotes com o cache em memória limpo.
+
+O servidor local só fala HTTP/1.1; contra a brapi o ALPN negocia HTTP/2.
+
+Uso:
+    python api/benchmarks/bench_market_client.py [--requisicoes 50] [--rtt-ms 20]
+"""
+
+import argparse
+import asyncio
+import datetime
+import ipaddress
+import json
+import os
+import ssl
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import certifi
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+import market_service
+
+_COTACAO = json.dumps({"results": [{"symbol": "PETR4", "data": {"shortName": "PETROBRAS PN", "regularMarketPrice": 38.5}}]}).encode()
+
+
+class _Brapi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_COTACAO)))
+        self.end_headers()
+        self.wfile.write(_COTACAO)
+
+    def log_message(self, *args):
+        pass
+
+
+def gerar_certificado(diretorio: str) -> tuple[str, str, str]:
+    chave = ec.generate_private_key(ec.SECP256R1())
+    nome = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "localhost")])
+    agora = datetime.datetime.now(datetime.timezone.utc)
+    certificado = (
+        x509.CertificateBuilder()
+        .subject_name(nome).issuer_name(nome)
+        .public_key(chave.public_key())
+        .serial_number(x509.random_serial_number())
+        .not_valid_before(agora - datetime.timedelta(minutes=1))
+        .not_valid_after(agora + datetime.timedelta(days=1))
+        .add_extension(x509.SubjectAlternativeName([
+            x509.DNSName("localhost"), x509.IPAddress(ipaddress.ip_address("127.0.0.1")),
+        ]), critical=False)
+        .add_extension(x509.BasicConstraints(ca=True, path_length=None), critical=True)
+        .sign(chave, hashes.SHA256())
+    )
+    caminho_cert, caminho_chave = os.path.join(diretorio, "cert.pem"), os.path.join(diretorio, "chave.pem")
+    with open(caminho_cert, "wb") as f:
+        f.write(certificado.public_bytes(serialization.Encoding.PEM))
+    with open(caminho_chave, "wb") as f:
+        f.write(chave.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                    serialization.NoEncryption()))
+    # Bundle do certifi + o certificado local: o cliente carrega o mesmo volume de CAs que em produção
+    caminho_bundle = os.path.join(diretorio, "bundle.pem")
+    with open(caminho_bundle, "wb") as f, open(certifi.where(), "rb") as cas:
+        f.write(cas.read() + b"\n" + certificado.public_bytes(serialization.Encoding.PEM))
+    return caminho_cert, caminho_chave, caminho_bundle
+
+
+def iniciar_servidor(certificado: str, chave: str) -> ThreadingHTTPServer:
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), _Brapi)
+    contexto = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    contexto.load_cert_chain(certificado, chave)
+    servidor.socket = contexto.wrap_socket(servidor.socket, server_side=True)
+    threading.Thread(target=servidor.serve_forever, daemon=True).start()
+    return servidor
+
+
+async def _encaminhar(leitor: asyncio.StreamReader, escritor: asyncio.StreamWriter, atraso: float):
+    """Repassa os bytes de um lado para o outro, cada pedaço `atraso` segundos depois de lido"""
+    loop = asyncio.get_running_loop()
+    fila: asyncio.Queue = asyncio.Queue()
+
+    async def ler():
+        try:
+            while dados := await leitor.read(65536):
+                fila.put_nowait((loop.time() + atraso, dados))
+        except ConnectionError:
+            pass
+        fila.put_nowait((loop.time() + atraso, b""))
+
+    async def escrever():
+        while True:
+            quando, dados = await fila.get()
+            await asyncio.sleep(max(0.0, quando - loop.time()))
+            if not dados:
+                escritor.close()
+                return
+            escritor.write(dados)
+            await escritor.drain()
+
+    try:
+        await asyncio.gather(ler(), escrever())
+    except ConnectionError:
+        escritor.close()
+
+
+async def iniciar_proxy(porta_destino: int, rtt: float) -> asyncio.Server:
+    async def conexao(leitor_cliente, escritor_cliente):
+        # O connect() local é instantâneo: o RTT do handshake TCP entra como espera antes de repassar
+        await asyncio.sleep(rtt)
+        leitor_servidor, escritor_servidor = await asyncio.open_connection("127.0.0.1", porta_destino)
+        try:
+            await asyncio.gather(
+                _encaminhar(leitor_cliente, escritor_servidor, rtt / 2),
+                _encaminhar(leitor_servidor, escritor_cliente, rtt / 2),
+            )
+        except asyncio.CancelledError:
+            # Fim do benchmark com conexões keep-alive ainda abertas
+            escritor_cliente.close()
+            escritor_servidor.close()
+
+    return await asyncio.start_server(conexao, "127.0.0.1", 0)
+
+
+async def cotacao():
+    market_service._cache.clear()
+    resultado = await market_service.get_stock_quotes(["PETR4"])
+    if "error" in resultado:
+        raise RuntimeError(resultado["error"])
+
+
+def resumo(nome: str, tempos: list[float]):
+    tempos_ms = sorted(t * 1000 for t in tempos)
+    p95 = tempos_ms[min(len(tempos_ms) - 1, int(len(tempos_ms) * 0.95))]
+    print(f"{nome:>28} {statistics.mean(tempos_ms):>10.1f} {statistics.median(tempos_ms):>10.1f} {p95:>10.1f}")
+
+
+async def medir(requisicoes: int, rtt: float, porta_servidor: int):
+    proxy = await iniciar_proxy(porta_servidor, rtt)
+    porta = proxy.sockets[0].getsockname()[1]
+    market_service._UPSTREAMS["brapi"] = (f"https://127.0.0.1:{porta}/api", 15.0)
+
+    # Antes: cada chamada abria (e fechava) o próprio AsyncClient
+    novo = []
+    for _ in range(requisicoes):
+        inicio = time.perf_counter()
+        await cotacao()
+        await market_service.fechar_clientes_mercado()
+        novo.append(time.perf_counter() - inicio)
+
+    # Depois: cliente do processo aberto no startup, conexão reaproveitada
+    await market_service.iniciar_clientes_mercado()
+    await cotacao()  # primeira conexão do pool
+    versao = (await market_service._cliente("brapi").get("/v2/stocks/quote")).http_version
+    compartilhado = []
+    for _ in range(requisicoes):
+        inicio = time.perf_counter()
+        await cotacao()
+        compartilhado.append(time.perf_counter() - inicio)
+    await market_service.fechar_clientes_mercado()
+    proxy.close()
+
+    print(f"RTT simulado: {rtt * 1000:.0f} ms | protocolo negociado: {versao}")
+    print(f"{'ms por chamada':>28} {'média':>10} {'mediana':>10} {'p95':>10}")
+    resumo("cliente novo por chamada", novo)
+    resumo("cliente compartilhado", compartilhado)
+    print(f"Economia por chamada (mediana): {(statistics.median(novo) - statistics.median(compartilhado)) * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=50)
+    parser.add_argument("--rtt-ms", type=float, default=20.0, help="ida e volta simulada até o upstream")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        certificado, chave, bundle = gerar_certificado(diretorio)
+        os.environ["SSL_CERT_FILE"] = bundle
+        servidor = iniciar_servidor(certificado, chave)
+        try:
+            asyncio.run(medir(args.requisicoes, args.rtt_ms / 1000, servidor.server_address[1]))
+        finally:
+            servidor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
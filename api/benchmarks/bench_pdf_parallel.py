@@ -0,0 +1,61 @@
+"""
+Benchmark da extração de texto de PDF: serial x paralela (ProcessPoolExecutor), por número de páginas.
+
+Uso:
+    python api/benchmarks/bench_pdf_parallel.py [--paginas 10,50,200,500] [--workers 2,4]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from processor import PDF_PAGINAS_POR_TAREFA, ProcessadorExtratos
+from synthetic import gerar_linhas, gerar_pdf
+
+LINHAS_POR_PAGINA = 45
+
+
+def medir_extracao(processador: ProcessadorExtratos, pdf: bytes) -> tuple[float, int]:
+    inicio = time.perf_counter()
+    paginas = sum(1 for _ in processador.iterar_paginas_pdf(pdf))
+    return time.perf_counter() - inicio, paginas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paginas", default="10,50,200,500")
+    parser.add_argument("--workers", default="2,4")
+    args = parser.parse_args()
+
+    lista_workers = [int(w) for w in args.workers.split(",")]
+    serial = ProcessadorExtratos(workers_pdf=1)
+    paralelos = {w: ProcessadorExtratos(workers_pdf=w) for w in lista_workers}
+
+    # Aquece os pools (um por número de workers; criação dos processos não entra na medição):
+    # faixas suficientes para todos os processos de cada pool subirem
+    paginas_aquecimento = PDF_PAGINAS_POR_TAREFA * 2 * max(lista_workers)
+    aquecimento = gerar_pdf(gerar_linhas(LINHAS_POR_PAGINA * paginas_aquecimento), LINHAS_POR_PAGINA)
+    for processador in paralelos.values():
+        medir_extracao(processador, aquecimento)
+
+    cabecalho = f"{'páginas':>8} {'serial (s)':>11} {'pág/s':>8}"
+    for w in lista_workers:
+        cabecalho += f" {f'{w} workers (s)':>14} {'pág/s':>8} {'ganho':>6}"
+    print(cabecalho)
+
+    for total_paginas in (int(p) for p in args.paginas.split(",")):
+        pdf = gerar_pdf(gerar_linhas(total_paginas * LINHAS_POR_PAGINA, "neon"), LINHAS_POR_PAGINA)
+        t_serial, paginas = medir_extracao(serial, pdf)
+        linha = f"{paginas:>8} {t_serial:>11.2f} {paginas / t_serial:>8.1f}"
+        for w in lista_workers:
+            t_paralelo, _ = medir_extracao(paralelos[w], pdf)
+            linha += f" {t_paralelo:>14.2f} {paginas / t_paralelo:>8.1f} {t_serial / t_paralelo:>5.1f}x"
+        print(linha)
+
+
+if __name__ == "__main__":
+    main()
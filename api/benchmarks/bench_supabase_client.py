@@ -0,0 +1,74 @@
+"""
+Benchmark do acesso ao Supabase: cliente novo por requisição x cliente compartilhado do processo.
+
+Mede o custo de criar o cliente (cold start) e a latência de uma consulta pequena
+(select de 1 linha em `transacoes`) nos dois modos. Precisa de SUPABASE_URL e SUPABASE_KEY.
+
+Uso:
+    python api/benchmarks/bench_supabase_client.py [--requisicoes 50]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supabase import create_client
+
+from database import DatabaseManager, fechar_cliente_supabase, obter_cliente_supabase
+
+
+def consultar(db: DatabaseManager):
+    db.client.table("transacoes").select("id").limit(1).execute()
+
+
+def resumo(nome: str, tempos: list[float]):
+    tempos_ms = sorted(t * 1000 for t in tempos)
+    p95 = tempos_ms[min(len(tempos_ms) - 1, int(len(tempos_ms) * 0.95))]
+    print(f"{nome:>28} {statistics.mean(tempos_ms):>10.1f} {statistics.median(tempos_ms):>10.1f} {p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requisicoes", type=int, default=50)
+    args = parser.parse_args()
+
+    url, key = os.environ.get("SUPABASE_URL"), os.environ.get("SUPABASE_KEY")
+    if not url or not key:
+        sys.exit("Defina SUPABASE_URL e SUPABASE_KEY para rodar o benchmark.")
+
+    # Antes: cada requisição cria o cliente (create_client + sessão HTTP + TLS)
+    criacao, por_requisicao = [], []
+    for _ in range(args.requisicoes):
+        inicio = time.perf_counter()
+        db = DatabaseManager(create_client(url, key))
+        criacao.append(time.perf_counter() - inicio)
+        consultar(db)
+        por_requisicao.append(time.perf_counter() - inicio)
+
+    # Depois: cliente do processo, criado uma vez (cold start) e reaproveitado
+    fechar_cliente_supabase()
+    inicio = time.perf_counter()
+    obter_cliente_supabase()
+    cold_start = time.perf_counter() - inicio
+    consultar(DatabaseManager())  # primeira conexão do pool
+
+    compartilhado = []
+    for _ in range(args.requisicoes):
+        inicio = time.perf_counter()
+        consultar(DatabaseManager())
+        compartilhado.append(time.perf_counter() - inicio)
+
+    print(f"Criação do cliente compartilhado (cold start): {cold_start * 1000:.1f} ms")
+    print(f"{'ms por requisição':>28} {'média':>10} {'mediana':>10} {'p95':>10}")
+    resumo("create_client", criacao)
+    resumo("cliente novo + consulta", por_requisicao)
+    resumo("compartilhado + consulta", compartilhado)
+    fechar_cliente_supabase()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Geradores de extratos sintéticos para os benchmarks.
+O PDF é montado à mão (Helvetica, streams sem compressão) para não depender
+de bibliotecas de escrita de PDF.
+"""
+
+import random
+from datetime import date, timedelta
+
+DESCRICOES = [
+    "PIX enviado para JOAO DA SILVA",
+    "Compra no debito SUPERMERCADO DIA",
+    "UBER TRIP HELP UBER COM",
+    "PAGAMENTO DE BOLETO ELETROPAULO",
+    "TED recebido de EMPRESA LTDA",
+    "IFOOD RESTAURANTE BOM PRATO",
+    "DROGARIA SAO PAULO",
+    "APLICACAO CDB BANCO INTER",
+    "NETFLIX COM",
+    "COMPRA LOJA AMERICANAS",
+    "POSTO IPIRANGA",
+]
+
+
+def _valor_br(valor: float) -> str:
+    """Formata 1234.5 como "1.234,50"."""
+    return f"{valor:,.2f}".replace(",", "_").replace(".", ",").replace("_", ".")
+
+
+def gerar_linhas(quantidade: int, formato: str = "generica", seed: int = 42) -> list[str]:
+    """
+    Gera linhas de extrato no formato pedido:
+    "neon" (DESCRIÇÃO DATA HORA R$ VALOR R$ SALDO -), "generica" (DATA DESCRIÇÃO VALOR)
+    ou "fatura" (linhas genéricas precedidas do cabeçalho de fatura de cartão).
+    """
+    rnd = random.Random(seed)
+    inicio = date(2025, 1, 1)
+    linhas = ["RESUMO DA FATURA", "TOTAL DESTA FATURA R$ 0,00"] if formato == "fatura" else []
+    saldo = 10000.0
+    for i in range(quantidade):
+        descricao = f"{rnd.choice(DESCRICOES)} {i}"
+        data = inicio + timedelta(days=rnd.randint(0, 364))
+        valor = round(rnd.uniform(1, 2000), 2)
+        negativo = rnd.random() < 0.7
+        if formato == "neon":
+            saldo += -valor if negativo else valor
+            sinal = "-" if negativo else ""
+            linhas.append(
+                f"{descricao} {data:%d/%m/%Y} {rnd.randint(0, 23):02d} {rnd.randint(0, 59):02d} "
+                f"{sinal}R$ {_valor_br(valor)} R$ {_valor_br(abs(saldo))} -"
+            )
+        else:
+            sinal = "-" if negativo and formato != "fatura" else ""
+            linhas.append(f"{data:%d/%m/%Y} {descricao} {sinal}{_valor_br(valor)}")
+    return linhas
+
+
+def gerar_texto(quantidade: int, formato: str = "generica", seed: int = 42) -> str:
+    return "\n".join(gerar_linhas(quantidade, formato, seed)) + "\n"
+
+
+def gerar_csv(quantidade: int, seed: int = 42) -> bytes:
+    """CSV com as colunas Data, Descrição, Valor (valor com vírgula decimal, como nos bancos)."""
+    rnd = random.Random(seed)
+    inicio = date(2025, 1, 1)
+    partes = ["Data,Descrição,Valor"]
+    for i in range(quantidade):
+        data = inicio + timedelta(days=rnd.randint(0, 364))
+        valor = f"{rnd.uniform(-2000, 2000):.2f}".replace(".", ",")
+        partes.append(f'{data:%d/%m/%Y},{rnd.choice(DESCRICOES)} {i},"{valor}"')
+    return ("\n".join(partes) + "\n").encode("utf-8")
+
+
+def _escapar_pdf(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def gerar_pdf(linhas: list[str], linhas_por_pagina: int = 45) -> bytes:
+    """Monta um PDF com as linhas dadas, linhas_por_pagina por página."""
+    paginas = [linhas[i:i + linhas_por_pagina] for i in range(0, len(linhas), linhas_por_pagina)] or [[]]
+
+    objetos: list[bytes] = []
+
+    def adicionar(conteudo: bytes) -> int:
+        objetos.append(conteudo)
+        return len(objetos)
+
+    catalogo = adicionar(b"")  # preenchido depois
+    raiz_paginas = adicionar(b"")
+    fonte = adicionar(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    ids_paginas = []
+    for pagina in paginas:
+        comandos = ["BT", "/F1 9 Tf", "11 TL", "30 810 Td"]
+        for linha in pagina:
+            comandos.append(f"({_escapar_pdf(linha)}) Tj T*")
+        comandos.append("ET")
+        stream = "\n".join(comandos).encode("cp1252", errors="replace")
+        conteudo = adicionar(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        ids_paginas.append(adicionar(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (raiz_paginas, fonte, conteudo)
+        ))
+
+    objetos[catalogo - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % raiz_paginas
+    kids = b" ".join(b"%d 0 R" % i for i in ids_paginas)
+    objetos[raiz_paginas - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(ids_paginas))
+
+    saida = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for numero, conteudo in enumerate(objetos, start=1):
+        offsets.append(len(saida))
+        saida += b"%d 0 obj\n" % numero + conteudo + b"\nendobj\n"
+    inicio_xref = len(saida)
+    saida += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objetos) + 1)
+    for offset in offsets:
+        saida += b"%010d 00000 n \n" % offset
+    saida += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objetos) + 1, catalogo, inicio_xref)
+    return bytes(saida)
@@ -0,0 +1,178 @@
+"""
+Motor de categorização de transações.
+Compila todas as palavras-chave (padrão + categorias do usuário) em uma única
+regex de alternância, construída uma vez por processo e reaproveitada.
+A comparação ignora acentos e maiúsculas/minúsculas.
+"""
+
+import re
+import threading
+import unicodedata
+from typing import Iterable, Optional
+
+CATEGORIA_PADRAO = "A Categorizar"
+
+# Ordem importa: em caso de empate a primeira categoria vence
+CATEGORIAS_PADRAO = {
+    'Comida': ['supermercado', 'mercado', 'padaria', 'restaurante', 'lanchonete', 'ifood', 'rappi', 'hamburguer', 'pizza', 'delivery'],
+    'Transporte': ['uber', '99', 'taxi', 'combustível', 'posto', 'estacionamento', 'metro', 'onibus', 'bilhete', 'passagem', 'pedágio'],
+    'Moradia': ['aluguel', 'condomínio', 'luz', 'água', 'energia', 'internet', 'telefone', 'gás', 'energia', 'eletropaulo', 'sabesp'],
+    'Lazer': ['cinema', 'netflix', 'spotify', 'shopping', 'parque', 'viagem', 'hotel', 'show', 'teatro', 'musical'],
+    'Saúde': ['farmacia', 'drogaria', 'médico', 'hospital', 'plano de saúde', 'academia', 'clinica', 'dentista'],
+    'Educação': ['escola', 'faculdade', 'curso', 'livraria', 'material escolar', 'universidade', 'mensalidade'],
+    'Investimentos': ['rendimento', 'dividendo', 'aplicação', 'tesouro', 'ação', 'fii', 'investimento', 'cdb', 'lci'],
+    'Receita': ['salário', 'pagamento', 'transferência recebida', 'depósito', 'rendimento']
+}
+
+
+# Marcas diacríticas combinantes (acento agudo, til, cedilha...) após NFKD
+_SEM_ACENTOS = dict.fromkeys(range(0x300, 0x370))
+
+
+def normalizar_texto(texto: str) -> str:
+    """Remove acentos e converte para minúsculas ("Ação" -> "acao")."""
+    if texto.isascii():
+        return texto.lower()
+    return unicodedata.normalize("NFKD", texto).translate(_SEM_ACENTOS).casefold()
+
+
+def _regex_trie(palavras: Iterable[str]) -> str:
+    """
+    Monta uma alternância em forma de trie ("mercado|metro" -> "me(?:rcado|tro)").
+    O `re` do Python não fatora prefixos sozinho; com a trie cada posição do
+    texto testa um único ramo por caractere em vez de todas as palavras.
+    """
+    trie: dict = {}
+    for palavra in palavras:
+        no = trie
+        for caractere in palavra:
+            no = no.setdefault(caractere, {})
+        no[""] = {}
+
+    def montar(no: dict) -> str:
+        fim = "" in no
+        ramos = [re.escape(c) + montar(filho) for c, filho in sorted(no.items()) if c]
+        if not ramos:
+            return ""
+        if len(ramos) == 1 and not fim:
+            return ramos[0]
+        # Opcional guloso: na mesma posição casa sempre a palavra mais longa
+        return "(?:" + "|".join(ramos) + ")" + ("?" if fim else "")
+
+    return montar(trie)
+
+
+class Categorizador:
+    """
+    Categorizador compilado.
+
+    Todas as palavras-chave viram uma única regex em forma de trie. Na mesma
+    posição a regex casa a palavra mais longa; como todas as palavras que
+    casam ali são prefixos dela, cada palavra guarda a melhor prioridade entre
+    seus prefixos. O resultado é exatamente o da varredura categoria a
+    categoria: vence a primeira categoria (na ordem) que tiver qualquer
+    palavra-chave contida na descrição.
+    """
+
+    def __init__(self, categorias: dict, categorias_usuario: Iterable[str] = ()):
+        self._prioridade: dict[str, int] = {}
+        self._categorias: list[str] = []
+
+        for categoria, palavras in categorias.items():
+            self._adicionar(categoria, palavras)
+
+        # Categorias cadastradas pelo usuário entram com o próprio nome como
+        # palavra-chave, com prioridade menor que as categorias padrão
+        for nome in categorias_usuario:
+            if nome and nome not in categorias:
+                self._adicionar(nome, [nome])
+
+        self._prioridade_efetiva = {
+            palavra: min(p for prefixo, p in self._prioridade.items() if palavra.startswith(prefixo))
+            for palavra in self._prioridade
+        }
+        self._regex = re.compile(_regex_trie(self._prioridade)) if self._prioridade else None
+
+        # _regex_ate[i]: só as palavras de categorias com prioridade < i, usada
+        # para continuar a busca depois do primeiro match (montada sob demanda)
+        self._regex_ate: dict[int, re.Pattern] = {}
+
+        self.assinatura = (
+            tuple(self._categorias),
+            tuple(sorted(self._prioridade.items())),
+        )
+
+    def _adicionar(self, categoria: str, palavras: Iterable[str]):
+        indice = len(self._categorias)
+        self._categorias.append(categoria)
+        for palavra in palavras:
+            chave = normalizar_texto(palavra)
+            # Palavra repetida em duas categorias fica com a primeira
+            if chave and chave not in self._prioridade:
+                self._prioridade[chave] = indice
+
+    def _regex_ate_prioridade(self, limite: int) -> re.Pattern:
+        regex = self._regex_ate.get(limite)
+        if regex is None:
+            palavras = [p for p, i in self._prioridade.items() if i < limite]
+            # "(?!)" nunca casa: nenhuma categoria anterior tem palavras-chave
+            regex = re.compile(_regex_trie(palavras) if palavras else "(?!)")
+            self._regex_ate[limite] = regex
+        return regex
+
+    def categorize(self, descricao: str) -> str:
+        """Retorna a categoria de uma descrição."""
+        return self.categorize_many((descricao,))[0]
+
+    def categorize_many(self, descricoes: Iterable[str]) -> list[str]:
+        """Categoriza um lote de descrições, reaproveitando o resultado de descrições repetidas."""
+        if self._regex is None:
+            return [CATEGORIA_PADRAO for _ in descricoes]
+
+        buscar = self._regex.search
+        regex_ate = self._regex_ate_prioridade
+        prioridade = self._prioridade_efetiva
+        categorias = self._categorias
+
+        resultado = []
+        vistos: dict[str, str] = {}
+        for descricao in descricoes:
+            categoria = vistos.get(descricao)
+            if categoria is None:
+                texto = normalizar_texto(descricao) if descricao else ""
+                match = buscar(texto)
+                if match is None:
+                    categoria = CATEGORIA_PADRAO
+                else:
+                    # Continua a partir da posição seguinte (pega palavras
+                    # sobrepostas), só com as categorias de maior prioridade
+                    melhor = prioridade[match.group()]
+                    while melhor:
+                        match = regex_ate(melhor).search(texto, match.start() + 1)
+                        if match is None:
+                            break
+                        melhor = prioridade[match.group()]
+                    categoria = categorias[melhor]
+                vistos[descricao] = categoria
+            resultado.append(categoria)
+        return resultado
+
+
+_categorizadores: dict = {}
+_lock = threading.Lock()
+
+
+def obter_categorizador(categorias_usuario: Optional[Iterable[str]] = None) -> Categorizador:
+    """Retorna o categorizador do processo (um por conjunto de categorias do usuário)."""
+    chave = tuple(categorias_usuario or ())
+    categorizador = _categorizadores.get(chave)
+    if categorizador is None:
+        with _lock:
+            categorizador = _categorizadores.get(chave)
+            if categorizador is None:
+                # Conjuntos antigos de categorias do usuário deixam de ser usados
+                if len(_categorizadores) >= 8:
+                    _categorizadores.clear()
+                categorizador = Categorizador(CATEGORIAS_PADRAO, chave)
+                _categorizadores[chave] = categorizador
+    return categorizador
@@ -0,0 +1,100 @@
+"""
+Agregações do dashboard (despesas por categoria, evolução dos investimentos e métricas).
+Em produção elas rodam no Postgres sobre o rollup mensal transacoes_mensal
+(scripts/v7_transacoes_mensal.sql) e só as linhas agregadas trafegam; as funções
+daqui são o equivalente local, usadas como fallback quando o banco ainda não tem
+o rollup e para conferir o SQL.
+"""
+
+from datetime import date
+from typing import Iterable, Optional
+
+
+def mes_da_data(data: str) -> str:
+    """"2026-02-17" -> "2026-02-01" (chave de mês do rollup)"""
+    return f"{data[:7]}-01"
+
+
+def calcular_rollups(transacoes: Iterable[dict]) -> list[dict]:
+    """Linhas do rollup (mes, categoria, tipo, soma, soma_abs, quantidade) a partir das transações"""
+    grupos: dict[tuple, list] = {}
+    for t in transacoes:
+        valor = float(t['valor'])
+        grupo = grupos.setdefault((mes_da_data(t['data']), t['categoria'], t['tipo']), [0.0, 0.0, 0])
+        grupo[0] += valor
+        grupo[1] += abs(valor)
+        grupo[2] += 1
+    return [
+        {"mes": mes, "categoria": categoria, "tipo": tipo, "soma": soma, "soma_abs": soma_abs, "quantidade": quantidade}
+        for (mes, categoria, tipo), (soma, soma_abs, quantidade) in grupos.items()
+    ]
+
+
+def agregar_rollups(rollups: Iterable[dict], data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> dict:
+    """
+    Mesmo resultado da função dashboard_resumo do banco. O período tem granularidade de mês;
+    o acumulado investido considera também os meses anteriores ao início.
+    """
+    mes_inicio = mes_da_data(data_inicio.isoformat()) if data_inicio else None
+    mes_fim = mes_da_data(data_fim.isoformat()) if data_fim else None
+
+    despesas_por_categoria: dict[str, float] = {}
+    movimento_investimentos: dict[str, float] = {}
+    receitas = despesas = saldo = 0.0
+    grupos = 0
+
+    for r in rollups:
+        mes = str(r['mes'])[:10]
+        if mes_fim and mes > mes_fim:
+            continue
+        categoria, tipo = r['categoria'], r['tipo']
+        soma, soma_abs = float(r['soma']), float(r['soma_abs'])
+
+        if categoria == 'Investimentos' or tipo == 'Investimento':
+            # Aporte (Despesa) soma, resgate subtrai
+            movimento = soma_abs if tipo == 'Despesa' else -soma
+            movimento_investimentos[mes] = movimento_investimentos.get(mes, 0) + movimento
+
+        if mes_inicio and mes < mes_inicio:
+            continue
+        grupos += 1
+
+        if tipo == 'Despesa':
+            chave = categoria or 'Outros'
+            despesas_por_categoria[chave] = despesas_por_categoria.get(chave, 0) + soma
+        # Investimentos ficam fora de receitas, despesas e saldo
+        if categoria != 'Investimentos' and tipo != 'Investimento':
+            saldo += soma
+            if tipo == 'Receita':
+                receitas += soma
+            elif tipo == 'Despesa':
+                despesas += soma_abs
+
+    if not grupos:
+        return {"expenses_by_category": [], "investments_evolution": []}
+
+    evolucao = []
+    acumulado = 0
+    for mes in sorted(movimento_investimentos):
+        acumulado += movimento_investimentos[mes]
+        if not mes_inicio or mes >= mes_inicio:
+            evolucao.append({"data": mes, "valor": acumulado})
+
+    return {
+        "expenses_by_category": sorted(
+            ({"name": k, "value": abs(v)} for k, v in despesas_por_categoria.items()),
+            key=lambda c: c["value"], reverse=True,
+        ),
+        "investments_evolution": evolucao,
+        "metrics": {
+            "receitas": receitas,
+            "despesas": despesas,
+            "investido": acumulado,
+            "saldo": saldo,
+        },
+    }
+
+
+def agregar_dashboard(transacoes: Iterable[dict], data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> dict:
+    """Dashboard direto das transações (rollup calculado na hora)"""
+    return agregar_rollups(calcular_rollups(transacoes), data_inicio, data_fim)
@@ -1,66 +1,336 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Optional
+
+import httpx
 from dotenv import load_dotenv
-from supabase import create_client, Client
+from supabase import create_client, Client, ClientOptions
+
+from dashboard import agregar_dashboard
+from storage import StorageBackend, decodificar_cursor, codificar_cursor, preparar_transacoes, totais_transacoes, COLUNAS_TRANSACAO
 
 load_dotenv()
 
+# Quantas impressões/ids por consulta "in" (a lista vai na URL do PostgREST)
+LOTE_CONSULTA_IMPRESSOES = 200
+LOTE_IDS = 200
+
+# Inserts em lotes: linhas por request, requests simultâneos e tentativas por lote
+SUPABASE_LOTE_INSERCAO = int(os.environ.get("SUPABASE_LOTE_INSERCAO", "1000"))
+SUPABASE_INSERCOES_CONCORRENTES = int(os.environ.get("SUPABASE_INSERCOES_CONCORRENTES", "4"))
+SUPABASE_TENTATIVAS = int(os.environ.get("SUPABASE_TENTATIVAS", "3"))
+
+# Pool HTTP compartilhado por todas as requisições ao Supabase (keep-alive entre chamadas)
+SUPABASE_MAX_CONEXOES = int(os.environ.get("SUPABASE_MAX_CONEXOES", "20"))
+SUPABASE_TIMEOUT = float(os.environ.get("SUPABASE_TIMEOUT", "30"))
+
+# Chave única usada no upsert: (impressao, data) a partir da v8 (tabela particionada por data),
+# só impressao nos bancos ainda em v4..v7. Começa pela v8 e cai para a antiga se o banco
+# responder que não existe constraint para esse ON CONFLICT (42P10).
+CONFLITO_V8 = "impressao,data"
+CONFLITO_ANTIGO = "impressao"
+_conflito_transacoes = CONFLITO_V8
+
+_cliente: Optional[Client] = None
+_cliente_http: Optional[httpx.Client] = None
+_cliente_inicializado = False
+_cliente_lock = threading.Lock()
+
+
+def _criar_cliente() -> tuple[Optional[Client], Optional[httpx.Client]]:
+    url: str = os.environ.get("SUPABASE_URL")
+    key: str = os.environ.get("SUPABASE_KEY")
+
+    if not url or not key:
+        print("Aviso: SUPABASE_URL ou SUPABASE_KEY não definidos.")
+        return None, None
+
+    limites = httpx.Limits(
+        max_connections=SUPABASE_MAX_CONEXOES,
+        max_keepalive_connections=SUPABASE_MAX_CONEXOES,
+        keepalive_expiry=60,
+    )
+    http = httpx.Client(
+        # retries: refaz a conexão se o servidor fechou uma conexão ociosa do pool
+        transport=httpx.HTTPTransport(limits=limites, retries=2),
+        timeout=SUPABASE_TIMEOUT,
+    )
+    return create_client(url, key, options=ClientOptions(httpx_client=http)), http
+
+
+def obter_cliente_supabase() -> Optional[Client]:
+    """
+    Cliente Supabase do processo, criado na primeira chamada e reaproveitado por todas
+    as requisições (uma sessão HTTP com pool de conexões, em vez de TLS a cada request).
+    None se o banco não estiver configurado.
+    """
+    global _cliente, _cliente_http, _cliente_inicializado
+    if not _cliente_inicializado or (_cliente_http is not None and _cliente_http.is_closed):
+        with _cliente_lock:
+            if not _cliente_inicializado or (_cliente_http is not None and _cliente_http.is_closed):
+                _cliente, _cliente_http = _criar_cliente()
+                _cliente_inicializado = True
+    return _cliente
+
+
+def fechar_cliente_supabase():
+    """Fecha o pool de conexões; a próxima chamada a obter_cliente_supabase cria outro cliente"""
+    global _cliente, _cliente_http, _cliente_inicializado
+    with _cliente_lock:
+        if _cliente_http is not None:
+            _cliente_http.close()
+        _cliente, _cliente_http, _cliente_inicializado = None, None, False
+
 
-class DatabaseManager:
-    def __init__(self):
-        url: str = os.environ.get("SUPABASE_URL")
-        key: str = os.environ.get("SUPABASE_KEY")
-        
-        if not url or not key:
-            print("Aviso: SUPABASE_URL ou SUPABASE_KEY não definidos.")
-            self.client = None
-        else:
-            self.client: Client = create_client(url, key)
+class DatabaseManager(StorageBackend):
+    """Backend Supabase"""
+
+    def __init__(self, client: Optional[Client] = None):
+        # Sem client explícito usa o cliente compartilhado (barato: não abre conexão nova)
+        self.client: Optional[Client] = client if client is not None else obter_cliente_supabase()
+
+    @property
+    def conectado(self) -> bool:
+        return self.client is not None
 
     def save_transactions(self, transactions: list):
-        """Salva uma lista de transações no Supabase"""
+        """
+        Salva uma lista de transações no Supabase, ignorando as já importadas.
+        Retorna {"novas": n, "existentes": m}.
+        """
         if not self.client:
             return {"error": "Banco de dados não configurado"}
             
         try:
             # Prepara dados para inserção (garante que chaves batam com colunas do DB)
-            data_to_insert = []
-            for t in transactions:
-                # Converte data DD/MM/YYYY para YYYY-MM-DD para o Postgres
-                try:
-                    parts = t['data'].split('/')
-                    if len(parts) == 3:
-                        iso_date = f"{parts[2]}-{parts[1]}-{parts[0]}"
-                    else:
-                        iso_date = t['data']
-                except:
-                    iso_date = t['data']
-
-                data_to_insert.append({
-                    "data": iso_date,
-                    "descricao": t['descricao'],
-                    "valor": t['valor'],
-                    "categoria": t['categoria'],
-                    "tipo": t['tipo'],
-                    "fonte": t['fonte']
-                })
-            
-            response = self.client.table("transacoes").insert(data_to_insert).execute()
-            return response
+            data_to_insert = preparar_transacoes(transactions)
+
+            existentes = self._impressoes_existentes([t["impressao"] for t in data_to_insert])
+            novas = [t for t in data_to_insert if t["impressao"] not in existentes]
+
+            self._inserir_em_lotes(novas)
+            return {"novas": len(novas), "existentes": len(data_to_insert) - len(novas)}
         except Exception as e:
             raise Exception(f"Erro ao salvar no banco: {str(e)}")
 
+    def _inserir_em_lotes(self, linhas: list, tamanho_lote: Optional[int] = None, concorrencia: Optional[int] = None):
+        """
+        Insere em lotes de tamanho_lote linhas, até `concorrencia` requests ao mesmo tempo,
+        repetindo cada lote que falhar. O upsert com ignore_duplicates torna a repetição
+        segura (um lote que chegou a ser gravado não duplica) e cobre a corrida entre dois
+        uploads do mesmo extrato.
+        """
+        tamanho_lote = tamanho_lote or SUPABASE_LOTE_INSERCAO
+        lotes = [linhas[i:i + tamanho_lote] for i in range(0, len(linhas), tamanho_lote)]
+        if not lotes:
+            return
+        if len(lotes) == 1:
+            self._inserir_lote(lotes[0])
+            return
+        with ThreadPoolExecutor(max_workers=min(concorrencia or SUPABASE_INSERCOES_CONCORRENTES, len(lotes))) as executor:
+            # list() propaga a exceção do primeiro lote que esgotar as tentativas
+            list(executor.map(self._inserir_lote, lotes))
+
+    def _inserir_lote(self, lote: list):
+        global _conflito_transacoes
+        tentativa = 1
+        while True:
+            conflito = _conflito_transacoes
+            try:
+                self.client.table("transacoes").upsert(
+                    lote, on_conflict=conflito, ignore_duplicates=True
+                ).execute()
+                return
+            except Exception as e:
+                if "42P10" in str(e) and conflito == CONFLITO_V8:
+                    # Schema anterior à v8 (sem unique (impressao, data)): não conta como tentativa
+                    print("Aviso: banco sem a v8_particionamento_transacoes.sql, upsert por impressao")
+                    _conflito_transacoes = CONFLITO_ANTIGO
+                    continue
+                if tentativa == SUPABASE_TENTATIVAS:
+                    raise
+                espera = 0.5 * 2 ** (tentativa - 1)
+                print(f"Aviso: lote de {len(lote)} transações falhou ({e}), nova tentativa em {espera:.1f}s")
+                time.sleep(espera)
+                tentativa += 1
+
+    def _impressoes_existentes(self, impressoes: list) -> set:
+        """Quais impressões já estão no banco (consulta só a coluna indexada, em lotes)"""
+        existentes = set()
+        unicas = list(dict.fromkeys(impressoes))
+        for i in range(0, len(unicas), LOTE_CONSULTA_IMPRESSOES):
+            lote = unicas[i:i + LOTE_CONSULTA_IMPRESSOES]
+            response = self.client.table("transacoes").select("impressao").in_("impressao", lote).execute()
+            existentes.update(r["impressao"] for r in response.data)
+        return existentes
+
+    def get_transactions_page(self, limite: int = 100, cursor: Optional[str] = None,
+                              data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                              categorias: Optional[list] = None, tipos: Optional[list] = None,
+                              fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                              valor_max: Optional[float] = None, campos: Optional[list] = None,
+                              busca: Optional[str] = None, investimentos: bool = False):
+        """
+        Uma página de transações, da mais recente para a mais antiga, com paginação por
+        chave (data, id): cada página é um range scan no índice, sem OFFSET.
+        Retorna (transações, cursor da próxima página ou None).
+        """
+        if not self.client:
+            return [], None
+
+        colunas = list(dict.fromkeys(campos or COLUNAS_TRANSACAO))
+        # data e id são a chave do cursor
+        selecionadas = list(dict.fromkeys(colunas + ["data", "id"]))
+
+        query = self._filtrar(
+            self.client.table("transacoes").select(",".join(selecionadas)),
+            data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos,
+        )
+        if cursor:
+            ultima_data, ultimo_id = decodificar_cursor(cursor)
+            query = query.or_(f"data.lt.{ultima_data},and(data.eq.{ultima_data},id.lt.{ultimo_id})")
+
+        # Uma linha a mais indica se existe próxima página
+        response = query.order("data", desc=True).order("id", desc=True).limit(limite + 1).execute()
+        linhas = response.data
+
+        proximo = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = codificar_cursor(linhas[-1]["data"], linhas[-1]["id"])
+        if len(selecionadas) != len(colunas):
+            linhas = [{c: linha.get(c) for c in colunas} for linha in linhas]
+        return linhas, proximo
+
+    def get_transactions_totals(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                                categorias: Optional[list] = None, tipos: Optional[list] = None,
+                                fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                                valor_max: Optional[float] = None, busca: Optional[str] = None,
+                                investimentos: bool = False, pagina: int = 1000) -> dict:
+        """Totais pelos mesmos filtros da listagem; só tipo e valor trafegam, em páginas (sem agregação no PostgREST)"""
+        if not self.client:
+            return totais_transacoes([])
+        linhas = []
+        while True:
+            query = self._filtrar(
+                self.client.table("transacoes").select("tipo,valor"),
+                data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos,
+            )
+            response = (
+                query.order("data", desc=True).order("id", desc=True)
+                .range(len(linhas), len(linhas) + pagina - 1)
+                .execute()
+            )
+            linhas.extend(response.data)
+            if len(response.data) < pagina:
+                return totais_transacoes(linhas)
+
+    @staticmethod
+    def _filtrar(query, data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos):
+        """Filtros comuns de get_transactions_page e get_transactions_totals"""
+        if data_inicio:
+            query = query.gte("data", data_inicio.isoformat())
+        if data_fim:
+            query = query.lte("data", data_fim.isoformat())
+        if categorias:
+            query = query.in_("categoria", categorias)
+        if tipos:
+            query = query.in_("tipo", tipos)
+        if fontes:
+            query = query.in_("fonte", fontes)
+        if valor_min is not None:
+            query = query.gte("valor", valor_min)
+        if valor_max is not None:
+            query = query.lte("valor", valor_max)
+        if busca:
+            # Valor entre aspas: vírgula e parênteses do termo não quebram o filtro do PostgREST
+            termo = busca.replace("\\", "\\\\").replace('"', '\\"').replace("%", "\\%").replace("_", "\\_")
+            query = query.or_(f'descricao.ilike."*{termo}*",categoria.ilike."*{termo}*"')
+        if investimentos:
+            query = query.or_("categoria.eq.Investimentos,tipo.eq.Investimento")
+        return query
+
     def get_transactions(self):
         """Busca todas as transações"""
         if not self.client:
             return []
         try:
-            response = self.client.table("transacoes").select("*").order("data", desc=True).execute()
-            return response.data
+            return self._todas_transacoes("*")
         except Exception as e:
             print(f"Erro ao buscar transações: {e}")
             return []
 
-    # --- CATEGORIAS ---
+    def _todas_transacoes(self, colunas: str, pagina: int = 1000) -> list:
+        """A tabela inteira em páginas de `pagina` linhas (o PostgREST corta cada resposta em 1000)"""
+        linhas = []
+        while True:
+            response = (
+                self.client.table("transacoes").select(colunas)
+                .order("data", desc=True).order("id", desc=True)
+                .range(len(linhas), len(linhas) + pagina - 1)
+                .execute()
+            )
+            linhas.extend(response.data)
+            if len(response.data) < pagina:
+                return linhas
+
+    def get_transactions_since(self, created_at: str, pagina: int = 1000) -> list:
+        """Transações criadas a partir de created_at (atualização incremental do cache de transações)"""
+        if not self.client:
+            return []
+        linhas = []
+        while True:
+            response = (
+                self.client.table("transacoes").select(",".join(COLUNAS_TRANSACAO))
+                .gte("created_at", created_at)
+                .order("created_at").order("id")
+                .range(len(linhas), len(linhas) + pagina - 1)
+                .execute()
+            )
+            linhas.extend(response.data)
+            if len(response.data) < pagina:
+                return linhas
+
+    def get_learned_categories(self, limite: int = 50000, pagina: int = 1000):
+        """Correções de categoria do usuário, da mais antiga à mais recente (só as últimas `limite`)"""
+        if not self.client:
+            return []
+        try:
+            linhas = []
+            # PostgREST limita o tamanho de cada resposta: busca em páginas
+            while len(linhas) < limite:
+                inicio = len(linhas)
+                fim = min(inicio + pagina, limite) - 1
+                response = (
+                    self.client.table("categorias_aprendidas").select("chave,categoria")
+                    .order("atualizado_em", desc=True)
+                    .range(inicio, fim)
+                    .execute()
+                )
+                linhas.extend(response.data)
+                if len(response.data) < fim - inicio + 1:
+                    break
+            return [(r["chave"], r["categoria"]) for r in reversed(linhas)]
+        except Exception as e:
+            print(f"Erro ao buscar categorias aprendidas: {e}")
+            return []
+
+    def save_learned_categories(self, pares: list):
+        if not self.client:
+            return
+        # O default de atualizado_em só vale no insert: no upsert de uma chave existente vai explícito
+        agora = datetime.now(timezone.utc).isoformat()
+        gravar = [{"chave": chave, "categoria": categoria, "atualizado_em": agora} for chave, categoria in pares if categoria]
+        esquecer = [chave for chave, categoria in pares if not categoria]
+        tabela = self.client.table("categorias_aprendidas")
+        for i in range(0, len(gravar), LOTE_IDS):
+            tabela.upsert(gravar[i:i + LOTE_IDS], on_conflict="chave").execute()
+        for i in range(0, len(esquecer), LOTE_IDS):
+            tabela.delete().in_("chave", esquecer[i:i + LOTE_IDS]).execute()
+
     def get_categories(self):
         if not self.client: return []
         try:
@@ -108,6 +378,16 @@ class DatabaseManager:
             return self.client.table("transacoes").delete().eq("id", id).execute()
         except: return None
 
+    def bulk_delete_transactions(self, ids: list) -> int:
+        """Remove várias transações (um request por lote de LOTE_IDS ids). Retorna quantas foram removidas."""
+        if not self.client:
+            return 0
+        removidas = 0
+        for i in range(0, len(ids), LOTE_IDS):
+            response = self.client.table("transacoes").delete().in_("id", ids[i:i + LOTE_IDS]).execute()
+            removidas += len(response.data)
+        return removidas
+
     def delete_all_transactions(self):
         if not self.client: return None
         try:
@@ -121,61 +401,45 @@ class DatabaseManager:
         if not self.client: return None
         try:
             # data is a dict with fields to update (e.g., {"categoria": "Nova"})
-            return self.client.table("transacoes").update(data).eq("id", id).execute()
+            return self.client.table("transacoes").update(data).eq("id", id).execute().data
         except: return None
 
+    def bulk_update_transactions(self, ids: list, data: dict) -> list:
+        """Aplica as mesmas alterações a várias transações (um request por lote de LOTE_IDS ids). Retorna as linhas atualizadas."""
+        if not self.client:
+            return []
+        atualizadas = []
+        for i in range(0, len(ids), LOTE_IDS):
+            response = self.client.table("transacoes").update(data).in_("id", ids[i:i + LOTE_IDS]).execute()
+            atualizadas.extend(response.data)
+        return atualizadas
+
     # --- DASHBOARD ---
-    def get_dashboard_data(self):
-        """Retorna dados agregados para os gráficos"""
-        transactions = self.get_transactions()
-        if not transactions:
+    def get_dashboard_data(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None):
+        """
+        Retorna dados agregados para os gráficos, lidos do rollup mensal (função dashboard_resumo).
+        O período opcional tem granularidade de mês.
+        """
+        if not self.client:
             return {"expenses_by_category": [], "investments_evolution": []}
-        
-        # 1. Despesas por Categoria
-        expenses = {}
-        for t in transactions:
-            if t['tipo'] == 'Despesa':
-                cat = t['categoria'] or 'Outros'
-                expenses[cat] = expenses.get(cat, 0) + float(t['valor'])
-        
-        pie_data = [{"name": k, "value": abs(v)} for k, v in expenses.items()]
-
-        # 2. Evolução Investimentos (Acumulado)
-        # Filtra investimentos
-        investments = [t for t in transactions if t['categoria'] == 'Investimentos' or t['tipo'] == 'Investimento']
-        # Ordena por data crescente
-        investments.sort(key=lambda x: x['data'])
-        
-        evolution_data = []
-        accumulated = 0
-        for t in investments:
-            # Se for 'Despesa' no contexto de investimento, é aporte (+)
-            # Se for 'Receita', é resgate (-)
-            # Mas verifique como o processador classifica. 
-            # Geralmente: Saiu da conta (Despesa) -> Entrou no Investimento (+)
-            val = float(t['valor'])
-            if t['tipo'] == 'Despesa':
-                accumulated += abs(val)
-            else:
-                accumulated -= val # Resgate diminui o saldo investido
-            
-            evolution_data.append({
-                "data": t['data'],
-                "valor": accumulated
-            })
-
-        return {
-            "expenses_by_category": pie_data,
-            "investments_evolution": evolution_data,
-            "metrics": {
-                "receitas": sum(float(t['valor']) for t in transactions if t['tipo'] == 'Receita' and t['categoria'] != 'Investimentos' and t['tipo'] != 'Investimento'),
-                "despesas": sum(abs(float(t['valor'])) for t in transactions if t['tipo'] == 'Despesa' and t['categoria'] != 'Investimentos'),
-                "investido": accumulated, # Total acumulado final
-                "saldo": sum(float(t['valor']) for t in transactions if t['categoria'] != 'Investimentos' and t['tipo'] != 'Investimento')
-                # Nota: Saldo geralmente não conta investimentos como 'gasto', mas aporte sai da conta.
-                # Se quisermos saldo da CONTA CORRENTE, tudo conta.
-                # Se quisermos saldo CONTÁBIL (Patrimônio), investimento é ativo.
-                # Vamos simplificar: Saldo = Receitas - Despesas (sem contar investimento como despesa de 'perda', mas sai do caixa)
-                # Na verdade, a regra anterior era: Saldo = Soma de tudo (investimento é negativo pois sai da conta).
-            }
-        }
+        parametros = {}
+        if data_inicio:
+            parametros["inicio"] = data_inicio.isoformat()
+        if data_fim:
+            parametros["fim"] = data_fim.isoformat()
+        try:
+            return self.client.rpc("dashboard_resumo", parametros).execute().data
+        except Exception as e:
+            # Função ainda não instalada (scripts/v7_transacoes_mensal.sql): agrega localmente
+            print(f"Aviso: dashboard_resumo indisponível, agregando localmente ({e})")
+        try:
+            return agregar_dashboard(self._todas_transacoes("data,valor,categoria,tipo"), data_inicio, data_fim)
+        except Exception as e:
+            print(f"Erro ao buscar transações: {e}")
+            return {"expenses_by_category": [], "investments_evolution": []}
+
+    def rebuild_rollups(self) -> int:
+        """Reconstrói o rollup mensal a partir de transacoes (correção de divergências). Retorna quantos grupos gravou."""
+        if not self.client:
+            raise Exception("Banco de dados não configurado")
+        return self.client.rpc("reconstruir_transacoes_mensal").execute().data
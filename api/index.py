@@ -1,25 +1,62 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Depends, Request, Response
 import sys
 import os
+import uuid
 
 # Adiciona o diretório atual ao path para que imports relativos funcionem na Vercel
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from pydantic import BaseModel
 from typing import List, Optional
-from processor import ProcessadorExtratos
+from datetime import date
+from processor import ProcessadorExtratos, encerrar_pools_pdf
+from parse_cache import obter_cache_parse
+from batch_upload import encerrar_pool, processar_lote
+from upload_jobs import encerrar_fila_uploads, fila_uploads_disponivel, obter_fila_uploads
+from learned_categories import obter_indice_categorias
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.concurrency import run_in_threadpool
+from responses import CompressaoMiddleware, RespostaJSON, colunar
+from transaction_export import (
+    FORMATOS_EXPORTACAO, exportar_csv, exportar_parquet, formatos_exportacao, paginas_transacoes
+)
+from starlette.responses import StreamingResponse
+from contextlib import asynccontextmanager
 import io
-
-app = FastAPI()
+import itertools
 
 # --- Imports dos novos serviços ---
 from market_service import (
+    fechar_clientes_mercado, iniciar_clientes_mercado,
     get_stock_quotes, get_macro_indicators, get_stock_history,
     get_stock_dividends, get_fii_dividends, get_crypto_quotes, search_tickers
 )
 from chat_service import chat_with_agent, get_suggested_questions
 from simulator_service import simulate_investment, compare_scenarios
+from database import fechar_cliente_supabase
+
+
+def _encerrar_recursos():
+    """Fim do processo: pools de processos/threads, conexões do banco e snapshot pendente"""
+    encerrar_fila_uploads()
+    encerrar_pool()
+    encerrar_pools_pdf()
+    fechar_cliente_supabase()
+    obter_indice_categorias().gravar_snapshot_pendente()
+
+
+@asynccontextmanager
+async def ciclo_de_vida(app: FastAPI):
+    await iniciar_clientes_mercado()
+    try:
+        yield
+    finally:
+        await fechar_clientes_mercado()
+        # Bloqueante (espera os workers): fora do event loop
+        await run_in_threadpool(_encerrar_recursos)
+
+
+app = FastAPI(default_response_class=RespostaJSON, lifespan=ciclo_de_vida)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,6 +65,17 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressaoMiddleware)
+
+# ?formato=colunas nas listas grandes: um array por campo em vez de um objeto por linha
+FORMATO_LISTA = Query("linhas", pattern="^(linhas|colunas)$", description="linhas (padrão) ou colunas")
+
+def _json(conteudo, response: Optional[Response] = None) -> RespostaJSON:
+    """Resposta já serializada (sem jsonable_encoder), levando os cabeçalhos definidos em `response`"""
+    cabecalhos = None
+    if response is not None:
+        cabecalhos = {k: v for k, v in response.headers.items() if k != "content-length"}
+    return RespostaJSON(conteudo, headers=cabecalhos)
 
 class Transacao(BaseModel):
     data: str
@@ -42,23 +90,156 @@ class ProcessResult(BaseModel):
     message: str
     transacoes: List[Transacao]
     metricas: Optional[dict] = None
+    novas: Optional[int] = None
+    existentes: Optional[int] = None
+
+
+def _mensagem_salvamento(total: int, salvamento: Optional[dict]) -> str:
+    """Resumo do que foi encontrado e do que de fato entrou no banco."""
+    if not salvamento or "novas" not in salvamento:
+        return f"{total} transações encontradas e salvas."
+    return f"{total} transações encontradas: {salvamento['novas']} novas, {salvamento['existentes']} já importadas."
 
 @app.get("/api/health")
 def health_check():
-    return {"status": "ok", "version": "1.0.0"}
-
-from database import DatabaseManager
+    return {"status": "ok", "version": "1.0.0", "uploadJobs": fila_uploads_disponivel(),
+            "formatosExportacao": formatos_exportacao()}
+
+from storage import COLUNAS_TRANSACAO, StorageBackend, get_condicional_ativo, obter_armazenamento, obter_versao_dados
+
+def get_db() -> StorageBackend:
+    """Dependência: backend de armazenamento do processo (Supabase ou SQLite local)."""
+    return obter_armazenamento()
+
+def _nao_modificado(request: Request, response: Response, *tabelas: str) -> Optional[Response]:
+    """
+    GET condicional: ETag/Last-Modified da versão dos dados das tabelas. Se o cliente já tem
+    esta versão (If-None-Match), devolve o 304 sem consultar o banco.
+    Desligado (sem validadores) se a versão do processo não vê todas as escritas.
+    """
+    if not get_condicional_ativo():
+        return None
+    etag, modificado = obter_versao_dados().validadores(*tabelas)
+    # no-cache: o navegador guarda a resposta mas revalida sempre (com If-None-Match)
+    cabecalhos = {"ETag": etag, "Last-Modified": modificado, "Cache-Control": "private, no-cache"}
+    response.headers.update(cabecalhos)
+
+    # Só If-None-Match: If-Modified-Since tem resolução de 1s e perderia escritas no mesmo segundo
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return None
+    # Comparação fraca: ignora o prefixo W/
+    etags = {e.strip().removeprefix("W/") for e in if_none_match.split(",")}
+    if "*" in etags or etag.removeprefix("W/") in etags:
+        return Response(status_code=304, headers=cabecalhos)
+    return None
+
+class FiltrosTransacoes:
+    """Filtros e projeção comuns à listagem e à exportação de transações"""
+
+    def __init__(
+        self,
+        data_inicio: Optional[date] = None,
+        data_fim: Optional[date] = None,
+        categoria: Optional[List[str]] = Query(None),
+        tipo: Optional[List[str]] = Query(None),
+        fonte: Optional[List[str]] = Query(None),
+        valor_min: Optional[float] = None,
+        valor_max: Optional[float] = None,
+        busca: Optional[str] = Query(None, max_length=100, description="Trecho da descrição ou da categoria"),
+        investimentos: bool = Query(False, description="Só categoria Investimentos ou tipo Investimento"),
+        campos: Optional[str] = Query(None, description="Colunas separadas por vírgula (ex: data,descricao,valor)"),
+    ):
+        self.colunas = None
+        if campos:
+            self.colunas = [c.strip() for c in campos.split(",") if c.strip()]
+            invalidas = [c for c in self.colunas if c not in COLUNAS_TRANSACAO]
+            if invalidas:
+                raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalidas)}")
+        # Argumentos de StorageBackend.get_transactions_page (menos limite, cursor e campos)
+        self.filtros = {
+            "data_inicio": data_inicio, "data_fim": data_fim,
+            "categorias": categoria, "tipos": tipo, "fontes": fonte,
+            "valor_min": valor_min, "valor_max": valor_max,
+            "busca": busca.strip() if busca and busca.strip() else None,
+            "investimentos": investimentos,
+        }
 
 @app.get("/api/transactions")
-def get_transactions():
-    db = DatabaseManager()
-    if not db.client:
-        return {"message": "Banco de dados não conectado", "data": []}
-    return db.get_transactions()
+def get_transactions(
+    request: Request,
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000, description="Transações por página"),
+    cursor: Optional[str] = Query(None, description="next_cursor da página anterior"),
+    filtros: FiltrosTransacoes = Depends(),
+    formato: str = FORMATO_LISTA,
+    db: StorageBackend = Depends(get_db),
+):
+    """Transações paginadas por cursor (mais recentes primeiro), com filtros e projeção no banco."""
+    nao_modificado = _nao_modificado(request, response, "transacoes")
+    if nao_modificado:
+        return nao_modificado
+    if not db.conectado:
+        return {"message": "Banco de dados não conectado", "items": [], "next_cursor": None}
+    
+    try:
+        items, next_cursor = db.get_transactions_page(limit, cursor, campos=filtros.colunas, **filtros.filtros)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao buscar transações: {e}")
+    if formato == "colunas":
+        items = colunar(items, filtros.colunas or list(COLUNAS_TRANSACAO))
+    return _json({"items": items, "next_cursor": next_cursor}, response)
+
+@app.get("/api/transactions/totals")
+def get_transactions_totals(
+    request: Request,
+    response: Response,
+    filtros: FiltrosTransacoes = Depends(),
+    db: StorageBackend = Depends(get_db),
+):
+    """Receitas, despesas e saldo de todas as transações dos filtros da listagem (não só das páginas carregadas)."""
+    nao_modificado = _nao_modificado(request, response, "transacoes")
+    if nao_modificado:
+        return nao_modificado
+    try:
+        return _json(db.get_transactions_totals(**filtros.filtros), response)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao calcular totais: {e}")
+
+@app.get("/api/transactions/export")
+def export_transactions(
+    # Sem o pyarrow o parquet nem aparece no schema: é recusado na validação (422)
+    formato: str = Query("csv", alias="format", pattern=f"^({'|'.join(formatos_exportacao())})$",
+                         description=" ou ".join(formatos_exportacao())),
+    filtros: FiltrosTransacoes = Depends(),
+    db: StorageBackend = Depends(get_db),
+):
+    """Todas as transações filtradas em CSV ou Parquet, em streaming (memória constante)."""
+    if not db.conectado:
+        raise HTTPException(status_code=503, detail="Banco de dados não conectado")
+
+    campos = filtros.colunas or list(COLUNAS_TRANSACAO)
+    paginas = paginas_transacoes(db, campos, **filtros.filtros)
+    try:
+        # A primeira página sai antes da resposta: erro do banco vira 500, não um arquivo cortado
+        primeira = next(paginas, [])
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao exportar transações: {e}")
+    todas = itertools.chain([primeira], paginas)
+
+    tipo_conteudo, extensao = FORMATOS_EXPORTACAO[formato]
+    corpo = exportar_csv(todas, campos) if formato == "csv" else exportar_parquet(todas, campos)
+    nome = f"transacoes-{date.today().isoformat()}.{extensao}"
+    return StreamingResponse(corpo, media_type=tipo_conteudo,
+                             headers={"Content-Disposition": f'attachment; filename="{nome}"'})
 
 @app.get("/api/categories")
-def get_categories():
-    db = DatabaseManager()
+def get_categories(request: Request, response: Response, db: StorageBackend = Depends(get_db)):
+    nao_modificado = _nao_modificado(request, response, "categorias")
+    if nao_modificado:
+        return nao_modificado
     return db.get_categories()
 
 class CategoryModel(BaseModel):
@@ -66,8 +247,7 @@ class CategoryModel(BaseModel):
     tipo: str
 
 @app.post("/api/categories")
-def add_category(cat: CategoryModel):
-    db = DatabaseManager()
+def add_category(cat: CategoryModel, db: StorageBackend = Depends(get_db)):
     try:
         db.add_category(cat.nome, cat.tipo)
         return {"message": "Categoria adicionada"}
@@ -75,20 +255,17 @@ def add_category(cat: CategoryModel):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/categories/{id}")
-def delete_category(id: str):
-    db = DatabaseManager()
+def delete_category(id: str, db: StorageBackend = Depends(get_db)):
     db.delete_category(id)
     return {"message": "Categoria removida"}
 
 @app.put("/api/categories/{id}")
-def update_category(id: str, cat: CategoryModel):
-    db = DatabaseManager()
+def update_category(id: str, cat: CategoryModel, db: StorageBackend = Depends(get_db)):
     db.update_category(id, cat.nome, cat.tipo)
     return {"message": "Categoria atualizada"}
 
 @app.post("/api/transactions")
-def add_transaction(t: Transacao):
-    db = DatabaseManager()
+def add_transaction(t: Transacao, db: StorageBackend = Depends(get_db)):
     try:
         # Convert Pydantic model to dict
         db.add_manual_transaction(t.dict())
@@ -97,14 +274,12 @@ def add_transaction(t: Transacao):
         raise HTTPException(status_code=400, detail=str(e))
 
 @app.delete("/api/transactions/{id}")
-def delete_transaction(id: str):
-    db = DatabaseManager()
+def delete_transaction(id: str, db: StorageBackend = Depends(get_db)):
     db.delete_transaction(id)
     return {"message": "Transação removida"}
 
 @app.delete("/api/transactions-all")
-def delete_all_transactions():
-    db = DatabaseManager()
+def delete_all_transactions(db: StorageBackend = Depends(get_db)):
     db.delete_all_transactions()
     return {"message": "Todas as transações foram removidas"}
 
@@ -117,49 +292,209 @@ class UpdateTransactionModel(BaseModel):
     data_vencimento: Optional[str] = None
 
 @app.put("/api/transactions/{id}")
-def update_transaction(id: str, t: UpdateTransactionModel):
-    db = DatabaseManager()
+def update_transaction(id: str, t: UpdateTransactionModel, db: StorageBackend = Depends(get_db)):
     # Filter only provided fields
     data_to_update = {k: v for k, v in t.dict().items() if v is not None}
     if data_to_update:
-        db.update_transaction(id, data_to_update)
+        response = db.update_transaction(id, data_to_update)
+        if "categoria" in data_to_update and response is not None:
+            _aprender_categoria(db, response, data_to_update["categoria"])
     return {"message": "Transação atualizada"}
 
+def _aprender_categoria(db: StorageBackend, linhas: list, categoria: str):
+    """Correção de categoria: a próxima importação do mesmo estabelecimento já vem certa"""
+    if not linhas:
+        return
+    indice = _aquecer_indice_categorias(db)
+    correcoes = dict(filter(None, (indice.aprender(linha.get("descricao"), categoria) for linha in linhas)))
+    try:
+        db.save_learned_categories(list(correcoes.items()))
+    except Exception as e:
+        # A transação já foi alterada: a correção vale neste processo e no snapshot
+        print(f"Aviso: correção de categoria não gravada no banco ({e})")
+    indice.agendar_snapshot()
+
+# Máximo de ids por chamada dos endpoints em massa
+MAX_IDS_BULK = 5000
+
+class BulkUpdateModel(BaseModel):
+    ids: List[str]
+    changes: UpdateTransactionModel
+
+class BulkDeleteModel(BaseModel):
+    ids: List[str]
+
+def _validar_ids(ids: List[str]) -> List[str]:
+    if len(ids) > MAX_IDS_BULK:
+        raise HTTPException(status_code=400, detail=f"Máximo de {MAX_IDS_BULK} transações por chamada")
+    try:
+        return list(dict.fromkeys(str(uuid.UUID(i)) for i in ids))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Id de transação inválido")
+
+@app.post("/api/transactions/bulk-update")
+def bulk_update_transactions(req: BulkUpdateModel, db: StorageBackend = Depends(get_db)):
+    """Aplica as mesmas alterações (ex: nova categoria) a várias transações em uma chamada."""
+    ids = _validar_ids(req.ids)
+    data_to_update = {k: v for k, v in req.changes.dict().items() if v is not None}
+    if not ids or not data_to_update:
+        return {"message": "Nada para atualizar", "atualizadas": 0}
+    try:
+        linhas = db.bulk_update_transactions(ids, data_to_update)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao atualizar transações: {e}")
+    if "categoria" in data_to_update:
+        _aprender_categoria(db, linhas, data_to_update["categoria"])
+    return {"message": f"{len(linhas)} transações atualizadas", "atualizadas": len(linhas)}
+
+@app.post("/api/transactions/bulk-delete")
+def bulk_delete_transactions(req: BulkDeleteModel, db: StorageBackend = Depends(get_db)):
+    """Remove várias transações em uma chamada."""
+    ids = _validar_ids(req.ids)
+    if not ids:
+        return {"message": "Nada para remover", "removidas": 0}
+    try:
+        removidas = db.bulk_delete_transactions(ids)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Erro ao remover transações: {e}")
+    return {"message": f"{removidas} transações removidas", "removidas": removidas}
+
+def _aquecer_indice_categorias(db: StorageBackend):
+    """Índice de categorias aprendidas do processo, carregado do snapshot ou das correções gravadas na primeira vez."""
+    indice = obter_indice_categorias()
+    if db.conectado:
+        indice.aquecer(db.get_learned_categories)
+    return indice
+
 @app.get("/api/dashboard-charts")
-def get_dashboard_charts():
-    db = DatabaseManager()
-    return db.get_dashboard_data()
+def get_dashboard_charts(request: Request, response: Response,
+                         data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                         db: StorageBackend = Depends(get_db)):
+    """Gráficos e métricas do dashboard, a partir do rollup mensal (período opcional, por mês)."""
+    nao_modificado = _nao_modificado(request, response, "transacoes")
+    if nao_modificado:
+        return nao_modificado
+    return db.get_dashboard_data(data_inicio, data_fim)
 
 @app.post("/api/process-upload", response_model=ProcessResult)
-async def process_upload(file: UploadFile = File(...)):
+async def process_upload(file: UploadFile = File(...), db: StorageBackend = Depends(get_db)):
     if not file.filename:
         raise HTTPException(status_code=400, detail="Arquivo sem nome")
+    if not ProcessadorExtratos.tipo_arquivo(file.filename):
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use PDF ou CSV.")
     
     contents = await file.read()
-    processador = ProcessadorExtratos()
-    db = DatabaseManager()
+    categorias = await run_in_threadpool(db.get_categories)
+    await run_in_threadpool(_aquecer_indice_categorias, db)
+    processador = ProcessadorExtratos(sorted(c["nome"] for c in categorias))
     
     try:
-        transacoes = []
-        if file.filename.endswith('.pdf'):
-            transacoes = processador.processar_pdf(contents)
-        elif file.filename.endswith('.csv'):
-            transacoes = processador.processar_csv(contents)
-        else:
-            raise HTTPException(status_code=400, detail="Formato não suportado. Use PDF ou CSV.")
+        # Parse e insert rodam no threadpool para não travar o event loop
+        # (reenvio do mesmo arquivo sai do cache de parse)
+        transacoes = await run_in_threadpool(processador.processar_arquivo, file.filename, contents)
             
-        # Salva no banco se estiver configurado
-        if db.client:
-            db.save_transactions(transacoes)
+        # Salva no banco se estiver configurado (só as que ainda não foram importadas)
+        salvamento = None
+        if db.conectado:
+            salvamento = await run_in_threadpool(db.save_transactions, transacoes)
             
         return {
-            "message": f"Processado com sucesso. {len(transacoes)} transações encontradas e salvas.",
-            "transacoes": transacoes
+            "message": f"Processado com sucesso. {_mensagem_salvamento(len(transacoes), salvamento)}",
+            "transacoes": transacoes,
+            **(salvamento or {}),
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/upload-jobs", status_code=202)
+async def create_upload_job(file: UploadFile = File(...), db: StorageBackend = Depends(get_db)):
+    """Enfileira o processamento de um extrato e retorna o id do job para acompanhar em /api/jobs/{id}."""
+    fila = obter_fila_uploads()
+    if fila is None:
+        raise HTTPException(status_code=501, detail="Fila de uploads desligada (UPLOAD_JOB_STORE). Use /api/process-upload.")
+    if not file.filename:
+        raise HTTPException(status_code=400, detail="Arquivo sem nome")
+    if not ProcessadorExtratos.tipo_arquivo(file.filename):
+        raise HTTPException(status_code=400, detail="Formato não suportado. Use PDF ou CSV.")
+    
+    contents = await file.read()
+    categorias = await run_in_threadpool(db.get_categories)
+    await run_in_threadpool(_aquecer_indice_categorias, db)
+    
+    def salvar(transacoes):
+        if db.conectado and transacoes:
+            return db.save_transactions(transacoes)
+    
+    job_id = fila.enfileirar(file.filename, contents, sorted(c["nome"] for c in categorias), salvar)
+    return {"job_id": job_id, "status": "pendente"}
+
+@app.get("/api/jobs/{job_id}")
+def get_upload_job(job_id: str):
+    """Status e progresso (páginas processadas, transações encontradas) de um job de upload."""
+    fila = obter_fila_uploads()
+    job = fila.obter(job_id) if fila is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return job
+
+class BatchFileResult(BaseModel):
+    arquivo: str
+    status: str
+    transacoes: List[Transacao]
+    erro: Optional[str] = None
+
+class BatchProcessResult(BaseModel):
+    message: str
+    arquivos: List[BatchFileResult]
+    total_transacoes: int
+    novas: Optional[int] = None
+    existentes: Optional[int] = None
+
+@app.post("/api/process-upload/batch", response_model=BatchProcessResult)
+async def process_upload_batch(files: List[UploadFile] = File(...), db: StorageBackend = Depends(get_db)):
+    """Processa vários extratos (PDF/CSV, ou um ZIP com eles) de uma vez."""
+    arquivos = []
+    for file in files:
+        if not file.filename:
+            raise HTTPException(status_code=400, detail="Arquivo sem nome")
+        if not (ProcessadorExtratos.tipo_arquivo(file.filename) or file.filename.lower().endswith(".zip")):
+            raise HTTPException(status_code=400, detail=f"Formato não suportado: {file.filename}. Use PDF, CSV ou ZIP.")
+        arquivos.append((file.filename, await file.read()))
+    
+    categorias = sorted(c["nome"] for c in await run_in_threadpool(db.get_categories))
+    await run_in_threadpool(_aquecer_indice_categorias, db)
+    
+    try:
+        # Parse em paralelo fora do event loop
+        resultados = await run_in_threadpool(processar_lote, arquivos, categorias)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    todas = [t for r in resultados for t in r["transacoes"]]
+    salvamento = None
+    try:
+        # Um único insert em massa para o lote inteiro
+        if db.conectado and todas:
+            salvamento = await run_in_threadpool(db.save_transactions, todas)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    com_erro = sum(1 for r in resultados if r["status"] == "erro")
+    return {
+        "message": f"{len(resultados) - com_erro} de {len(resultados)} arquivos processados. {_mensagem_salvamento(len(todas), salvamento)}",
+        "arquivos": resultados,
+        "total_transacoes": len(todas),
+        **(salvamento or {}),
+    }
+
+
+@app.get("/api/parse-cache/stats")
+def parse_cache_stats():
+    """Estatísticas do cache de parse de uploads (hits, misses, tamanho)."""
+    return obter_cache_parse().estatisticas()
+
+
 # =============================================
 # AGENTE DE INVESTIMENTOS — NOVOS ENDPOINTS
 # =============================================
@@ -220,15 +555,15 @@ class ChatRequest(BaseModel):
 
 
 @app.post("/api/agent/chat")
-async def agent_chat(req: ChatRequest):
+async def agent_chat(req: ChatRequest, db: StorageBackend = Depends(get_db)):
     """Chat com o assistente de investimentos IA."""
     # Se contexto não foi enviado, buscar dados do usuário automaticamente
     context = req.context
     if not context:
         try:
-            db = DatabaseManager()
-            dashboard_data = db.get_dashboard_data()
-            transactions = db.get_transactions()
+            # Leituras síncronas (banco, disco): fora do event loop
+            dashboard_data = await run_in_threadpool(db.get_dashboard_data)
+            transactions = await run_in_threadpool(db.get_transactions)
             investments = [
                 t for t in transactions
                 if t.get("categoria") == "Investimentos" or t.get("tipo") == "Investimento"
@@ -265,14 +600,14 @@ class SimulateRequest(BaseModel):
 
 
 @app.post("/api/agent/simulate")
-def agent_simulate(req: SimulateRequest):
-    """Simula a evolução de um investimento."""
+def agent_simulate(req: SimulateRequest, formato: str = FORMATO_LISTA):
+    """Simula a evolução de um investimento (série de até 600 meses)."""
     if req.meses < 1 or req.meses > 600:
         raise HTTPException(status_code=400, detail="Período deve ser entre 1 e 600 meses")
     if req.aporte_inicial < 0 or req.aporte_mensal < 0:
         raise HTTPException(status_code=400, detail="Valores de aporte não podem ser negativos")
 
-    return simulate_investment(
+    simulacao = simulate_investment(
         aporte_inicial=req.aporte_inicial,
         aporte_mensal=req.aporte_mensal,
         taxa_anual=req.taxa_anual,
@@ -280,6 +615,9 @@ def agent_simulate(req: SimulateRequest):
         indexador=req.indexador,
         taxa_indexador=req.taxa_indexador,
     )
+    if formato == "colunas":
+        simulacao["serie"] = colunar(simulacao["serie"])
+    return _json(simulacao)
 
 
 class CompareRequest(BaseModel):
@@ -0,0 +1,198 @@
+"""
+Índice aprendido de descrição -> categoria.
+Quando o usuário corrige a categoria de uma transação, a descrição normalizada
+passa a apontar para a categoria escolhida; na próxima importação do mesmo
+estabelecimento a categoria sai de um lookup O(1), antes das palavras-chave.
+
+Só correções do usuário entram: elas ficam gravadas em `categorias_aprendidas`
+(StorageBackend.save_learned_categories), de onde o índice é aquecido. As categorias
+atribuídas pelas palavras-chave não, senão uma regra nova nunca venceria a antiga.
+
+O índice é limitado (LRU); um snapshot em disco evita reler as correções a cada cold
+start. A gravação do snapshot é adiada (CATEGORIAS_APRENDIDAS_SNAPSHOT_ATRASO segundos)
+para juntar várias correções seguidas em uma escrita só.
+"""
+
+import gzip
+import json
+import os
+import re
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from categorizer import CATEGORIA_PADRAO, normalizar_texto
+
+CATEGORIAS_APRENDIDAS_MAX = int(os.environ.get("CATEGORIAS_APRENDIDAS_MAX", "50000"))
+CATEGORIAS_APRENDIDAS_SNAPSHOT_ATRASO = float(os.environ.get("CATEGORIAS_APRENDIDAS_SNAPSHOT_ATRASO", "30"))
+CATEGORIAS_APRENDIDAS_SNAPSHOT = os.environ.get(
+    "CATEGORIAS_APRENDIDAS_SNAPSHOT",
+    os.path.join(tempfile.gettempdir(), "controle-financeiro", "categorias-aprendidas.json.gz"),
+)
+
+# Formato do snapshot. 2: só correções do usuário (a lista solta da versão 1 também
+# trazia as categorias das palavras-chave e é descartada)
+_VERSAO_SNAPSHOT = 2
+
+# Números (ids de pedido, datas, parcelas "3/10") variam entre compras no mesmo estabelecimento
+_NUMEROS = re.compile(r"\d+")
+_SEPARADORES = re.compile(r"[\W_]+")
+
+
+def normalizar_descricao(descricao: str) -> str:
+    """Chave do índice: sem acentos, minúscula, sem números e pontuação ("UBER *TRIP 1234" -> "uber trip")."""
+    texto = _NUMEROS.sub(" ", normalizar_texto(descricao or ""))
+    return _SEPARADORES.sub(" ", texto).strip()
+
+
+class IndiceCategorias:
+    def __init__(self, max_itens: int = CATEGORIAS_APRENDIDAS_MAX, arquivo_snapshot: Optional[str] = CATEGORIAS_APRENDIDAS_SNAPSHOT,
+                 atraso_snapshot: float = CATEGORIAS_APRENDIDAS_SNAPSHOT_ATRASO):
+        self.max_itens = max_itens
+        self.arquivo_snapshot = arquivo_snapshot
+        self.atraso_snapshot = atraso_snapshot
+        self._itens: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self._timer_snapshot: Optional[threading.Timer] = None
+        self.aquecido = False
+
+    def obter(self, descricao: str) -> Optional[str]:
+        """Categoria aprendida para a descrição, ou None"""
+        chave = normalizar_descricao(descricao)
+        with self._lock:
+            categoria = self._itens.get(chave)
+            if categoria is not None:
+                self._itens.move_to_end(chave)
+            return categoria
+
+    def aprender(self, descricao: str, categoria: Optional[str]) -> Optional[tuple[str, Optional[str]]]:
+        """
+        Registra a categoria escolhida pelo usuário (None/"A Categorizar" esquece a descrição).
+        Retorna o par (chave, categoria ou None) para gravar em categorias_aprendidas.
+        """
+        chave = normalizar_descricao(descricao)
+        if not chave:
+            return None
+        with self._lock:
+            self._guardar(chave, categoria)
+        return chave, (categoria if categoria and categoria != CATEGORIA_PADRAO else None)
+
+    def _guardar(self, chave: str, categoria: Optional[str]):
+        if not categoria or categoria == CATEGORIA_PADRAO:
+            self._itens.pop(chave, None)
+            return
+        self._itens[chave] = categoria
+        self._itens.move_to_end(chave)
+        while len(self._itens) > self.max_itens:
+            self._itens.popitem(last=False)
+
+    def aplicar(self, transacoes: list) -> int:
+        """Sobrescreve a categoria das transações com as aprendidas. Retorna quantas mudaram."""
+        alteradas = 0
+        with self._lock:
+            if not self._itens:
+                return 0
+            for t in transacoes:
+                chave = normalizar_descricao(t.get("descricao"))
+                categoria = self._itens.get(chave)
+                if categoria is not None and categoria != t.get("categoria"):
+                    self._itens.move_to_end(chave)
+                    t["categoria"] = categoria
+                    alteradas += 1
+        return alteradas
+
+    def carregar(self, pares: Iterable[tuple[str, str]]):
+        """Carrega pares (chave normalizada, categoria) do mais antigo para o mais recente (o último vence)"""
+        with self._lock:
+            for chave, categoria in pares:
+                if chave:
+                    self._guardar(chave, categoria)
+
+    def aquecer(self, carregar_correcoes: Callable[[], Iterable[tuple[str, str]]]):
+        """
+        Carrega o índice uma vez por processo: do snapshot em disco se existir,
+        senão das correções gravadas (e grava o snapshot para os próximos cold starts).
+        """
+        if self.aquecido:
+            return
+        if not self.carregar_snapshot():
+            pares = list(carregar_correcoes())
+            self.carregar(pares)
+            # Nenhuma correção (ou banco fora do ar) não vira snapshot: tenta de novo no próximo cold start
+            if pares:
+                self.salvar_snapshot()
+        self.aquecido = True
+
+    def carregar_snapshot(self) -> bool:
+        if not self.arquivo_snapshot:
+            return False
+        try:
+            with gzip.open(self.arquivo_snapshot, "rt", encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"Aviso: snapshot de categorias aprendidas inválido ({e})")
+            return False
+        if not isinstance(snapshot, dict) or snapshot.get("versao") != _VERSAO_SNAPSHOT:
+            return False  # formato antigo: recarrega das correções gravadas
+        pares = snapshot["pares"]
+        # O snapshot guarda as chaves já normalizadas, do menos ao mais usado
+        self.carregar(pares)
+        return True
+
+    def agendar_snapshot(self):
+        """Grava o snapshot daqui a atraso_snapshot segundos (as correções até lá vão juntas)"""
+        if not self.arquivo_snapshot:
+            return
+        with self._lock:
+            if self._timer_snapshot is not None:
+                return
+            self._timer_snapshot = threading.Timer(self.atraso_snapshot, self._snapshot_agendado)
+            self._timer_snapshot.daemon = True
+            self._timer_snapshot.start()
+
+    def _snapshot_agendado(self):
+        with self._lock:
+            self._timer_snapshot = None
+        self.salvar_snapshot()
+
+    def gravar_snapshot_pendente(self):
+        """Grava já o snapshot agendado, se houver (shutdown da API)"""
+        with self._lock:
+            timer, self._timer_snapshot = self._timer_snapshot, None
+        if timer is not None:
+            timer.cancel()
+            self.salvar_snapshot()
+
+    def salvar_snapshot(self):
+        if not self.arquivo_snapshot:
+            return
+        with self._lock:
+            pares = list(self._itens.items())
+        temporario = f"{self.arquivo_snapshot}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(self.arquivo_snapshot), exist_ok=True)
+            with gzip.open(temporario, "wt", encoding="utf-8") as f:
+                json.dump({"versao": _VERSAO_SNAPSHOT, "pares": pares}, f, ensure_ascii=False)
+            os.replace(temporario, self.arquivo_snapshot)  # escrita atômica
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar o snapshot de categorias aprendidas ({e})")
+
+    def __len__(self):
+        return len(self._itens)
+
+
+_indice: Optional[IndiceCategorias] = None
+_indice_lock = threading.Lock()
+
+
+def obter_indice_categorias() -> IndiceCategorias:
+    """Índice compartilhado pelo processo"""
+    global _indice
+    if _indice is None:
+        with _indice_lock:
+            if _indice is None:
+                _indice = IndiceCategorias()
+    return _indice
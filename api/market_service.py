@@ -3,11 +3,15 @@ Serviço de dados de mercado financeiro brasileiro.
 Usa a API brapi.dev (v2) para cotações, indicadores macro,
 histórico, FIIs, cripto, câmbio e fundamentos.
 Cache em memória de 5 minutos para respeitar rate limits.
+Um cliente HTTP (HTTP/2, keep-alive) por host, aberto no startup da API e
+reaproveitado por todas as chamadas.
 
 Documentação: https://brapi.dev/docs
 """
 
+import asyncio
 import os
+import threading
 import time
 import httpx
 from typing import Optional
@@ -15,25 +19,47 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-BRAPI_BASE_URL = "https://brapi.dev/api"
+BRAPI_BASE_URL = os.environ.get("BRAPI_BASE_URL", "https://brapi.dev/api")
 BRAPI_TOKEN = os.environ.get("BRAPI_TOKEN", "")
+BCB_BASE_URL = os.environ.get("BCB_BASE_URL", "https://api.bcb.gov.br")
+
+# Pool de conexões por host upstream
+MERCADO_MAX_CONEXOES = int(os.environ.get("MERCADO_MAX_CONEXOES", "20"))
+MERCADO_KEEPALIVE_S = float(os.environ.get("MERCADO_KEEPALIVE_S", "60"))
+MERCADO_HTTP2 = os.environ.get("MERCADO_HTTP2", "1") != "0"
+
+# nome -> (base_url, timeout em segundos)
+_UPSTREAMS = {
+    "brapi": (BRAPI_BASE_URL, 15.0),
+    "bcb": (BCB_BASE_URL, 10.0),
+}
+
+# nome -> (loop, cliente): o pool de conexões de um AsyncClient só vale no loop em que foi criado
+_clientes: dict = {}
+_clientes_lock = threading.Lock()
+# Fechamentos em andamento de clientes substituídos (referência forte até terminarem)
+_fechamentos: set = set()
 
 # Cache simples em memória: { key: { "data": ..., "timestamp": ... } }
 _cache: dict = {}
 CACHE_TTL = 300  # 5 minutos
 
+# Indicadores macro: tempo máximo de cada busca e cache de uma resposta incompleta
+MACRO_TIMEOUT = float(os.environ.get("MACRO_TIMEOUT", "5"))
+MACRO_CACHE_PARCIAL_TTL = 30
+
 
 def _get_cache(key: str) -> Optional[dict]:
     """Retorna dados do cache se ainda válidos."""
     entry = _cache.get(key)
-    if entry and (time.time() - entry["timestamp"]) < CACHE_TTL:
+    if entry and (time.time() - entry["timestamp"]) < entry.get("ttl", CACHE_TTL):
         return entry["data"]
     return None
 
 
-def _set_cache(key: str, data: dict):
+def _set_cache(key: str, data: dict, ttl: float = CACHE_TTL):
     """Armazena dados no cache."""
-    _cache[key] = {"data": data, "timestamp": time.time()}
+    _cache[key] = {"data": data, "timestamp": time.time(), "ttl": ttl}
 
 
 def _headers() -> dict:
@@ -43,6 +69,73 @@ def _headers() -> dict:
     return {}
 
 
+def _criar_cliente(nome: str, **opcoes) -> httpx.AsyncClient:
+    base_url, timeout = _UPSTREAMS[nome]
+    limites = httpx.Limits(
+        max_connections=MERCADO_MAX_CONEXOES,
+        max_keepalive_connections=MERCADO_MAX_CONEXOES,
+        keepalive_expiry=MERCADO_KEEPALIVE_S,
+    )
+    return httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limites, http2=MERCADO_HTTP2, **opcoes)
+
+
+def _cliente(nome: str) -> httpx.AsyncClient:
+    """Cliente compartilhado do host (criado na primeira chamada se o startup não o abriu)"""
+    loop = asyncio.get_running_loop()
+    anterior = None
+    # Lock: loops em threads diferentes (asyncio.run em worker) podem chegar aqui juntos
+    with _clientes_lock:
+        atual = _clientes.get(nome)
+        if atual is None or atual[0] is not loop or atual[1].is_closed:
+            anterior = atual
+            atual = _clientes[nome] = (loop, _criar_cliente(nome))
+    if anterior is not None:
+        _descartar(*anterior)
+    return atual[1]
+
+
+def _descartar(dono: asyncio.AbstractEventLoop, cliente: httpx.AsyncClient):
+    """Fecha o pool de um cliente que saiu de _clientes, no loop dele se ainda estiver rodando"""
+    if cliente.is_closed:
+        return
+    loop = asyncio.get_running_loop()
+    if dono is not loop and dono.is_running():
+        asyncio.run_coroutine_threadsafe(cliente.aclose(), dono)
+        return
+    # Loop do dono encerrado: fecha por aqui (as conexões que não fecharem ficam para o GC)
+    tarefa = loop.create_task(cliente.aclose())
+    _fechamentos.add(tarefa)
+    tarefa.add_done_callback(_fechamento_concluido)
+
+
+def _fechamento_concluido(tarefa: asyncio.Task):
+    _fechamentos.discard(tarefa)
+    if not tarefa.cancelled() and tarefa.exception() is not None:
+        print(f"Aviso: cliente HTTP antigo não fechou ({tarefa.exception()})")
+
+
+async def iniciar_clientes_mercado():
+    """Abre os clientes de todos os hosts (startup da API)"""
+    for nome in _UPSTREAMS:
+        _cliente(nome)
+
+
+async def fechar_clientes_mercado():
+    """Fecha os pools de conexões (shutdown da API)"""
+    loop = asyncio.get_running_loop()
+    with _clientes_lock:
+        clientes = list(_clientes.values())
+        _clientes.clear()
+    for dono, cliente in clientes:
+        if dono is loop:
+            await cliente.aclose()
+        else:
+            _descartar(dono, cliente)
+    pendentes = [tarefa for tarefa in _fechamentos if tarefa.get_loop() is loop]
+    if pendentes:
+        await asyncio.gather(*pendentes, return_exceptions=True)
+
+
 def _extract_quote(result: dict) -> dict:
     """Extrai dados de cotação de um resultado da brapi v2.
     Na v2 os dados ficam em results[].data para /v2/stocks/quote,
@@ -82,19 +175,19 @@ async def get_stock_quotes(symbols: list[str]) -> dict:
 
     symbols_str = ",".join(symbols)
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/stocks/quote",
-                headers=_headers(),
-                params={"symbols": symbols_str}
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            quotes = [_extract_quote(r) for r in data.get("results", [])]
-            result_data = {"quotes": quotes, "requestedAt": time.time()}
-            _set_cache(cache_key, result_data)
-            return result_data
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/stocks/quote",
+            headers=_headers(),
+            params={"symbols": symbols_str}
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        quotes = [_extract_quote(r) for r in data.get("results", [])]
+        result_data = {"quotes": quotes, "requestedAt": time.time()}
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except httpx.HTTPStatusError as e:
         return {"error": f"Erro na API brapi: {e.response.status_code}", "quotes": []}
@@ -113,47 +206,47 @@ async def get_stock_history(symbol: str, range_period: str = "1mo") -> dict:
         return cached
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/stocks/historical",
-                headers=_headers(),
-                params={
-                    "symbols": symbol,
-                    "range": range_period,
-                    "interval": "1d",
-                }
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("results", [])
-            if not results:
-                return {"symbol": symbol, "history": [], "error": "Nenhum dado encontrado"}
-
-            result = results[0]
-            # Na v2, os dados ficam aninhados
-            result_data_inner = result.get("data", result)
-            history_prices = result_data_inner.get("historicalDataPrice", [])
-
-            history = []
-            for point in history_prices:
-                history.append({
-                    "date": point.get("date", 0),
-                    "open": point.get("open", 0),
-                    "high": point.get("high", 0),
-                    "low": point.get("low", 0),
-                    "close": point.get("close", 0),
-                    "volume": point.get("volume", 0),
-                })
-
-            result_data = {
-                "symbol": symbol,
-                "shortName": result_data_inner.get("shortName", symbol),
-                "history": history,
-                "currentPrice": result_data_inner.get("regularMarketPrice", 0),
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/stocks/historical",
+            headers=_headers(),
+            params={
+                "symbols": symbol,
+                "range": range_period,
+                "interval": "1d",
             }
-            _set_cache(cache_key, result_data)
-            return result_data
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        results = data.get("results", [])
+        if not results:
+            return {"symbol": symbol, "history": [], "error": "Nenhum dado encontrado"}
+
+        result = results[0]
+        # Na v2, os dados ficam aninhados
+        result_data_inner = result.get("data", result)
+        history_prices = result_data_inner.get("historicalDataPrice", [])
+
+        history = []
+        for point in history_prices:
+            history.append({
+                "date": point.get("date", 0),
+                "open": point.get("open", 0),
+                "high": point.get("high", 0),
+                "low": point.get("low", 0),
+                "close": point.get("close", 0),
+                "volume": point.get("volume", 0),
+            })
+
+        result_data = {
+            "symbol": symbol,
+            "shortName": result_data_inner.get("shortName", symbol),
+            "history": history,
+            "currentPrice": result_data_inner.get("regularMarketPrice", 0),
+        }
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except Exception as e:
         return {"symbol": symbol, "history": [], "error": str(e)}
@@ -170,29 +263,29 @@ async def get_stock_dividends(symbol: str) -> dict:
         return cached
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/stocks/dividends",
-                headers=_headers(),
-                params={"symbols": symbol}
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            results = data.get("results", [])
-            dividends = []
-            if results:
-                result_data_inner = results[0].get("data", results[0])
-                for d in result_data_inner.get("dividends", []):
-                    dividends.append({
-                        "date": d.get("paymentDate", d.get("date", "")),
-                        "value": d.get("value", 0),
-                        "type": d.get("type", "Dividendo"),
-                    })
-
-            result_data = {"symbol": symbol, "dividends": dividends}
-            _set_cache(cache_key, result_data)
-            return result_data
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/stocks/dividends",
+            headers=_headers(),
+            params={"symbols": symbol}
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        results = data.get("results", [])
+        dividends = []
+        if results:
+            result_data_inner = results[0].get("data", results[0])
+            for d in result_data_inner.get("dividends", []):
+                dividends.append({
+                    "date": d.get("paymentDate", d.get("date", "")),
+                    "value": d.get("value", 0),
+                    "type": d.get("type", "Dividendo"),
+                })
+
+        result_data = {"symbol": symbol, "dividends": dividends}
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except Exception as e:
         return {"symbol": symbol, "dividends": [], "error": str(e)}
@@ -214,26 +307,26 @@ async def get_fii_dividends(symbols: list[str]) -> dict:
 
     symbols_str = ",".join(symbols)
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/fii/dividends",
-                headers=_headers(),
-                params={"symbols": symbols_str}
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            fiis = []
-            for result in data.get("results", []):
-                result_data_inner = result.get("data", result)
-                fiis.append({
-                    "symbol": result.get("symbol", ""),
-                    "dividends": result_data_inner.get("dividends", []),
-                })
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/fii/dividends",
+            headers=_headers(),
+            params={"symbols": symbols_str}
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        fiis = []
+        for result in data.get("results", []):
+            result_data_inner = result.get("data", result)
+            fiis.append({
+                "symbol": result.get("symbol", ""),
+                "dividends": result_data_inner.get("dividends", []),
+            })
 
-            result_data = {"fiis": fiis, "requestedAt": time.time()}
-            _set_cache(cache_key, result_data)
-            return result_data
+        result_data = {"fiis": fiis, "requestedAt": time.time()}
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except Exception as e:
         return {"error": str(e), "fiis": []}
@@ -264,27 +357,27 @@ async def search_tickers(query: str = "", ticker_type: str = "") -> dict:
         if ticker_type:
             params["type"] = ticker_type
 
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/tickers",
-                headers=_headers(),
-                params=params
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            tickers = []
-            for t in data.get("results", data.get("tickers", []))[:50]:
-                tickers.append({
-                    "symbol": t.get("symbol", t.get("ticker", "")),
-                    "name": t.get("name", t.get("shortName", "")),
-                    "type": t.get("type", ""),
-                    "sector": t.get("sector", ""),
-                })
-
-            result_data = {"tickers": tickers, "total": len(tickers)}
-            _set_cache(cache_key, result_data)
-            return result_data
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/tickers",
+            headers=_headers(),
+            params=params
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        tickers = []
+        for t in data.get("results", data.get("tickers", []))[:50]:
+            tickers.append({
+                "symbol": t.get("symbol", t.get("ticker", "")),
+                "name": t.get("name", t.get("shortName", "")),
+                "type": t.get("type", ""),
+                "sector": t.get("sector", ""),
+            })
+
+        result_data = {"tickers": tickers, "total": len(tickers)}
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except Exception as e:
         return {"error": str(e), "tickers": [], "total": 0}
@@ -294,95 +387,95 @@ async def search_tickers(query: str = "", ticker_type: str = "") -> dict:
 # INDICADORES MACROECONÔMICOS
 # ==========================================
 
+async def _ibovespa() -> Optional[dict]:
+    resp = await _cliente("brapi").get("/v2/stocks/quote", headers=_headers(), params={"symbols": "^BVSP"})
+    resp.raise_for_status()
+    results = resp.json().get("results", [])
+    if not results:
+        return None
+    d = results[0].get("data", results[0])
+    return {
+        "name": "Ibovespa",
+        "value": d.get("regularMarketPrice", 0),
+        "change": d.get("regularMarketChange", 0),
+        "changePercent": d.get("regularMarketChangePercent", 0),
+        "type": "index"
+    }
+
+
+async def _dolar() -> Optional[dict]:
+    resp = await _cliente("brapi").get("/v2/currency", headers=_headers(), params={"currency": "USD-BRL"})
+    resp.raise_for_status()
+    currencies = resp.json().get("currency", [])
+    if not currencies:
+        return None
+    c = currencies[0]
+    return {
+        "name": "Dólar (USD/BRL)",
+        "value": float(c.get("bidPrice", 0)),
+        "change": 0,
+        "changePercent": float(c.get("pctChange", 0)),
+        "type": "currency"
+    }
+
+
+async def _serie_bcb(serie_id: str, nome: str) -> Optional[dict]:
+    """Último valor de uma série do SGS do Banco Central (gratuita, sem token)"""
+    resp = await _cliente("bcb").get(f"/dados/serie/bcdata.sgs.{serie_id}/dados/ultimos/1", params={"formato": "json"})
+    resp.raise_for_status()
+    resp_data = resp.json()
+    if not resp_data:
+        return None
+    return {
+        "name": nome,
+        "value": float(resp_data[-1].get("valor", 0)),
+        "change": 0,
+        "changePercent": 0,
+        "type": "rate"
+    }
+
+
+# chave -> busca do indicador
+_MACRO_INDICADORES = {
+    "ibovespa": _ibovespa,
+    "dolar": _dolar,
+    "selic": lambda: _serie_bcb("432", "Taxa Selic (a.a.)"),
+    "cdi": lambda: _serie_bcb("4391", "CDI (a.a.)"),
+    "ipca": lambda: _serie_bcb("433", "IPCA (mensal)"),
+}
+
+
+async def _buscar_indicador(key: str) -> tuple[str, Optional[dict], str]:
+    """(chave, indicador, status); status: ok, empty, timeout ou error"""
+    try:
+        indicator = await asyncio.wait_for(_MACRO_INDICADORES[key](), MACRO_TIMEOUT)
+    except asyncio.TimeoutError:
+        return key, None, "timeout"
+    except Exception:
+        return key, None, "error"
+    return key, indicator, "ok" if indicator else "empty"
+
+
 async def get_macro_indicators() -> dict:
     """
     Busca indicadores macroeconômicos: Selic, CDI, IPCA, Ibovespa, Dólar.
     Combina dados da brapi.dev e da API do Banco Central (SGS).
+    As cinco buscas rodam em paralelo, cada uma com seu timeout: um indicador lento
+    ou com erro fica de fora (status em "status") sem segurar os outros.
     """
     cached = _get_cache("macro_indicators")
     if cached:
         return cached
 
-    indicators = {}
+    resultados = await asyncio.gather(*(_buscar_indicador(key) for key in _MACRO_INDICADORES))
+    indicators = {key: indicator for key, indicator, _ in resultados if indicator}
+    status = {key: estado for key, _, estado in resultados}
 
-    try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            # --- Ibovespa via brapi v2 ---
-            try:
-                ibov_resp = await client.get(
-                    f"{BRAPI_BASE_URL}/v2/stocks/quote",
-                    headers=_headers(),
-                    params={"symbols": "^BVSP"}
-                )
-                if ibov_resp.status_code == 200:
-                    ibov_data = ibov_resp.json()
-                    results = ibov_data.get("results", [])
-                    if results:
-                        d = results[0].get("data", results[0])
-                        indicators["ibovespa"] = {
-                            "name": "Ibovespa",
-                            "value": d.get("regularMarketPrice", 0),
-                            "change": d.get("regularMarketChange", 0),
-                            "changePercent": d.get("regularMarketChangePercent", 0),
-                            "type": "index"
-                        }
-            except Exception:
-                pass
-
-            # --- Dólar via brapi v2 ---
-            try:
-                usd_resp = await client.get(
-                    f"{BRAPI_BASE_URL}/v2/currency",
-                    headers=_headers(),
-                    params={"currency": "USD-BRL"}
-                )
-                if usd_resp.status_code == 200:
-                    usd_data = usd_resp.json()
-                    currencies = usd_data.get("currency", [])
-                    if currencies:
-                        c = currencies[0]
-                        indicators["dolar"] = {
-                            "name": "Dólar (USD/BRL)",
-                            "value": float(c.get("bidPrice", 0)),
-                            "change": 0,
-                            "changePercent": float(c.get("pctChange", 0)),
-                            "type": "currency"
-                        }
-            except Exception:
-                pass
-
-        # --- Selic, CDI, IPCA via API do Banco Central (SGS) ---
-        # Estas APIs são 100% gratuitas, sem token
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            bcb_series = {
-                "selic": {"id": "432", "name": "Taxa Selic (a.a.)"},
-                "cdi": {"id": "4391", "name": "CDI (a.a.)"},
-                "ipca": {"id": "433", "name": "IPCA (mensal)"},
-            }
-            for key, serie in bcb_series.items():
-                try:
-                    resp = await client.get(
-                        f"https://api.bcb.gov.br/dados/serie/bcdata.sgs.{serie['id']}/dados/ultimos/1?formato=json"
-                    )
-                    if resp.status_code == 200:
-                        resp_data = resp.json()
-                        if resp_data:
-                            indicators[key] = {
-                                "name": serie["name"],
-                                "value": float(resp_data[-1].get("valor", 0)),
-                                "change": 0,
-                                "changePercent": 0,
-                                "type": "rate"
-                            }
-                except Exception:
-                    pass
-
-        result_data = {"indicators": indicators, "requestedAt": time.time()}
-        _set_cache("macro_indicators", result_data)
-        return result_data
-
-    except Exception as e:
-        return {"error": f"Erro ao buscar indicadores: {str(e)}", "indicators": {}}
+    result_data = {"indicators": indicators, "status": status, "requestedAt": time.time()}
+    # Resultado parcial fica pouco no cache: o indicador que falhou é tentado de novo logo
+    completo = all(estado == "ok" for estado in status.values())
+    _set_cache("macro_indicators", result_data, CACHE_TTL if completo else MACRO_CACHE_PARCIAL_TTL)
+    return result_data
 
 
 # ==========================================
@@ -403,31 +496,31 @@ async def get_crypto_quotes(symbols: list[str] = None) -> dict:
         return cached
 
     try:
-        async with httpx.AsyncClient(timeout=15.0) as client:
-            response = await client.get(
-                f"{BRAPI_BASE_URL}/v2/crypto",
-                headers=_headers(),
-                params={"coin": ",".join(symbols), "currency": "BRL"}
-            )
-            response.raise_for_status()
-            data = response.json()
-
-            coins = []
-            for result in data.get("coins", []):
-                coins.append({
-                    "symbol": result.get("coin", ""),
-                    "name": result.get("coinName", ""),
-                    "price": float(result.get("regularMarketPrice", 0)),
-                    "change": float(result.get("regularMarketChange", 0)),
-                    "changePercent": float(result.get("regularMarketChangePercent", 0)),
-                    "marketCap": float(result.get("marketCap", 0)),
-                    "volume": float(result.get("regularMarketVolume", 0)),
-                    "logo": result.get("coinImageUrl", ""),
-                })
-
-            result_data = {"coins": coins, "requestedAt": time.time()}
-            _set_cache(cache_key, result_data)
-            return result_data
+        client = _cliente("brapi")
+        response = await client.get(
+            "/v2/crypto",
+            headers=_headers(),
+            params={"coin": ",".join(symbols), "currency": "BRL"}
+        )
+        response.raise_for_status()
+        data = response.json()
+
+        coins = []
+        for result in data.get("coins", []):
+            coins.append({
+                "symbol": result.get("coin", ""),
+                "name": result.get("coinName", ""),
+                "price": float(result.get("regularMarketPrice", 0)),
+                "change": float(result.get("regularMarketChange", 0)),
+                "changePercent": float(result.get("regularMarketChangePercent", 0)),
+                "marketCap": float(result.get("marketCap", 0)),
+                "volume": float(result.get("regularMarketVolume", 0)),
+                "logo": result.get("coinImageUrl", ""),
+            })
+
+        result_data = {"coins": coins, "requestedAt": time.time()}
+        _set_cache(cache_key, result_data)
+        return result_data
 
     except Exception as e:
         return {"error": str(e), "coins": []}
@@ -0,0 +1,197 @@
+"""
+Cache de resultados de parse de extratos, endereçado pelo conteúdo do arquivo.
+A chave é o hash dos bytes + versão do parser (+ contexto, ex: categorias do usuário),
+então reenviar o mesmo PDF/CSV devolve as transações sem extrair nem parsear de novo.
+
+Dois níveis: LRU em memória (por processo) e arquivos .json.gz em disco, cada um com
+remoção dos menos usados quando passa do seu limite de tamanho em bytes (na memória,
+pelo tamanho aproximado das transações guardadas).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+PARSE_CACHE_DIR = os.environ.get(
+    "PARSE_CACHE_DIR", os.path.join(tempfile.gettempdir(), "controle-financeiro", "parse-cache")
+)
+PARSE_CACHE_MEMORIA_MB = float(os.environ.get("PARSE_CACHE_MEMORIA_MB", "64"))
+PARSE_CACHE_MAX_MB = float(os.environ.get("PARSE_CACHE_MAX_MB", "256"))
+
+_EXTENSAO = ".json.gz"
+
+
+def _tamanho_aproximado(transacoes: list) -> int:
+    """Bytes ocupados pela lista de transações (dicts e valores; as chaves são compartilhadas)"""
+    tamanho = sys.getsizeof(transacoes)
+    for transacao in transacoes:
+        tamanho += sys.getsizeof(transacao) + sum(sys.getsizeof(v) for v in transacao.values())
+    return tamanho
+
+
+class CacheParse:
+    def __init__(self, diretorio: Optional[str] = PARSE_CACHE_DIR,
+                 max_bytes_memoria: int = int(PARSE_CACHE_MEMORIA_MB * 1024 * 1024),
+                 max_bytes_disco: int = int(PARSE_CACHE_MAX_MB * 1024 * 1024)):
+        self.diretorio = diretorio
+        self.max_bytes_memoria = max_bytes_memoria
+        self.max_bytes_disco = max_bytes_disco
+        self._memoria: OrderedDict = OrderedDict()  # chave -> (transações, bytes aproximados)
+        self._bytes_memoria = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._bytes_disco = None  # calculado na primeira escrita
+
+        if self.diretorio:
+            try:
+                os.makedirs(self.diretorio, exist_ok=True)
+            except OSError as e:
+                print(f"Aviso: cache de parse sem disco ({e})")
+                self.diretorio = None
+
+    @staticmethod
+    def chave(conteudo: bytes, versao_parser: str, contexto: str = "") -> str:
+        """Chave do cache: sha256 do arquivo + versão do parser + contexto"""
+        h = hashlib.sha256(conteudo)
+        h.update(f"\0{versao_parser}\0{contexto}".encode("utf-8"))
+        return h.hexdigest()
+
+    def _caminho(self, chave: str) -> str:
+        return os.path.join(self.diretorio, chave + _EXTENSAO)
+
+    def obter(self, chave: str) -> Optional[list]:
+        """Retorna as transações em cache (ou None), contando hit/miss"""
+        with self._lock:
+            entrada = self._memoria.get(chave)
+            if entrada is not None:
+                self._memoria.move_to_end(chave)
+                self.hits += 1
+                return entrada[0]
+
+        transacoes = self._ler_disco(chave)
+        if transacoes is None:
+            with self._lock:
+                self.misses += 1
+            return None
+        tamanho = _tamanho_aproximado(transacoes)
+        with self._lock:
+            self.hits += 1
+            self._guardar_memoria(chave, transacoes, tamanho)
+        return transacoes
+
+    def guardar(self, chave: str, transacoes: list):
+        tamanho = _tamanho_aproximado(transacoes)  # fora do lock: percorre a lista toda
+        with self._lock:
+            self._guardar_memoria(chave, transacoes, tamanho)
+        self._gravar_disco(chave, transacoes)
+
+    def _guardar_memoria(self, chave: str, transacoes: list, tamanho: int):
+        anterior = self._memoria.pop(chave, None)
+        if anterior is not None:
+            self._bytes_memoria -= anterior[1]
+        if tamanho > self.max_bytes_memoria:
+            return  # maior que o limite inteiro: fica só no disco
+        self._memoria[chave] = (transacoes, tamanho)
+        self._bytes_memoria += tamanho
+        while self._bytes_memoria > self.max_bytes_memoria:
+            _, (_, removido) = self._memoria.popitem(last=False)
+            self._bytes_memoria -= removido
+
+    def _ler_disco(self, chave: str) -> Optional[list]:
+        if not self.diretorio:
+            return None
+        caminho = self._caminho(chave)
+        try:
+            with gzip.open(caminho, "rt", encoding="utf-8") as f:
+                transacoes = json.load(f)
+            os.utime(caminho)  # mtime = último uso, para a remoção por LRU
+            return transacoes
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Aviso: entrada corrompida no cache de parse ({e})")
+            return None
+
+    def _gravar_disco(self, chave: str, transacoes: list):
+        if not self.diretorio:
+            return
+        caminho = self._caminho(chave)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(temporario, "wt", encoding="utf-8") as f:
+                json.dump(transacoes, f, ensure_ascii=False)
+            tamanho = os.path.getsize(temporario)
+            os.replace(temporario, caminho)  # escrita atômica
+        except OSError as e:
+            print(f"Aviso: não foi possível gravar no cache de parse ({e})")
+            return
+
+        with self._lock:
+            if self._bytes_disco is None:
+                self._bytes_disco = sum(tamanho for _, tamanho, _ in self._listar_disco())
+            else:
+                self._bytes_disco += tamanho
+            if self._bytes_disco > self.max_bytes_disco:
+                self._remover_excesso()
+
+    def _listar_disco(self):
+        """(caminho, tamanho, mtime) de cada entrada em disco"""
+        entradas = []
+        with os.scandir(self.diretorio) as it:
+            for entrada in it:
+                if entrada.name.endswith(_EXTENSAO):
+                    try:
+                        info = entrada.stat()
+                    except FileNotFoundError:
+                        continue
+                    entradas.append((entrada.path, info.st_size, info.st_mtime))
+        return entradas
+
+    def _remover_excesso(self):
+        """Apaga as entradas usadas há mais tempo até ficar em 90% do limite"""
+        entradas = sorted(self._listar_disco(), key=lambda e: e[2])
+        total = sum(tamanho for _, tamanho, _ in entradas)
+        alvo = self.max_bytes_disco * 0.9
+        for caminho, tamanho, _ in entradas:
+            if total <= alvo:
+                break
+            try:
+                os.remove(caminho)
+                total -= tamanho
+            except OSError:
+                pass
+        self._bytes_disco = total
+
+    def estatisticas(self) -> dict:
+        with self._lock:
+            consultas = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / consultas, 4) if consultas else 0,
+                "itensMemoria": len(self._memoria),
+                "bytesMemoria": self._bytes_memoria,
+                "bytesDisco": self._bytes_disco,
+                "diretorio": self.diretorio,
+            }
+
+
+_cache: Optional[CacheParse] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_parse() -> CacheParse:
+    """Cache compartilhado pelo processo"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheParse()
+    return _cache
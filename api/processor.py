@@ -1,267 +1,514 @@
+import numpy as np
 import pandas as pd
-from datetime import datetime
-import re
 import pdfplumber
 import PyPDF2
+import hashlib
 import io
+import os
+import threading
+from collections import Counter, OrderedDict
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+from categorizer import CATEGORIAS_PADRAO, obter_categorizador
+from statement_formats import identificar_formato
+from parse_cache import obter_cache_parse
+from learned_categories import obter_indice_categorias
+
+# Versão do parser: faz parte da chave do cache de parse, incremente ao mudar o resultado da extração
+VERSAO_PARSER = "4"
+
+# Quantas linhas iniciais são retidas para identificar o formato antes de começar a entregar transações
+JANELA_IDENTIFICACAO_FORMATO = 300
+
+# Linhas por lote na leitura de CSV (limita a memória em exportações grandes)
+CSV_CHUNKSIZE = int(os.environ.get("CSV_CHUNKSIZE", "50000"))
+
+# Formatos de data aceitos no CSV, na ordem de tentativa
+FORMATOS_DATA_CSV = ['%d/%m/%Y', '%Y-%m-%d', '%d/%m/%y', '%d-%m-%Y', '%Y/%m/%d']
+
+# Extração paralela de PDFs: número de processos (1 = serial) e tamanho mínimo de cada faixa de páginas
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", "1"))
+PDF_PAGINAS_POR_TAREFA = int(os.environ.get("PDF_PAGINAS_POR_TAREFA", "8"))
+
+# Um pool por número de workers: processadores com workers_pdf diferentes não derrubam o pool um do outro
+_pools_pdf = {}
+_pool_pdf_lock = threading.Lock()
+
+
+def _obter_pool_pdf(workers):
+    """Retorna o pool de processos de extração com `workers` processos (compartilhado pelo processo), ou None se indisponível"""
+    with _pool_pdf_lock:
+        pool = _pools_pdf.get(workers)
+        if pool is None:
+            try:
+                pool = ProcessPoolExecutor(max_workers=workers)
+            except (OSError, NotImplementedError) as e:
+                # Ambientes sem suporte a multiprocessing (ex: sem /dev/shm) ficam no modo serial
+                print(f"Aviso: extração paralela indisponível ({e})")
+                return None
+            _pools_pdf[workers] = pool
+        return pool
+
+
+def encerrar_pools_pdf():
+    """Encerra os pools de extração (fim do processo); o próximo PDF paralelo cria outro"""
+    with _pool_pdf_lock:
+        pools = list(_pools_pdf.values())
+        _pools_pdf.clear()
+    for pool in pools:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+# Extratores de texto por página, na ordem padrão de tentativa
+EXTRATORES_PDF = ("pdfplumber", "pypdf2")
+
+# Extrator que funcionou para cada assinatura de PDF (produtor + fontes), ex: Neon -> pypdf2
+_extrator_por_assinatura = OrderedDict()
+_extrator_por_assinatura_lock = threading.Lock()
+_MAX_ASSINATURAS = 256
+
+
+class _LeitorPdf:
+    """
+    Abre cada biblioteca de extração só quando alguma página precisar dela, uma vez por
+    documento: uma falha ao abrir também fica guardada (as próximas páginas não reabrem)
+    """
+    
+    def __init__(self, arquivo_bytes):
+        self.arquivo_bytes = arquivo_bytes
+        self._documentos = {}  # extrator -> documento aberto ou exceção da abertura
+    
+    def _abrir(self, extrator):
+        documento = self._documentos.get(extrator)
+        if documento is None:
+            try:
+                if extrator == "pdfplumber":
+                    documento = pdfplumber.open(io.BytesIO(self.arquivo_bytes))
+                else:
+                    documento = PyPDF2.PdfReader(io.BytesIO(self.arquivo_bytes))
+            except Exception as e:
+                documento = e
+            self._documentos[extrator] = documento
+        if isinstance(documento, Exception):
+            raise documento
+        return documento
+    
+    def total_paginas(self, extrator):
+        return len(self._abrir(extrator).pages)
+    
+    def extrair(self, extrator, indice):
+        """Texto da página ("" se a página não tiver texto, der erro ou a biblioteca não abrir o PDF)"""
+        try:
+            paginas = self._abrir(extrator).pages
+            if indice >= len(paginas):
+                return ""
+            pagina = paginas[indice]
+        except Exception:
+            return ""
+        try:
+            return pagina.extract_text() or ""
+        except Exception:
+            return ""  # Pula páginas problemáticas
+        finally:
+            if extrator == "pdfplumber":
+                pagina.close()  # Libera o cache de objetos da página
+    
+    def fechar(self):
+        documento = self._documentos.get("pdfplumber")
+        if documento is not None and not isinstance(documento, Exception):
+            documento.close()
+
+
+def _iterar_paginas(arquivo_bytes, inicio=0, fim=None, preferido="pdfplumber", leitor=None):
+    """
+    Gera (texto, extrator) para as páginas [inicio, fim): tenta o extrator preferido em cada
+    página e só recorre ao outro nas páginas em que ele não devolver nada.
+    extrator é None quando nenhum dos dois extraiu texto da página.
+    leitor: _LeitorPdf já aberto pelo chamador (que continua responsável por fechá-lo).
+    """
+    import warnings
+    ordem = [preferido] + [e for e in EXTRATORES_PDF if e != preferido]
+    proprio = leitor is None
+    if proprio:
+        leitor = _LeitorPdf(arquivo_bytes)
+    # Suprime warnings de fonte
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        try:
+            if fim is None:
+                fim = 0
+                for extrator in ordem:
+                    try:
+                        fim = leitor.total_paginas(extrator)
+                        break
+                    except Exception as e:
+                        print(f"Aviso: {extrator} não abriu o PDF ({e})")
+            for indice in range(inicio, fim):
+                for extrator in ordem:
+                    texto = leitor.extrair(extrator, indice)
+                    if texto.strip():
+                        yield texto, extrator
+                        break
+                else:
+                    yield "", None
+        finally:
+            if proprio:
+                leitor.fechar()
+
+
+def _extrair_paginas(arquivo_bytes, inicio, fim, preferido):
+    """Tarefa do worker: abre o PDF a partir dos bytes e extrai a faixa [inicio, fim)"""
+    return list(_iterar_paginas(arquivo_bytes, inicio, fim, preferido))
+
+
+def _inspecionar_pdf(leitor_pdf):
+    """
+    Retorna (assinatura, total_paginas). A assinatura combina produtor/criador do PDF e as
+    fontes da primeira página (sem o prefixo de subconjunto "ABCDEF+"), o que identifica o
+    gerador de extratos de cada banco. Ambos são None se o PyPDF2 não conseguir ler o arquivo.
+    Usa o PyPDF2 do _LeitorPdf, o mesmo que a extração reaproveita depois.
+    """
+    try:
+        leitor = leitor_pdf._abrir("pypdf2")
+        total_paginas = len(leitor.pages)
+    except Exception:
+        return None, None
+    
+    try:
+        metadados = leitor.metadata or {}
+        partes = [str(metadados.get("/Producer", "")), str(metadados.get("/Creator", ""))]
+        fontes = set()
+        if total_paginas:
+            recursos = leitor.pages[0].get("/Resources")
+            recursos = recursos.get_object() if recursos is not None else {}
+            for fonte in (recursos.get("/Font") or {}).values():
+                nome = str(fonte.get_object().get("/BaseFont", ""))
+                fontes.add(nome.split("+", 1)[-1])
+        partes.append(",".join(sorted(fontes)))
+        return "|".join(partes), total_paginas
+    except Exception:
+        return None, total_paginas
+
+
+def _lembrar_extrator(assinatura, paginas_por_extrator):
+    """Guarda o extrator que mais entregou páginas para documentos com essa assinatura"""
+    if not assinatura or not paginas_por_extrator:
+        return
+    extrator = max(EXTRATORES_PDF, key=lambda e: paginas_por_extrator.get(e, 0))
+    with _extrator_por_assinatura_lock:
+        _extrator_por_assinatura[assinatura] = extrator
+        _extrator_por_assinatura.move_to_end(assinatura)
+        while len(_extrator_por_assinatura) > _MAX_ASSINATURAS:
+            _extrator_por_assinatura.popitem(last=False)
+
 
 class ProcessadorExtratos:
-    def __init__(self):
-        self.categorias_padrao = {
-            'Comida': ['supermercado', 'mercado', 'padaria', 'restaurante', 'lanchonete', 'ifood', 'rappi', 'hamburguer', 'pizza', 'delivery'],
-            'Transporte': ['uber', '99', 'taxi', 'combustível', 'posto', 'estacionamento', 'metro', 'onibus', 'bilhete', 'passagem', 'pedágio'],
-            'Moradia': ['aluguel', 'condomínio', 'luz', 'água', 'energia', 'internet', 'telefone', 'gás', 'energia', 'eletropaulo', 'sabesp'],
-            'Lazer': ['cinema', 'netflix', 'spotify', 'shopping', 'parque', 'viagem', 'hotel', 'show', 'teatro', 'musical'],
-            'Saúde': ['farmacia', 'drogaria', 'médico', 'hospital', 'plano de saúde', 'academia', 'clinica', 'dentista'],
-            'Educação': ['escola', 'faculdade', 'curso', 'livraria', 'material escolar', 'universidade', 'mensalidade'],
-            'Investimentos': ['rendimento', 'dividendo', 'aplicação', 'tesouro', 'ação', 'fii', 'investimento', 'cdb', 'lci'],
-            'Receita': ['salário', 'pagamento', 'transferência recebida', 'depósito', 'rendimento']
-        }
+    def __init__(self, categorias_usuario=None, workers_pdf=None):
+        self.categorias_padrao = CATEGORIAS_PADRAO
+        self.workers_pdf = PDF_WORKERS if workers_pdf is None else workers_pdf
+        # Categorizador compilado uma vez por processo (reaproveitado entre uploads)
+        self.categorizador = obter_categorizador(categorias_usuario)
+        # Categorias corrigidas pelo usuário (descrição normalizada -> categoria)
+        self.indice_categorias = obter_indice_categorias()
     
-    def categorizar_transacao(self, descricao, valor):
-        """Categoriza automaticamente uma transação baseada na descrição"""
-        desc_lower = descricao.lower()
+    @staticmethod
+    def tipo_arquivo(nome_arquivo):
+        """'pdf', 'csv' ou None se o formato não for suportado"""
+        nome = (nome_arquivo or "").lower()
+        if nome.endswith('.pdf'):
+            return 'pdf'
+        if nome.endswith('.csv'):
+            return 'csv'
+        return None
+    
+    def processar_arquivo(self, nome_arquivo, conteudo, usar_cache=True, progresso=None, aprendidas=True):
+        """
+        Processa um PDF ou CSV, reaproveitando o resultado se o mesmo arquivo já foi parseado.
+        progresso, se dado, é chamado com contadores parciais (paginas, total_paginas, lotes, transacoes).
+        aprendidas=False devolve só a categorização por palavras-chave (o chamador aplica o índice aprendido).
+        """
+        tipo = self.tipo_arquivo(nome_arquivo)
+        if tipo is None:
+            raise ValueError("Formato não suportado. Use PDF ou CSV.")
         
-        for categoria, palavras_chave in self.categorias_padrao.items():
-            for palavra in palavras_chave:
-                if palavra in desc_lower:
-                    return categoria
+        cache = obter_cache_parse() if usar_cache else None
+        if cache:
+            # As categorias do usuário mudam a categorização, então entram na chave
+            contexto = hashlib.sha1(repr(self.categorizador.assinatura).encode("utf-8")).hexdigest()
+            chave = cache.chave(conteudo, f"{tipo}-{VERSAO_PARSER}", contexto)
+            transacoes = cache.obter(chave)
+            if transacoes is not None:
+                if progresso:
+                    progresso(transacoes=len(transacoes), cache=True)
+                transacoes = [dict(t) for t in transacoes]
+                if aprendidas:
+                    self.indice_categorias.aplicar(transacoes)
+                return transacoes
         
-        return "A Categorizar"
-    
-    def extrair_texto_pdf(self, arquivo_bytes):
-        """Extrai texto de um PDF usando pdfplumber ou PyPDF2 fallback"""
-        import warnings
-        texto_pdfplumber = ""
+        # O cache guarda só a categorização por palavras-chave: corrigir uma
+        # categoria não invalida os arquivos já parseados
+        if tipo == 'pdf':
+            transacoes = self.processar_pdf(conteudo, progresso=progresso, aprendidas=False)
+        else:
+            transacoes = self.processar_csv(conteudo, progresso=progresso, aprendidas=False)
         
-        # 1. Tenta com pdfplumber (suprimindo warnings de fonte)
+        if cache:
+            cache.guardar(chave, transacoes)
+            transacoes = [dict(t) for t in transacoes]
+        if aprendidas:
+            self.indice_categorias.aplicar(transacoes)
+        return transacoes
+    
+    def categorizar_transacao(self, descricao, valor):
+        """Categoriza automaticamente uma transação baseada na descrição (categorias aprendidas primeiro)"""
+        return self.indice_categorias.obter(descricao) or self.categorizador.categorize(descricao)
+    
+    def iterar_paginas_pdf(self, arquivo_bytes, progresso=None):
+        """Gera o texto de cada página do PDF assim que ela é extraída (pdfplumber ou PyPDF2 fallback por página)"""
+        leitor = _LeitorPdf(arquivo_bytes)
         try:
-            with warnings.catch_warnings():
-                warnings.simplefilter("ignore")
-                with pdfplumber.open(io.BytesIO(arquivo_bytes)) as pdf:
-                    for pagina in pdf.pages:
-                        try:
-                            texto = pagina.extract_text()
-                            if texto:
-                                texto_pdfplumber += texto + "\n"
-                        except Exception:
-                            continue  # Pula páginas problemáticas
-        except Exception as e:
-            print(f"Aviso: pdfplumber falhou completamente ({e})")
+            assinatura, total_paginas = _inspecionar_pdf(leitor)
+            if progresso and total_paginas:
+                progresso(total_paginas=total_paginas)
+            # PDFs do mesmo gerador (ex: fonte problemática do Neon) vão direto ao extrator que funcionou antes
+            preferido = _extrator_por_assinatura.get(assinatura, EXTRATORES_PDF[0])
+            
+            paginas_por_extrator = Counter()
+            total_caracteres = 0
+            for paginas, (texto, extrator) in enumerate(self._iterar_textos_pdf(leitor, total_paginas, preferido), start=1):
+                if progresso:
+                    progresso(paginas=paginas)
+                if not extrator:
+                    continue
+                paginas_por_extrator[extrator] += 1
+                total_caracteres += len(texto) + 1
+                yield texto
+        finally:
+            leitor.fechar()
+        
+        _lembrar_extrator(assinatura, paginas_por_extrator)
+        detalhe = ", ".join(f"{e}: {n} páginas" for e, n in paginas_por_extrator.items()) or "nenhuma página"
+        print(f"Extraídos {total_caracteres} caracteres ({detalhe}; preferido: {preferido})")
+    
+    def _iterar_textos_pdf(self, leitor, total_paginas, preferido):
+        """
+        Gera (texto, extrator) de cada página, na ordem, dividindo faixas de páginas entre
+        processos. Sem workers a extração usa o próprio leitor (o PDF não é reaberto).
+        """
+        arquivo_bytes = leitor.arquivo_bytes
+        if self.workers_pdf <= 1 or not total_paginas:
+            yield from _iterar_paginas(arquivo_bytes, 0, total_paginas, preferido, leitor)
+            return
         
-        # 2. Se pdfplumber conseguiu texto útil, retorna
-        if len(texto_pdfplumber.strip()) > 20:
-            print(f"pdfplumber extraiu {len(texto_pdfplumber)} caracteres")
-            return texto_pdfplumber
+        # Faixas de pelo menos PDF_PAGINAS_POR_TAREFA páginas, ~2 por worker
+        tamanho = max(PDF_PAGINAS_POR_TAREFA, -(-total_paginas // (self.workers_pdf * 2)))
+        faixas = [(inicio, min(inicio + tamanho, total_paginas)) for inicio in range(0, total_paginas, tamanho)]
+        executor = _obter_pool_pdf(self.workers_pdf) if len(faixas) > 1 else None
+        if executor is None:
+            yield from _iterar_paginas(arquivo_bytes, 0, total_paginas, preferido, leitor)
+            return
         
-        # 3. Fallback: PyPDF2 (mais tolerante com fontes problemáticas como Neon)
-        print("pdfplumber não extraiu texto suficiente, tentando PyPDF2...")
-        texto_pypdf2 = ""
+        futuros = [executor.submit(_extrair_paginas, arquivo_bytes, inicio, fim, preferido) for inicio, fim in faixas]
         try:
-            leitor = PyPDF2.PdfReader(io.BytesIO(arquivo_bytes))
-            for pagina in leitor.pages:
+            # Consome na ordem de submissão: a ordem das páginas é preservada
+            for futuro, (inicio, fim) in zip(futuros, faixas):
                 try:
-                    texto = pagina.extract_text()
-                    if texto:
-                        texto_pypdf2 += texto + "\n"
-                except Exception:
-                    continue
-        except Exception as e:
-            print(f"Erro no fallback PyPDF2: {e}")
-        
-        print(f"PyPDF2 extraiu {len(texto_pypdf2)} caracteres")
-        return texto_pypdf2
+                    paginas = futuro.result()
+                except Exception as e:
+                    # Worker caiu: extrai essa faixa aqui mesmo
+                    print(f"Aviso: worker de PDF falhou nas páginas {inicio}-{fim} ({e})")
+                    paginas = _iterar_paginas(arquivo_bytes, inicio, fim, preferido, leitor)
+                yield from paginas
+        finally:
+            # Se o consumidor parar antes do fim, não deixa faixas pendentes ocupando o pool
+            for futuro in futuros:
+                futuro.cancel()
     
-    def parsear_transacoes_pdf(self, texto):
-        """Parseia transações de texto de PDF bancário cruzando lógicas flexíveis"""
-        transacoes = []
+    def extrair_texto_pdf(self, arquivo_bytes):
+        """Extrai o texto completo de um PDF (prefira iterar_paginas_pdf para documentos grandes)"""
+        return "".join(texto + "\n" for texto in self.iterar_paginas_pdf(arquivo_bytes))
+    
+    def iterar_linhas(self, paginas):
+        """Quebra cada página em linhas não vazias, normalizando os separadores nulos do Neon"""
+        for texto in paginas:
+            # Limpa caracteres nulos (o Neon usa \x00 como separador em vários lugares)
+            # Substitui \x00 por espaço para normalizar, MAS preserva o padrão de negativo
+            # No Neon, negativo aparece como "\x00R$" (null antes do R$)
+            # Primeiro marca os negativos, depois limpa os nulls
+            texto = texto.replace('\x00R$', '-R$')  # Marca negativos do Neon
+            texto = texto.replace('\x00', ' ')  # Limpa nulls restantes (ex: hora)
+            for linha in texto.split('\n'):
+                linha = linha.strip()
+                if linha:
+                    yield linha
+    
+    def iterar_transacoes_pdf(self, linhas):
+        """Parseia transações de um fluxo de linhas, entregando cada uma assim que é reconhecida"""
+        linhas = iter(linhas)
         
-        # Detecta se é fatura de cartão de crédito
-        texto_upper = texto.upper()
-        eh_fatura = any(termo in texto_upper for termo in [
-            "LIMITES DE CRÉDITO", "LIMITE DE CRÉDITO", "LIMITE TOTAL DE CRÉDITO", 
-            "RESUMO DA FATURA", "TOTAL DESTA FATURA", "TOTAL DA FATURA", 
-            "LANÇAMENTOS: COMPRAS E SAQUES", "COMPRAS E SAQUES", "PAGAMENTO MÍNIMO",
-            "ENCARGOS COBRADOS NESTA FATURA"
-        ])
-        if eh_fatura:
+        # O formato (Neon, fatura, genérico...) é decidido uma vez, pela janela
+        # inicial; o restante do documento segue em fluxo por uma única regex
+        janela = list(islice(linhas, JANELA_IDENTIFICACAO_FORMATO))
+        formato = identificar_formato(janela)
+        if formato.fatura:
             print("Detectado formato de fatura de cartão de crédito. Ajustando sinais...")
-            
-        # Limpa caracteres nulos (o Neon usa \x00 como separador em vários lugares)
-        # Substitui \x00 por espaço para normalizar, MAS preserva o padrão de negativo
-        # No Neon, negativo aparece como "\x00R$" (null antes do R$)
-        # Primeiro marca os negativos, depois limpa os nulls
-        texto_limpo = texto.replace('\x00R$', '-R$')  # Marca negativos do Neon
-        texto_limpo = texto_limpo.replace('\x00', ' ')  # Limpa nulls restantes (ex: hora)
         
-        linhas = texto_limpo.split('\n')
+        for fonte in (janela, linhas):
+            for linha in fonte:
+                transacao = self._parsear_linha(linha, formato)
+                if transacao:
+                    yield transacao
+    
+    def _parsear_linha(self, linha, formato):
+        """Parseia uma linha no formato do documento; retorna None se não for transação"""
+        if len(linha) < 10:
+            return None
         
-        # Regex para formato Neon: DESCRIÇÃO DD/MM/YYYY HH:MM [-]R$ VALOR R$ SALDO CARTÃO
-        # Exemplo: "TED recebido de TECH4HUMANS... 06/02/2026 07 35 R$ 3.325,89 R$ 3.325,89 -"
-        # Exemplo negativo: "PIX enviado para NATALIA... 06/02/2026 10 37 -R$ 3.325,89 R$ 0,00 -"
-        regex_neon = r'^(.+?)\s+(\d{2}/\d{2}/\d{4})\s+\d{2}\s*\d{2}\s+(-?)R\$\s*([\d.,]+)\s+R\$\s*[\d.,]+\s+-$'
+        resultado = formato.parsear_linha(linha)
+        if resultado is None:
+            return None
+        data_str, descricao, valor = resultado
         
-        # Regex genérica (outros bancos): DATA DESCRIÇÃO VALOR
-        regex_generica = r'(?:^|\s)(\d{2}[/-]\d{2}(?:[/-]\d{2,4})?)\s+(.*?)\s+(?:R\$?\s*)?(-?\s*[\d.]+(?:,\d{2})?)$'
+        # Pula linhas de cabeçalho/saldo/lixo
+        if "SALDO" in descricao.upper():
+            return None
+        if len(descricao) < 5 or descricao.replace(' ', '').isdigit():
+            return None  # Pula descrições muito curtas ou só números (cabeçalho)
         
-        for linha in linhas:
-            linha = linha.strip()
-            if not linha or len(linha) < 10:
-                continue
-            
-            # Tenta Neon primeiro
-            match_neon = re.search(regex_neon, linha)
-            if match_neon:
-                descricao = match_neon.group(1).strip()
-                data_str = match_neon.group(2)
-                sinal_negativo = match_neon.group(3)  # "-" ou ""
-                valor_str = match_neon.group(4)
-                
-                try:
-                    valor_limpo = valor_str.replace('.', '').replace(',', '.')
-                    valor = float(valor_limpo)
-                    
-                    if sinal_negativo == '-':
-                        valor = -abs(valor)
-                    
-                    # Se for fatura de cartão, inverte o sinal do valor:
-                    # Compras (positivo na fatura) viram débito (-) e pagamentos (negativo) viram crédito (+)
-                    if eh_fatura:
-                        valor = -valor
-                    
-                    # Pula linhas de cabeçalho/saldo/lixo
-                    if "SALDO" in descricao.upper() or valor == 0:
-                        continue
-                    if len(descricao) < 5 or descricao.replace(' ', '').isdigit():
-                        continue  # Pula descrições muito curtas ou só números (cabeçalho)
-                    
-                    categoria = self.categorizar_transacao(descricao, valor)
-                    
-                    transacoes.append({
-                        'data': data_str,
-                        'descricao': descricao,
-                        'valor': valor,
-                        'categoria': categoria,
-                        'tipo': 'Receita' if valor > 0 else 'Despesa',
-                        'fonte': 'PDF'
-                    })
-                except Exception:
-                    continue
-                continue  # Já achou match Neon, pula pro próximo
-            
-            # Fallback: regex genérica (outros bancos)
-            match_gen = re.search(regex_generica, linha)
-            if match_gen:
-                data_str = match_gen.group(1).replace('-', '/')
-                descricao = match_gen.group(2).strip()
-                valor_str = match_gen.group(3)
-                
-                if len(data_str) == 5:
-                    ano_atual = datetime.now().year
-                    mes = int(data_str.split('/')[1])
-                    if mes > datetime.now().month:
-                        ano = ano_atual - 1
-                    else:
-                        ano = ano_atual
-                    data_str = f"{data_str}/{ano}"
-                
-                try:
-                    valor_str = valor_str.replace(' ', '')
-                    valor_limpo = valor_str.replace('.', '').replace(',', '.')
-                    valor = float(valor_limpo)
-                    
-                    # Se for fatura de cartão, inverte o sinal do valor
-                    if eh_fatura:
-                        valor = -valor
-                    
-                    descricao = re.sub(r'\d{2}/\d{2}$', '', descricao).strip()
-                    
-                    if "SALDO" in descricao.upper():
-                        continue
-                    if len(descricao) < 5 or descricao.replace(' ', '').isdigit():
-                        continue  # Pula descrições curtas ou só números (cabeçalho)
-                    
-                    categoria = self.categorizar_transacao(descricao, valor)
-                    
-                    transacao = {
-                        'data': data_str,
-                        'descricao': descricao,
-                        'valor': valor,
-                        'categoria': categoria,
-                        'tipo': 'Receita' if valor > 0 else 'Despesa',
-                        'fonte': 'PDF'
-                    }
-                    transacoes.append(transacao)
-                    
-                except Exception:
-                    continue
-                    
-        return transacoes
+        return {
+            'data': data_str,
+            'descricao': descricao,
+            'valor': valor,
+            'categoria': self.categorizador.categorize(descricao),
+            'tipo': 'Receita' if valor > 0 else 'Despesa',
+            'fonte': 'PDF'
+        }
+    
+    def parsear_transacoes_pdf(self, texto):
+        """Parseia transações de texto de PDF bancário cruzando lógicas flexíveis"""
+        return list(self.iterar_transacoes_pdf(self.iterar_linhas([texto])))
     
-    def processar_pdf(self, arquivo_bytes):
+    def processar_pdf(self, arquivo_bytes, progresso=None, aprendidas=True):
         """Processa um arquivo PDF (bytes)"""
         try:
-            texto = self.extrair_texto_pdf(arquivo_bytes)
-            if not texto:
-                raise Exception("Não foi possível extrair texto do PDF")
+            # Pipeline em fluxo: páginas -> linhas -> transações. Só guarda as
+            # primeiras linhas como amostra para a mensagem de erro
+            amostra = []
             
-            transacoes = self.parsear_transacoes_pdf(texto)
+            def linhas_com_amostra():
+                for linha in self.iterar_linhas(self.iterar_paginas_pdf(arquivo_bytes, progresso)):
+                    if len(amostra) < 5 and len(linha) > 5:
+                        amostra.append(linha)
+                    yield linha
+            
+            transacoes = []
+            for transacao in self.iterar_transacoes_pdf(linhas_com_amostra()):
+                transacoes.append(transacao)
+                if progresso:
+                    progresso(transacoes=len(transacoes))
             if not transacoes:
+                if not amostra:
+                    raise Exception("Não foi possível extrair texto do PDF")
                 # Retorna algumas linhas do PDF para debug se a regex falhar em tudo
-                linhas_validas = [l.strip() for l in texto.split('\n') if len(l.strip()) > 5]
-                amostra = " | ".join(linhas_validas[:5])
-                raise Exception(f"Não foi possível identificar transações no PDF. Formato do texto extraído: {amostra}")
+                raise Exception(f"Não foi possível identificar transações no PDF. Formato do texto extraído: {' | '.join(amostra)}")
             
+            if aprendidas:
+                self.indice_categorias.aplicar(transacoes)
             return transacoes # Retorna lista de dicts
             
         except Exception as e:
             raise Exception(f"Erro ao processar PDF: {str(e)}")
     
-    def processar_csv(self, arquivo_bytes):
+    def iterar_lotes_csv(self, arquivo, chunksize=None):
+        """Processa um CSV (bytes ou arquivo aberto) em lotes de até chunksize linhas, entregando a lista de transações de cada lote"""
+        chunksize = chunksize or CSV_CHUNKSIZE
+        origem = arquivo if hasattr(arquivo, "read") else io.BytesIO(arquivo)
+        
+        # dtype=str: valor e data chegam como texto e são convertidos abaixo, coluna a coluna
+        with pd.read_csv(origem, dtype=str, keep_default_na=False, chunksize=chunksize) as leitor:
+            renames = None
+            for df in leitor:
+                if renames is None:
+                    renames = self._normalizar_colunas_csv(df.columns)
+                df.columns = [renames.get(col, col) for col in df.columns]
+                
+                lote = self._converter_lote_csv(df)
+                if lote:
+                    yield lote
+    
+    def _normalizar_colunas_csv(self, colunas):
+        """Mapeia as colunas do arquivo para data/descricao/valor (primeira coluna que bater com cada uma)"""
+        renames = {}
+        for col in colunas:
+            nome = col.lower().strip()
+            if 'descrição' in nome or 'descricao' in nome: alvo = 'descricao'
+            elif 'data' in nome: alvo = 'data'
+            elif 'valor' in nome: alvo = 'valor'
+            else: continue
+            if alvo not in renames.values():
+                renames[col] = alvo
+        
+        if len(renames) < 3:
+            raise Exception("CSV não possui colunas necessárias (Data, Descrição, Valor)")
+        return renames
+    
+    def _converter_lote_csv(self, df):
+        """Converte um DataFrame (colunas já normalizadas) em transações, de forma vetorizada"""
+        valor = pd.to_numeric(
+            df['valor'].str.replace('R$', '', regex=False).str.replace(',', '.', regex=False).str.strip(),
+            errors='coerce'
+        )
+        # Linhas com valor inválido são ignoradas
+        validas = valor.notna().to_numpy()
+        if not validas.all():
+            df, valor = df[validas], valor[validas]
+        if df.empty:
+            return []
+        
+        descricao = df['descricao'].str.strip().tolist()
+        colunas = zip(
+            self._normalizar_datas(df['data'].str.strip()).tolist(),
+            descricao,
+            valor.astype(float).tolist(),
+            self.categorizador.categorize_many(descricao),
+            np.where(valor.to_numpy() > 0, 'Receita', 'Despesa').tolist(),
+        )
+        # Monta os dicts direto das listas (DataFrame.to_dict itera célula a célula)
+        return [
+            {'data': d, 'descricao': desc, 'valor': v, 'categoria': c, 'tipo': t, 'fonte': 'CSV'}
+            for d, desc, v, c, t in colunas
+        ]
+    
+    def _normalizar_datas(self, datas):
+        """Converte as datas para DD/MM/YYYY (mesmo formato do PDF); datas não reconhecidas ficam como vieram"""
+        # Já no formato final: só valida (strftime é a parte cara da conversão)
+        no_formato = datas.str.fullmatch(r'\d{2}/\d{2}/\d{4}').to_numpy(dtype=bool)
+        if no_formato.all() and pd.to_datetime(datas, format='%d/%m/%Y', errors='coerce').notna().all():
+            return datas
+        
+        convertidas = None
+        for formato in FORMATOS_DATA_CSV:
+            tentativa = pd.to_datetime(datas, format=formato, errors='coerce')
+            convertidas = tentativa if convertidas is None else convertidas.fillna(tentativa)
+            if convertidas.notna().all():
+                break
+        
+        resultado = datas.copy()
+        reformatar = (convertidas.notna().to_numpy() & ~no_formato)
+        resultado[reformatar] = convertidas[reformatar].dt.strftime('%d/%m/%Y')
+        return resultado
+    
+    def processar_csv(self, arquivo_bytes, chunksize=None, progresso=None, aprendidas=True):
         """Processa um arquivo CSV (bytes)"""
         try:
-            df = pd.read_csv(io.BytesIO(arquivo_bytes))
-            df.columns = [col.lower().strip() for col in df.columns]
-            
-            colunas_necessarias = ['data', 'descrição', 'valor']
-            
-            # Normalização de colunas
-            # (Simplificando para a versão API, assumindo que o pandas resolve a leitura direta se o formato estiver ok)
-            # Mas vamos manter a lógica de renomear para garantir
-            
-            renames = {}
-            for col in df.columns:
-                if 'descrição' in col or 'descricao' in col: renames[col] = 'descricao'
-                if 'data' in col: renames[col] = 'data'
-                if 'valor' in col: renames[col] = 'valor'
-            
-            df = df.rename(columns=renames)
-            
-            if not all(col in df.columns for col in ['data', 'descricao', 'valor']):
-                raise Exception("CSV não possui colunas necessárias (Data, Descrição, Valor)")
-            
             transacoes = []
-            for _, row in df.iterrows():
-                try:
-                    descricao = str(row['descricao']).strip()
-                    val_str = str(row['valor']).replace('R$', '').replace(',', '.').strip()
-                    valor = float(val_str)
-                    data = str(row['data'])
-                    
-                    categoria = self.categorizar_transacao(descricao, valor)
-                    
-                    transacoes.append({
-                        'data': data,
-                        'descricao': descricao,
-                        'valor': valor,
-                        'categoria': categoria,
-                        'tipo': 'Receita' if valor > 0 else 'Despesa',
-                        'fonte': 'CSV'
-                    })
-                except:
-                    continue
-            
+            for lotes, lote in enumerate(self.iterar_lotes_csv(arquivo_bytes, chunksize), start=1):
+                transacoes.extend(lote)
+                if progresso:
+                    progresso(lotes=lotes, transacoes=len(transacoes))
+            if aprendidas:
+                self.indice_categorias.aplicar(transacoes)
             return transacoes
-
+        
         except Exception as e:
             raise Exception(f"Erro ao processar CSV: {str(e)}")
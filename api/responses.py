@@ -0,0 +1,132 @@
+"""
+Camada de resposta da API para payloads grandes (listas de transações, séries do simulador):
+    - RespostaJSON: serializa com orjson (sem passar pelo jsonable_encoder quando o endpoint
+      devolve a resposta pronta); sem orjson, json da biblioteca padrão
+    - CompressaoMiddleware: zstd ou gzip conforme o Accept-Encoding, acima de um tamanho mínimo
+    - colunar(): formato compacto das listas, um array por campo em vez de um objeto por linha
+"""
+
+import gzip
+import json
+import os
+from typing import Any, Optional
+
+from fastapi.encoders import jsonable_encoder
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+    _orjson_disponivel = True
+except ImportError:
+    _orjson_disponivel = False
+
+try:
+    import zstandard
+    _zstd_disponivel = True
+except ImportError:
+    _zstd_disponivel = False
+
+# Respostas menores que isso vão sem compressão (o ganho não paga o custo)
+RESPOSTA_COMPRIMIR_MIN_BYTES = int(os.environ.get("RESPOSTA_COMPRIMIR_MIN_BYTES", "1024"))
+RESPOSTA_GZIP_NIVEL = int(os.environ.get("RESPOSTA_GZIP_NIVEL", "6"))
+RESPOSTA_ZSTD_NIVEL = int(os.environ.get("RESPOSTA_ZSTD_NIVEL", "3"))
+
+_TIPOS_COMPRIMIVEIS = ("application/json", "text/")
+
+
+class RespostaJSON(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        if _orjson_disponivel:
+            # Tipos que o orjson não conhece (Decimal, modelos...) passam pelo encoder do FastAPI
+            return orjson.dumps(content, default=jsonable_encoder,
+                                option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+        return json.dumps(jsonable_encoder(content), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def colunar(linhas: list, campos: Optional[list] = None) -> dict:
+    """[{"a": 1, "b": 2}, {"a": 3, "b": 4}] -> {"a": [1, 3], "b": [2, 4]}"""
+    if campos is None:
+        campos = list(linhas[0]) if linhas else []
+    return {campo: [linha.get(campo) for linha in linhas] for campo in campos}
+
+
+def escolher_codificacao(accept_encoding: str) -> Optional[str]:
+    """zstd se o cliente aceitar (e a lib estiver instalada), senão gzip, senão None"""
+    aceitas = {}
+    for parte in accept_encoding.lower().split(","):
+        nome, _, parametros = parte.strip().partition(";")
+        q = 1.0
+        if parametros.strip().startswith("q="):
+            try:
+                q = float(parametros.strip()[2:])
+            except ValueError:
+                q = 0.0
+        if nome:
+            aceitas[nome] = q
+    for codificacao in ("zstd", "gzip"):
+        if codificacao == "zstd" and not _zstd_disponivel:
+            continue
+        if aceitas.get(codificacao, aceitas.get("*", 0)) > 0:
+            return codificacao
+    return None
+
+
+def comprimir(corpo: bytes, codificacao: str) -> bytes:
+    if codificacao == "zstd":
+        # Um compressor por chamada: ZstdCompressor não é thread-safe
+        return zstandard.ZstdCompressor(level=RESPOSTA_ZSTD_NIVEL).compress(corpo)
+    return gzip.compress(corpo, compresslevel=RESPOSTA_GZIP_NIVEL, mtime=0)
+
+
+class CompressaoMiddleware:
+    """
+    Comprime respostas JSON/texto de corpo único. Respostas em streaming (mais de um pedaço)
+    e as que já têm Content-Encoding passam sem mudança.
+    """
+
+    def __init__(self, app, minimo: int = RESPOSTA_COMPRIMIR_MIN_BYTES):
+        self.app = app
+        self.minimo = minimo
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        codificacao = escolher_codificacao(Headers(scope=scope).get("accept-encoding", ""))
+        if not codificacao:
+            await self.app(scope, receive, send)
+            return
+
+        inicio = None
+        repassando = False
+
+        async def enviar(mensagem):
+            nonlocal inicio, repassando
+            if mensagem["type"] == "http.response.start":
+                inicio = mensagem
+                return
+            if mensagem["type"] != "http.response.body" or repassando:
+                await send(mensagem)
+                return
+
+            corpo = mensagem.get("body", b"")
+            inicio["headers"] = list(inicio.get("headers", []))
+            cabecalhos = MutableHeaders(raw=inicio["headers"])
+            comprimivel = cabecalhos.get("content-type", "").startswith(_TIPOS_COMPRIMIVEIS)
+            if comprimivel:
+                cabecalhos.add_vary_header("Accept-Encoding")
+            if (not comprimivel or mensagem.get("more_body", False) or len(corpo) < self.minimo
+                    or "content-encoding" in cabecalhos):
+                repassando = True
+                await send(inicio)
+                await send(mensagem)
+                return
+
+            corpo = comprimir(corpo, codificacao)
+            cabecalhos["Content-Encoding"] = codificacao
+            cabecalhos["Content-Length"] = str(len(corpo))
+            await send(inicio)
+            await send({"type": "http.response.body", "body": corpo})
+
+        await self.app(scope, receive, enviar)
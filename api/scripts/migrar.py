@@ -0,0 +1,250 @@
+"""
+Runner de migrações do schema e verificação dos planos de consulta.
+
+As migrações são os arquivos SQL desta pasta: supabase_schema.sql é a versão 1 e
+vN_*.sql a versão N. Cada uma roda em uma transação e fica registrada em
+schema_migrations (versão, arquivo, checksum), então rodar de novo só aplica as pendentes.
+
+No Supabase precisa de uma conexão Postgres direta (a API REST não roda DDL):
+DATABASE_URL com a connection string do projeto e o driver psycopg
+(pip install -r api/requirements-scripts.txt). No backend SQLite o schema é aplicado ao abrir o
+banco (sqlite_schema.sql) e só a verificação de planos se aplica.
+
+Uso:
+    python api/scripts/migrar.py                      # aplica as pendentes
+    python api/scripts/migrar.py --status
+    python api/scripts/migrar.py --ate 7              # aplica até a v7
+    python api/scripts/migrar.py --baseline 7         # banco montado à mão: marca v1..v7 como aplicadas
+    python api/scripts/migrar.py --verificar-planos   # EXPLAIN das consultas da API
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import backend_configurado, obter_armazenamento
+
+PASTA = os.path.dirname(os.path.abspath(__file__))
+_ARQUIVO_VERSAO = re.compile(r"^v(\d+)_.+\.sql$")
+
+SQL_HISTORICO = """
+create table if not exists schema_migrations (
+  versao integer primary key,
+  arquivo text not null,
+  checksum text not null,
+  aplicada_em timestamp with time zone not null default now()
+);
+-- Sem policies: fica fora do alcance da chave anon da API REST
+alter table schema_migrations enable row level security;
+"""
+
+# Consultas que a API faz (database.py / sqlite_storage.py), com valores de exemplo.
+# Nenhuma delas pode ler transacoes inteira (Seq Scan / SCAN sem índice).
+_CURSOR_DATA, _CURSOR_ID = "2025-06-15", "80000000-0000-4000-8000-000000000000"
+CONSULTAS = {
+    "paginação": (
+        "select id, data, descricao, valor, categoria, tipo, fonte from transacoes "
+        f"where (data < '{_CURSOR_DATA}' or (data = '{_CURSOR_DATA}' and id < '{_CURSOR_ID}')) "
+        "order by data desc, id desc limit 101"
+    ),
+    "paginação por período": (
+        "select id, data, descricao, valor from transacoes "
+        "where data >= '2025-03-01' and data <= '2025-03-31' order by data desc, id desc limit 101"
+    ),
+    "paginação por categoria": (
+        "select id, data, descricao, valor from transacoes "
+        "where categoria in ('Comida') order by data desc, id desc limit 101"
+    ),
+    "paginação por tipo": (
+        "select id, data, descricao, valor from transacoes "
+        "where tipo in ('Investimento') order by data desc, id desc limit 101"
+    ),
+    "paginação por usuário": (
+        f"select id, data, descricao, valor from transacoes "
+        f"where user_id = '{_CURSOR_ID}' order by data desc, id desc limit 101"
+    ),
+    "impressões existentes": (
+        "select impressao from transacoes where impressao in ('0cc175b9c0f1b6a831c399e269772661', "
+        "'92eb5ffee6ae2fec3ad71c777531578f')"
+    ),
+    "inserções desde a última carga": (
+        "select id, created_at, data, descricao, valor, categoria, tipo, fonte, data_vencimento "
+        "from transacoes where created_at >= '2025-06-15T00:00:00Z' order by created_at, id"
+    ),
+    "categorias aprendidas": (
+        "select chave, categoria from categorias_aprendidas order by atualizado_em desc limit 1000"
+    ),
+    "dashboard por período": (
+        "select mes, categoria, tipo, soma, soma_abs from transacoes_mensal "
+        "where mes >= '2025-01-01' and mes <= '2025-12-01'"
+    ),
+}
+CONSULTAS_POSTGRES = {
+    "vencimentos próximos": (
+        "select id, descricao, valor, data_vencimento from transacoes "
+        "where data_vencimento between current_date and current_date + 30 order by data_vencimento"
+    ),
+}
+CONSULTAS_SQLITE = {
+    "vencimentos próximos": (
+        "select id, descricao, valor, data_vencimento from transacoes "
+        "where data_vencimento between date('now') and date('now', '+30 days') order by data_vencimento"
+    ),
+}
+
+
+def migracoes() -> list:
+    """[(versão, arquivo)] em ordem"""
+    encontradas = [(1, "supabase_schema.sql")]
+    for arquivo in os.listdir(PASTA):
+        m = _ARQUIVO_VERSAO.match(arquivo)
+        if m:
+            encontradas.append((int(m.group(1)), arquivo))
+    encontradas.sort()
+    versoes = [v for v, _ in encontradas]
+    if len(versoes) != len(set(versoes)):
+        sys.exit(f"Versões de migração repetidas em {PASTA}")
+    return encontradas
+
+
+def _ler(arquivo: str) -> tuple[str, str]:
+    with open(os.path.join(PASTA, arquivo), encoding="utf-8") as f:
+        sql = f.read()
+    return sql, hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+
+def _conectar_postgres():
+    try:
+        import psycopg
+    except ImportError:
+        sys.exit("Instale o driver Postgres: pip install -r api/requirements-scripts.txt")
+    url = os.environ.get("DATABASE_URL")
+    if not url:
+        sys.exit("Defina DATABASE_URL (connection string Postgres do projeto Supabase).")
+    # autocommit: cada migração controla a própria transação (uma falha não desfaz as anteriores)
+    return psycopg.connect(url, autocommit=True)
+
+
+def _aplicadas(conexao) -> dict:
+    with conexao.transaction():
+        conexao.execute(SQL_HISTORICO)
+    return {versao: (arquivo, checksum) for versao, arquivo, checksum in
+            conexao.execute("select versao, arquivo, checksum from schema_migrations order by versao")}
+
+
+def status(conexao):
+    aplicadas = _aplicadas(conexao)
+    for versao, arquivo in migracoes():
+        _, checksum = _ler(arquivo)
+        if versao not in aplicadas:
+            situacao = "pendente"
+        elif aplicadas[versao][1] != checksum:
+            situacao = "aplicada (arquivo alterado depois)"
+        else:
+            situacao = "aplicada"
+        print(f"v{versao:<3} {arquivo:<40} {situacao}")
+
+
+def migrar(conexao, ate: int = None, baseline: int = None):
+    aplicadas = _aplicadas(conexao)
+    if not aplicadas and baseline is None:
+        existe = conexao.execute("select to_regclass('public.transacoes')").fetchone()[0]
+        if existe:
+            sys.exit("O banco já tem transacoes mas nenhum histórico de migrações. "
+                     "Rode com --baseline N (N = última vN aplicada à mão).")
+
+    for versao, arquivo in migracoes():
+        if versao in aplicadas or (ate is not None and versao > ate):
+            continue
+        sql, checksum = _ler(arquivo)
+        with conexao.transaction():
+            if baseline is not None and versao <= baseline:
+                acao = "marcada como aplicada"
+            else:
+                conexao.execute(sql)
+                acao = "aplicada"
+            conexao.execute(
+                "insert into schema_migrations (versao, arquivo, checksum) values (%s, %s, %s)",
+                (versao, arquivo, checksum),
+            )
+        print(f"v{versao} {arquivo}: {acao}")
+
+
+def _nos_plano(no: dict):
+    yield no
+    for filho in no.get("Plans", []):
+        yield from _nos_plano(filho)
+
+
+def _plano_postgres(conexao, sql: str) -> tuple[list, list]:
+    """(descrição dos nós de leitura, leituras sequenciais de transacoes)"""
+    # Com enable_seqscan desligado o planner só escolhe Seq Scan se nenhum índice servir;
+    # sem isso, em tabelas pequenas ele prefere (corretamente) ler tudo e a checagem não diria nada.
+    with conexao.transaction():
+        conexao.execute("set local enable_seqscan = off")
+        plano = conexao.execute(f"explain (format json) {sql}").fetchone()[0]
+        if isinstance(plano, str):
+            plano = json.loads(plano)
+    leituras, sequenciais = [], []
+    for no in _nos_plano(plano[0]["Plan"]):
+        relacao = no.get("Relation Name")
+        if not relacao:
+            continue
+        indice = no.get("Index Name")
+        leituras.append(f"{no['Node Type']} {relacao}" + (f" ({indice})" if indice else ""))
+        if no["Node Type"] == "Seq Scan" and relacao.startswith("transacoes"):
+            sequenciais.append(relacao)
+    return leituras, sequenciais
+
+
+def _plano_sqlite(conexao, sql: str) -> tuple[list, list]:
+    linhas = [linha[-1] for linha in conexao.execute(f"explain query plan {sql}")]
+    # "SCAN transacoes" sem "USING ... INDEX" é leitura da tabela inteira
+    sequenciais = [linha for linha in linhas if re.match(r"SCAN transacoes\w*$", linha)]
+    return linhas, sequenciais
+
+
+def verificar_planos(conexao, postgres: bool) -> bool:
+    consultas = {**CONSULTAS, **(CONSULTAS_POSTGRES if postgres else CONSULTAS_SQLITE)}
+    ok = True
+    for nome, sql in consultas.items():
+        leituras, sequenciais = (_plano_postgres if postgres else _plano_sqlite)(conexao, sql)
+        ok = ok and not sequenciais
+        print(f"{'OK ' if not sequenciais else 'SEQ'} {nome}")
+        for leitura in leituras:
+            print(f"      {leitura}")
+    print("Todas as consultas usam índices." if ok else "Há consultas lendo a tabela inteira.")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrações do schema e verificação de planos")
+    parser.add_argument("--status", action="store_true", help="lista as migrações e se já foram aplicadas")
+    parser.add_argument("--ate", type=int, help="aplica só até esta versão")
+    parser.add_argument("--baseline", type=int, help="registra v1..vN como aplicadas sem rodar (banco montado à mão)")
+    parser.add_argument("--verificar-planos", action="store_true", help="EXPLAIN das consultas da API")
+    args = parser.parse_args()
+
+    if backend_configurado() == "sqlite":
+        db = obter_armazenamento(cache=False)
+        if not args.verificar_planos:
+            print(f"SQLite ({db.caminho}): schema aplicado na abertura, nada a migrar.")
+            return
+        sys.exit(0 if verificar_planos(db._conexao(), postgres=False) else 1)
+
+    with _conectar_postgres() as conexao:
+        if args.verificar_planos:
+            sys.exit(0 if verificar_planos(conexao, postgres=True) else 1)
+        if args.status:
+            status(conexao)
+        else:
+            migrar(conexao, args.ate, args.baseline)
+
+
+if __name__ == "__main__":
+    main()
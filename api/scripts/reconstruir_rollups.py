@@ -0,0 +1,30 @@
+"""
+Reconstrói o rollup mensal (transacoes_mensal) a partir da tabela transacoes.
+Vale para o backend configurado (Supabase ou SQLite local, ver storage.py).
+Use depois de mexer direto no banco com os triggers desligados, ou se os totais do
+dashboard divergirem das transações.
+No Supabase, SUPABASE_KEY precisa ser a chave service_role: a função
+reconstruir_transacoes_mensal não pode ser executada com a chave anon.
+
+Uso:
+    python api/scripts/reconstruir_rollups.py
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from storage import obter_armazenamento
+
+
+def main():
+    db = obter_armazenamento()
+    if not db.conectado:
+        sys.exit("Banco não configurado: defina SUPABASE_URL e SUPABASE_KEY, ou STORAGE_BACKEND=sqlite.")
+    grupos = db.rebuild_rollups()
+    print(f"Rollup mensal reconstruído: {grupos} grupos (mês, categoria, tipo).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+-- Schema do backend SQLite local (api/sqlite_storage.py).
+-- Espelha supabase_schema.sql + v2..v9: mesmas tabelas, colunas, índices e rollup mensal.
+-- Aplicado automaticamente na abertura do banco (idempotente).
+
+-- UUID v4 em texto, no mesmo formato do gen_random_uuid() do Postgres
+create table if not exists transacoes (
+  id text primary key default (lower(
+    hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' ||
+    substr('89ab', 1 + (abs(random()) % 4), 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6))
+  )),
+  created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+  data text not null,            -- YYYY-MM-DD
+  descricao text not null,
+  valor real not null,
+  categoria text not null,
+  tipo text not null,            -- 'Receita' or 'Despesa'
+  fonte text default 'Manual',   -- 'PDF', 'CSV', 'Manual'
+  user_id text,
+  data_vencimento text,          -- v3
+  impressao text                 -- v4
+);
+
+create unique index if not exists transacoes_impressao_key on transacoes (impressao);
+-- v5: paginação por cursor e filtros mais comuns
+create index if not exists transacoes_data_id_idx on transacoes (data desc, id desc);
+create index if not exists transacoes_categoria_data_idx on transacoes (categoria, data desc, id desc);
+create index if not exists transacoes_tipo_data_idx on transacoes (tipo, data desc, id desc);
+-- v8 (sem particionamento: o SQLite não tem)
+create index if not exists transacoes_user_data_idx on transacoes (user_id, data desc, id desc);
+create index if not exists transacoes_vencimento_idx on transacoes (data_vencimento) where data_vencimento is not null;
+-- inserções desde a última carga do cache de transações
+create index if not exists transacoes_created_at_idx on transacoes (created_at);
+
+-- v2
+create table if not exists categorias (
+  id text primary key default (lower(
+    hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' ||
+    substr('89ab', 1 + (abs(random()) % 4), 1) || substr(hex(randomblob(2)), 2) || '-' || hex(randomblob(6))
+  )),
+  created_at text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+  nome text not null unique,
+  tipo text not null, -- 'Despesa', 'Receita', 'Investimento'
+  user_id text
+);
+
+insert into categorias (nome, tipo) values
+  ('Comida', 'Despesa'),
+  ('Transporte', 'Despesa'),
+  ('Moradia', 'Despesa'),
+  ('Lazer', 'Despesa'),
+  ('Saúde', 'Despesa'),
+  ('Educação', 'Despesa'),
+  ('Investimentos', 'Investimento'),
+  ('Salário', 'Receita'),
+  ('Outros', 'Despesa')
+on conflict (nome) do nothing;
+
+-- v9: correções de categoria do usuário, pela descrição normalizada
+create table if not exists categorias_aprendidas (
+  chave text primary key,
+  categoria text not null,
+  atualizado_em text not null default (strftime('%Y-%m-%dT%H:%M:%fZ', 'now')),
+  user_id text
+);
+
+create index if not exists categorias_aprendidas_atualizado_idx on categorias_aprendidas (atualizado_em);
+
+-- v7: rollup mensal mantido por triggers (aqui por linha; o SQLite não tem transition tables)
+create table if not exists transacoes_mensal (
+  mes text not null,          -- YYYY-MM-01
+  categoria text not null,
+  tipo text not null,
+  soma real not null default 0,
+  soma_abs real not null default 0,
+  quantidade integer not null default 0,
+  primary key (mes, categoria, tipo)
+);
+
+create trigger if not exists transacoes_mensal_insert after insert on transacoes
+begin
+  insert into transacoes_mensal (mes, categoria, tipo, soma, soma_abs, quantidade)
+  values (substr(new.data, 1, 7) || '-01', new.categoria, new.tipo, new.valor, abs(new.valor), 1)
+  on conflict (mes, categoria, tipo) do update
+  set soma = soma + excluded.soma, soma_abs = soma_abs + excluded.soma_abs, quantidade = quantidade + 1;
+end;
+
+create trigger if not exists transacoes_mensal_delete after delete on transacoes
+begin
+  update transacoes_mensal
+  set soma = soma - old.valor, soma_abs = soma_abs - abs(old.valor), quantidade = quantidade - 1
+  where mes = substr(old.data, 1, 7) || '-01' and categoria = old.categoria and tipo = old.tipo;
+  delete from transacoes_mensal
+  where mes = substr(old.data, 1, 7) || '-01' and categoria = old.categoria and tipo = old.tipo and quantidade <= 0;
+end;
+
+create trigger if not exists transacoes_mensal_update after update of data, valor, categoria, tipo on transacoes
+begin
+  update transacoes_mensal
+  set soma = soma - old.valor, soma_abs = soma_abs - abs(old.valor), quantidade = quantidade - 1
+  where mes = substr(old.data, 1, 7) || '-01' and categoria = old.categoria and tipo = old.tipo;
+  delete from transacoes_mensal
+  where mes = substr(old.data, 1, 7) || '-01' and categoria = old.categoria and tipo = old.tipo and quantidade <= 0;
+  insert into transacoes_mensal (mes, categoria, tipo, soma, soma_abs, quantidade)
+  values (substr(new.data, 1, 7) || '-01', new.categoria, new.tipo, new.valor, abs(new.valor), 1)
+  on conflict (mes, categoria, tipo) do update
+  set soma = soma + excluded.soma, soma_abs = soma_abs + excluded.soma_abs, quantidade = quantidade + 1;
+end;
@@ -0,0 +1,35 @@
+-- Impressão digital das transações importadas (data + valor + descrição normalizada + fonte)
+-- Reimportar um extrato que se sobrepõe a um anterior não duplica linhas:
+-- o índice único rejeita as que já existem e o backend só insere as novas.
+-- Transações manuais ficam sem impressão (null não conflita no índice).
+create extension if not exists unaccent;
+
+alter table transacoes
+add column if not exists impressao text;
+
+-- Preenche as linhas já importadas com a mesma fórmula do backend (database.impressao_transacao):
+-- md5("YYYY-MM-DD|valor com 2 casas|descrição sem acento, minúscula, espaços colapsados|fonte|ocorrência")
+-- A ocorrência diferencia lançamentos idênticos legítimos no mesmo dia (ex: dois cafés de R$ 5,00).
+with base as (
+  select
+    id,
+    to_char(data, 'YYYY-MM-DD') || '|' ||
+    to_char(valor, 'FM999999999990.00') || '|' ||
+    lower(regexp_replace(trim(unaccent(descricao)), '\s+', ' ', 'g')) || '|' ||
+    coalesce(fonte, '') as chave,
+    created_at
+  from transacoes
+  where impressao is null and fonte is distinct from 'Manual'
+),
+numeradas as (
+  select id, chave, row_number() over (partition by chave order by created_at, id) as ocorrencia
+  from base
+)
+update transacoes t
+set impressao = md5(n.chave || '|' || n.ocorrencia)
+from numeradas n
+where t.id = n.id;
+
+-- Duplicatas que já existiam recebem ocorrências 2, 3... e continuam na tabela
+
+create unique index if not exists transacoes_impressao_key on transacoes (impressao);
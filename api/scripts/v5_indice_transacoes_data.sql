@@ -0,0 +1,7 @@
+-- Índice da paginação por cursor de /api/transactions (ordem data desc, id desc)
+-- Cada página vira um range scan a partir do cursor, sem OFFSET nem sort da tabela inteira.
+create index if not exists transacoes_data_id_idx on transacoes (data desc, id desc);
+
+-- Filtros mais comuns combinados com a mesma ordem
+create index if not exists transacoes_categoria_data_idx on transacoes (categoria, data desc, id desc);
+create index if not exists transacoes_tipo_data_idx on transacoes (tipo, data desc, id desc);
@@ -0,0 +1,54 @@
+-- Agregações do dashboard no banco: /api/dashboard-charts recebe só as linhas agregadas
+-- em vez da tabela inteira. Equivalente local: api/dashboard.py (agregar_dashboard).
+-- security invoker (padrão): a RLS de transacoes continua valendo.
+create or replace function dashboard_resumo()
+returns json
+language sql
+stable
+as $$
+  with investimentos as (
+    select
+      data,
+      id,
+      -- Aporte (Despesa) soma, resgate subtrai
+      sum(case when tipo = 'Despesa' then abs(valor) else -valor end)
+        over (order by data, id rows between unbounded preceding and current row) as acumulado
+    from transacoes
+    where categoria = 'Investimentos' or tipo = 'Investimento'
+  ),
+  despesas as (
+    select coalesce(nullif(categoria, ''), 'Outros') as categoria, sum(valor) as total
+    from transacoes
+    where tipo = 'Despesa'
+    group by 1
+  ),
+  metricas as (
+    select
+      count(*) as total,
+      coalesce(sum(valor) filter (where tipo = 'Receita' and categoria <> 'Investimentos'), 0) as receitas,
+      coalesce(sum(abs(valor)) filter (where tipo = 'Despesa' and categoria <> 'Investimentos'), 0) as despesas,
+      coalesce(sum(valor) filter (where categoria <> 'Investimentos' and tipo <> 'Investimento'), 0) as saldo
+    from transacoes
+  )
+  select case when m.total = 0 then
+    json_build_object('expenses_by_category', '[]'::json, 'investments_evolution', '[]'::json)
+  else
+    json_build_object(
+      'expenses_by_category', coalesce(
+        (select json_agg(json_build_object('name', categoria, 'value', abs(total)) order by abs(total) desc) from despesas),
+        '[]'::json
+      ),
+      'investments_evolution', coalesce(
+        (select json_agg(json_build_object('data', data, 'valor', acumulado) order by data, id) from investimentos),
+        '[]'::json
+      ),
+      'metrics', json_build_object(
+        'receitas', m.receitas,
+        'despesas', m.despesas,
+        'investido', coalesce((select acumulado from investimentos order by data desc, id desc limit 1), 0),
+        'saldo', m.saldo
+      )
+    )
+  end
+  from metricas m;
+$$;
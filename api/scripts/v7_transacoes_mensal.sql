@@ -0,0 +1,178 @@
+-- Rollup mensal de transacoes por (mês, categoria, tipo), mantido incrementalmente por triggers.
+-- O dashboard passa a ler daqui: o custo cresce com o número de meses, não de transações.
+-- Equivalente local: api/dashboard.py (calcular_rollups / agregar_rollups).
+create table if not exists transacoes_mensal (
+  mes date not null,          -- primeiro dia do mês
+  categoria text not null,
+  tipo text not null,
+  soma numeric not null default 0,      -- sum(valor)
+  soma_abs numeric not null default 0,  -- sum(abs(valor))
+  quantidade integer not null default 0,
+  primary key (mes, categoria, tipo)
+);
+
+alter table transacoes_mensal enable row level security;
+
+drop policy if exists "Enable read for anon" on transacoes_mensal;
+
+create policy "Enable read for anon"
+on transacoes_mensal for select
+to anon
+using (true);
+
+-- Aplica as linhas afetadas por um statement (triggers por statement com transition tables:
+-- um insert de 10 mil transações vira um upsert agrupado por mês, não 10 mil upserts).
+-- Cobre save_transactions, add_manual_transaction, update_transaction, delete_transaction
+-- e delete_all_transactions (e qualquer escrita feita direto no banco).
+create or replace function transacoes_mensal_aplicar()
+returns trigger
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+  if tg_op in ('UPDATE', 'DELETE') then
+    insert into transacoes_mensal as r (mes, categoria, tipo, soma, soma_abs, quantidade)
+    select date_trunc('month', data)::date, categoria, tipo, -sum(valor), -sum(abs(valor)), -count(*)
+    from antigas
+    group by 1, 2, 3
+    on conflict (mes, categoria, tipo) do update
+    set soma = r.soma + excluded.soma,
+        soma_abs = r.soma_abs + excluded.soma_abs,
+        quantidade = r.quantidade + excluded.quantidade;
+  end if;
+
+  if tg_op in ('INSERT', 'UPDATE') then
+    insert into transacoes_mensal as r (mes, categoria, tipo, soma, soma_abs, quantidade)
+    select date_trunc('month', data)::date, categoria, tipo, sum(valor), sum(abs(valor)), count(*)
+    from novas
+    group by 1, 2, 3
+    on conflict (mes, categoria, tipo) do update
+    set soma = r.soma + excluded.soma,
+        soma_abs = r.soma_abs + excluded.soma_abs,
+        quantidade = r.quantidade + excluded.quantidade;
+  end if;
+
+  -- Grupos que ficaram vazios (o rollup tem poucas linhas: meses x categorias x tipos)
+  delete from transacoes_mensal where quantidade = 0;
+  return null;
+end;
+$$;
+
+drop trigger if exists transacoes_mensal_insert on transacoes;
+create trigger transacoes_mensal_insert
+after insert on transacoes
+referencing new table as novas
+for each statement execute function transacoes_mensal_aplicar();
+
+drop trigger if exists transacoes_mensal_update on transacoes;
+create trigger transacoes_mensal_update
+after update on transacoes
+referencing old table as antigas new table as novas
+for each statement execute function transacoes_mensal_aplicar();
+
+drop trigger if exists transacoes_mensal_delete on transacoes;
+create trigger transacoes_mensal_delete
+after delete on transacoes
+referencing old table as antigas
+for each statement execute function transacoes_mensal_aplicar();
+
+-- Reconstrói o rollup a partir de transacoes (carga inicial e correção de divergências).
+-- Bloqueia escritas em transacoes enquanto roda. Retorna quantos grupos foram gravados.
+-- Pelo backend: python api/scripts/reconstruir_rollups.py
+create or replace function reconstruir_transacoes_mensal()
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  grupos integer;
+begin
+  lock table transacoes in share mode;
+  delete from transacoes_mensal;
+  insert into transacoes_mensal (mes, categoria, tipo, soma, soma_abs, quantidade)
+  select date_trunc('month', data)::date, categoria, tipo, sum(valor), sum(abs(valor)), count(*)
+  from transacoes
+  group by 1, 2, 3;
+  get diagnostics grupos = row_count;
+  return grupos;
+end;
+$$;
+
+-- Security definer: fora do alcance do RPC com a chave anon (só service_role)
+revoke execute on function reconstruir_transacoes_mensal() from public, anon, authenticated;
+grant execute on function reconstruir_transacoes_mensal() to service_role;
+
+select reconstruir_transacoes_mensal();
+
+-- Dashboard a partir do rollup, com período opcional (granularidade de mês).
+-- Substitui a versão sem parâmetros de v6_dashboard_resumo.sql.
+-- A evolução dos investimentos passa a ter um ponto por mês; o acumulado considera
+-- também os meses anteriores ao início do período.
+drop function if exists dashboard_resumo();
+
+create or replace function dashboard_resumo(inicio date default null, fim date default null)
+returns json
+language sql
+stable
+as $$
+  with limites as (
+    select date_trunc('month', inicio)::date as mes_inicio, date_trunc('month', fim)::date as mes_fim
+  ),
+  periodo as (
+    select r.*
+    from transacoes_mensal r, limites l
+    where (l.mes_inicio is null or r.mes >= l.mes_inicio)
+      and (l.mes_fim is null or r.mes <= l.mes_fim)
+  ),
+  investimentos as (
+    -- Aporte (Despesa) soma, resgate subtrai
+    select r.mes, sum(case when r.tipo = 'Despesa' then r.soma_abs else -r.soma end) as movimento
+    from transacoes_mensal r, limites l
+    where (r.categoria = 'Investimentos' or r.tipo = 'Investimento')
+      and (l.mes_fim is null or r.mes <= l.mes_fim)
+    group by r.mes
+  ),
+  evolucao as (
+    select e.mes, e.acumulado
+    from (select mes, sum(movimento) over (order by mes) as acumulado from investimentos) e, limites l
+    where l.mes_inicio is null or e.mes >= l.mes_inicio
+  ),
+  despesas as (
+    select coalesce(nullif(categoria, ''), 'Outros') as categoria, sum(soma) as total
+    from periodo
+    where tipo = 'Despesa'
+    group by 1
+  ),
+  metricas as (
+    select
+      count(*) as grupos,
+      coalesce(sum(soma) filter (where tipo = 'Receita' and categoria <> 'Investimentos'), 0) as receitas,
+      coalesce(sum(soma_abs) filter (where tipo = 'Despesa' and categoria <> 'Investimentos'), 0) as despesas,
+      coalesce(sum(soma) filter (where categoria <> 'Investimentos' and tipo <> 'Investimento'), 0) as saldo
+    from periodo
+  )
+  select case when m.grupos = 0 then
+    json_build_object('expenses_by_category', '[]'::json, 'investments_evolution', '[]'::json)
+  else
+    json_build_object(
+      'expenses_by_category', coalesce(
+        (select json_agg(json_build_object('name', categoria, 'value', abs(total)) order by abs(total) desc) from despesas),
+        '[]'::json
+      ),
+      'investments_evolution', coalesce(
+        (select json_agg(json_build_object('data', mes, 'valor', acumulado) order by mes) from evolucao),
+        '[]'::json
+      ),
+      'metrics', json_build_object(
+        'receitas', m.receitas,
+        'despesas', m.despesas,
+        -- Acumulado até o fim do período
+        'investido', coalesce((select sum(movimento) from investimentos), 0),
+        'saldo', m.saldo
+      )
+    )
+  end
+  from metricas m;
+$$;
@@ -0,0 +1,127 @@
+-- Particionamento mensal de transacoes por data (range) e índices compostos dos filtros da API.
+-- Aplicar pelo runner, que registra a versão em schema_migrations:
+--     python api/scripts/migrar.py
+-- Conferir depois que as consultas usam os índices:
+--     python api/scripts/migrar.py --verificar-planos
+--
+-- Em tabela particionada toda chave única precisa conter a coluna de partição:
+--   primary key (id)     -> (id, data)
+--   unique (impressao)   -> (impressao, data)
+-- A impressão digital já embute a data, então a unicidade não muda; o backend faz o
+-- upsert com on_conflict="impressao,data".
+--
+-- Uma partição por mês (transacoes_AAAA_MM) e a partição default transacoes_padrao para
+-- datas fora das já criadas. Filtros por período (dashboard, paginação) só leem as
+-- partições do intervalo.
+
+lock table transacoes in access exclusive mode;
+
+alter table transacoes rename to transacoes_nao_particionada;
+
+create table transacoes (
+  id uuid not null default gen_random_uuid(),
+  created_at timestamp with time zone default timezone('utc'::text, now()) not null,
+  data date not null,
+  descricao text not null,
+  valor numeric not null,
+  categoria text not null,
+  tipo text not null, -- 'Receita' or 'Despesa'
+  fonte text default 'Manual', -- 'PDF', 'CSV', 'Manual'
+  user_id uuid default auth.uid(),
+  data_vencimento date,
+  impressao text
+) partition by range (data);
+
+create table transacoes_padrao partition of transacoes default;
+
+-- Cria as partições mensais que faltam entre dois meses. Linhas desses meses que tenham
+-- caído na partição default são movidas para a partição nova (sem passar pelos triggers
+-- do rollup: os totais não mudam). Retorna quantas partições criou.
+-- Rodar de tempos em tempos para manter meses futuros prontos, por exemplo:
+--     select garantir_particoes_transacoes(current_date, (current_date + interval '24 months')::date);
+create or replace function garantir_particoes_transacoes(de date, ate date)
+returns integer
+language plpgsql
+security definer
+set search_path = public
+as $$
+declare
+  mes date := date_trunc('month', coalesce(de, current_date))::date;
+  proximo date;
+  nome text;
+  criadas integer := 0;
+begin
+  while mes <= ate loop
+    proximo := (mes + interval '1 month')::date;
+    nome := 'transacoes_' || to_char(mes, 'YYYY_MM');
+    if to_regclass(nome) is null then
+      execute format('create table %I (like transacoes including defaults)', nome);
+      execute format(
+        'with movidas as (delete from transacoes_padrao where data >= %L and data < %L returning *) '
+        'insert into %I select * from movidas',
+        mes, proximo, nome
+      );
+      execute format('alter table transacoes attach partition %I for values from (%L) to (%L)', nome, mes, proximo);
+      criadas := criadas + 1;
+    end if;
+    mes := proximo;
+  end loop;
+  return criadas;
+end;
+$$;
+
+-- Security definer (cria e anexa tabelas): fora do alcance do RPC com a chave anon
+revoke execute on function garantir_particoes_transacoes(date, date) from public, anon, authenticated;
+grant execute on function garantir_particoes_transacoes(date, date) to service_role;
+
+select garantir_particoes_transacoes(
+  (select min(data) from transacoes_nao_particionada),
+  (current_date + interval '24 months')::date
+);
+
+insert into transacoes (id, created_at, data, descricao, valor, categoria, tipo, fonte, user_id, data_vencimento, impressao)
+select id, created_at, data, descricao, valor, categoria, tipo, fonte, user_id, data_vencimento, impressao
+from transacoes_nao_particionada;
+
+-- Leva junto os índices, triggers e policies antigos (recriados abaixo na tabela nova)
+drop table transacoes_nao_particionada;
+
+-- Índices criados na tabela mãe valem para todas as partições (e para as futuras)
+alter table transacoes add primary key (id, data);
+create unique index transacoes_impressao_key on transacoes (impressao, data);
+-- Paginação por cursor de /api/transactions (ordem data desc, id desc) e filtros mais comuns
+create index transacoes_data_id_idx on transacoes (data desc, id desc);
+create index transacoes_categoria_data_idx on transacoes (categoria, data desc, id desc);
+create index transacoes_tipo_data_idx on transacoes (tipo, data desc, id desc);
+create index transacoes_user_data_idx on transacoes (user_id, data desc, id desc);
+-- Vencimentos próximos dos investimentos (a maioria das transações não tem vencimento)
+create index transacoes_vencimento_idx on transacoes (data_vencimento) where data_vencimento is not null;
+-- Histórico de categorias aprendidas (mais recentes primeiro)
+create index transacoes_created_at_idx on transacoes (created_at desc);
+
+alter table transacoes enable row level security;
+
+create policy "Enable all for anon"
+on transacoes for all
+to anon
+using (true)
+with check (true);
+
+-- Rollup mensal (v7): triggers por statement na tabela mãe enxergam as linhas de todas as partições
+create trigger transacoes_mensal_insert
+after insert on transacoes
+referencing new table as novas
+for each statement execute function transacoes_mensal_aplicar();
+
+create trigger transacoes_mensal_update
+after update on transacoes
+referencing old table as antigas new table as novas
+for each statement execute function transacoes_mensal_aplicar();
+
+create trigger transacoes_mensal_delete
+after delete on transacoes
+referencing old table as antigas
+for each statement execute function transacoes_mensal_aplicar();
+
+-- PostgREST recarrega o schema (chaves e índices novos)
+notify pgrst, 'reload schema';
@@ -0,0 +1,24 @@
+-- Correções de categoria feitas pelo usuário (PUT /api/transactions/{id} e bulk-update),
+-- pela descrição normalizada (learned_categories.normalizar_descricao, ex: "uber trip").
+-- O índice de categorias aprendidas da API é aquecido só a partir daqui: as categorias que
+-- as palavras-chave atribuíram na importação não passam na frente das regras atuais.
+-- Correções anteriores a esta versão não eram registradas: o índice começa vazio.
+create table if not exists categorias_aprendidas (
+  chave text primary key,
+  categoria text not null,
+  atualizado_em timestamp with time zone default timezone('utc'::text, now()) not null,
+  user_id uuid default auth.uid()
+);
+
+-- Aquecimento: as correções mais recentes primeiro
+create index if not exists categorias_aprendidas_atualizado_idx on categorias_aprendidas (atualizado_em desc);
+
+alter table categorias_aprendidas enable row level security;
+
+create policy "Enable all for anon"
+on categorias_aprendidas for all
+to anon
+using (true)
+with check (true);
+
+notify pgrst, 'reload schema';
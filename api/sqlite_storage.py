@@ -0,0 +1,265 @@
+"""
+Backend de armazenamento em SQLite local (modo WAL), sem rede.
+Mesmo schema dos scripts do Supabase (scripts/sqlite_schema.sql), com os mesmos índices
+e o rollup mensal mantido por triggers. Uma conexão por thread; leituras concorrentes
+não bloqueiam a escrita (WAL).
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date
+from typing import Optional
+
+from dashboard import agregar_rollups
+from storage import COLUNAS_TRANSACAO, StorageBackend, codificar_cursor, decodificar_cursor, preparar_transacoes
+
+SQLITE_PATH = os.environ.get(
+    "SQLITE_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "controle-financeiro.sqlite3"),
+)
+
+_SCHEMA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "sqlite_schema.sql")
+
+# Limite de variáveis por statement em versões antigas do SQLite
+LOTE_IDS = 500
+
+
+class SQLiteStorage(StorageBackend):
+    def __init__(self, caminho: str = SQLITE_PATH):
+        self.caminho = caminho
+        self._local = threading.local()
+        if caminho != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(caminho)), exist_ok=True)
+        with open(_SCHEMA, encoding="utf-8") as f:
+            self._conexao().executescript(f.read())
+
+    @property
+    def conectado(self) -> bool:
+        return True
+
+    def _conexao(self) -> sqlite3.Connection:
+        conexao = getattr(self._local, "conexao", None)
+        if conexao is None:
+            conexao = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+            conexao.row_factory = sqlite3.Row
+            conexao.execute("pragma journal_mode = wal")
+            conexao.execute("pragma synchronous = normal")
+            conexao.execute("pragma busy_timeout = 5000")
+            self._local.conexao = conexao
+        return conexao
+
+    def _consultar(self, sql: str, parametros=()) -> list:
+        return [dict(linha) for linha in self._conexao().execute(sql, parametros)]
+
+    def _transacao(self) -> "_Transacao":
+        """Transação de escrita (commit no fim, rollback em erro)"""
+        return _Transacao(self._conexao())
+
+    # --- TRANSAÇÕES ---
+    def save_transactions(self, transactions: list) -> dict:
+        linhas = preparar_transacoes(transactions)
+        if not linhas:
+            return {"novas": 0, "existentes": 0}
+        with self._transacao() as conexao:
+            # rowcount soma sqlite3_changes() de cada linha: não conta o que os triggers do rollup tocam
+            novas = conexao.executemany(
+                "insert into transacoes (data, descricao, valor, categoria, tipo, fonte, impressao) "
+                "values (:data, :descricao, :valor, :categoria, :tipo, :fonte, :impressao) "
+                "on conflict (impressao) do nothing",
+                linhas,
+            ).rowcount
+        return {"novas": novas, "existentes": len(linhas) - novas}
+
+    def get_transactions_page(self, limite: int = 100, cursor: Optional[str] = None,
+                              data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                              categorias: Optional[list] = None, tipos: Optional[list] = None,
+                              fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                              valor_max: Optional[float] = None, campos: Optional[list] = None,
+                              busca: Optional[str] = None, investimentos: bool = False):
+        colunas = [c for c in dict.fromkeys(campos or COLUNAS_TRANSACAO) if c in COLUNAS_TRANSACAO]
+        selecionadas = list(dict.fromkeys(colunas + ["data", "id"]))
+
+        condicoes, parametros = self._filtros(
+            data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos,
+        )
+        if cursor:
+            ultima_data, ultimo_id = decodificar_cursor(cursor)
+            condicoes.append("(data < ? or (data = ? and id < ?))")
+            parametros.extend([ultima_data, ultima_data, ultimo_id])
+
+        sql = f"select {', '.join(selecionadas)} from transacoes"
+        if condicoes:
+            sql += " where " + " and ".join(condicoes)
+        sql += " order by data desc, id desc limit ?"
+        linhas = self._consultar(sql, parametros + [limite + 1])
+
+        proximo = None
+        if len(linhas) > limite:
+            linhas = linhas[:limite]
+            proximo = codificar_cursor(linhas[-1]["data"], linhas[-1]["id"])
+        if len(selecionadas) != len(colunas):
+            linhas = [{c: linha[c] for c in colunas} for linha in linhas]
+        return linhas, proximo
+
+    def get_transactions_totals(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                                categorias: Optional[list] = None, tipos: Optional[list] = None,
+                                fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                                valor_max: Optional[float] = None, busca: Optional[str] = None,
+                                investimentos: bool = False) -> dict:
+        condicoes, parametros = self._filtros(
+            data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos,
+        )
+        sql = (
+            "select coalesce(sum(case when tipo = 'Receita' then abs(valor) end), 0.0),"
+            " coalesce(sum(case when tipo = 'Despesa' then abs(valor) end), 0.0), count(*) from transacoes"
+        )
+        if condicoes:
+            sql += " where " + " and ".join(condicoes)
+        receitas, despesas, quantidade = self._conexao().execute(sql, parametros).fetchone()
+        return {"receitas": receitas, "despesas": despesas, "saldo": receitas - despesas, "quantidade": quantidade}
+
+    @staticmethod
+    def _filtros(data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, busca, investimentos) -> tuple:
+        """Condições (where) e parâmetros comuns de get_transactions_page e get_transactions_totals"""
+        condicoes, parametros = [], []
+        if data_inicio:
+            condicoes.append("data >= ?")
+            parametros.append(data_inicio.isoformat())
+        if data_fim:
+            condicoes.append("data <= ?")
+            parametros.append(data_fim.isoformat())
+        for coluna, valores in (("categoria", categorias), ("tipo", tipos), ("fonte", fontes)):
+            if valores:
+                condicoes.append(f"{coluna} in ({','.join('?' * len(valores))})")
+                parametros.extend(valores)
+        if valor_min is not None:
+            condicoes.append("valor >= ?")
+            parametros.append(valor_min)
+        if valor_max is not None:
+            condicoes.append("valor <= ?")
+            parametros.append(valor_max)
+        if busca:
+            # like do SQLite já ignora maiúsculas (ASCII); % e _ do termo são literais
+            padrao = "%" + busca.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            condicoes.append("(descricao like ? escape '\\' or categoria like ? escape '\\')")
+            parametros.extend([padrao, padrao])
+        if investimentos:
+            condicoes.append("(categoria = 'Investimentos' or tipo = 'Investimento')")
+        return condicoes, parametros
+
+    def get_transactions(self) -> list:
+        return self._consultar("select * from transacoes order by data desc, id desc")
+
+    def get_transactions_since(self, created_at: str) -> list:
+        return self._consultar(
+            f"select {', '.join(COLUNAS_TRANSACAO)} from transacoes where created_at >= ? order by created_at, id",
+            (created_at,),
+        )
+
+    def get_learned_categories(self, limite: int = 50000) -> list:
+        linhas = self._conexao().execute(
+            "select chave, categoria from categorias_aprendidas order by atualizado_em desc limit ?", (limite,)
+        ).fetchall()
+        return [(chave, categoria) for chave, categoria in reversed(linhas)]
+
+    def save_learned_categories(self, pares: list):
+        with self._transacao() as conexao:
+            conexao.executemany(
+                "insert into categorias_aprendidas (chave, categoria) values (?, ?) "
+                "on conflict (chave) do update set categoria = excluded.categoria, atualizado_em = excluded.atualizado_em",
+                [(chave, categoria) for chave, categoria in pares if categoria],
+            )
+            conexao.executemany(
+                "delete from categorias_aprendidas where chave = ?",
+                [(chave,) for chave, categoria in pares if not categoria],
+            )
+
+    def add_manual_transaction(self, t: dict):
+        with self._transacao() as conexao:
+            conexao.execute(
+                "insert into transacoes (data, descricao, valor, categoria, tipo, fonte, data_vencimento) "
+                "values (?, ?, ?, ?, ?, 'Manual', ?)",
+                (t["data"], t["descricao"], t["valor"], t["categoria"], t["tipo"], t.get("data_vencimento")),
+            )
+
+    def update_transaction(self, id: str, data: dict) -> Optional[list]:
+        return self.bulk_update_transactions([id], data)
+
+    def bulk_update_transactions(self, ids: list, data: dict) -> list:
+        alteracoes = {k: v for k, v in data.items() if k in COLUNAS_TRANSACAO and k not in ("id", "created_at")}
+        if not alteracoes or not ids:
+            return []
+        atribuicoes = ", ".join(f"{coluna} = ?" for coluna in alteracoes)
+        atualizadas = []
+        with self._transacao() as conexao:
+            for i in range(0, len(ids), LOTE_IDS):
+                lote = ids[i:i + LOTE_IDS]
+                cursor = conexao.execute(
+                    f"update transacoes set {atribuicoes} where id in ({','.join('?' * len(lote))}) returning *",
+                    list(alteracoes.values()) + lote,
+                )
+                atualizadas.extend(dict(linha) for linha in cursor.fetchall())
+        return atualizadas
+
+    def delete_transaction(self, id: str):
+        return self.bulk_delete_transactions([id])
+
+    def bulk_delete_transactions(self, ids: list) -> int:
+        removidas = 0
+        with self._transacao() as conexao:
+            for i in range(0, len(ids), LOTE_IDS):
+                lote = ids[i:i + LOTE_IDS]
+                cursor = conexao.execute(f"delete from transacoes where id in ({','.join('?' * len(lote))}) returning id", lote)
+                removidas += len(cursor.fetchall())
+        return removidas
+
+    def delete_all_transactions(self):
+        with self._transacao() as conexao:
+            conexao.execute("delete from transacoes")
+            conexao.execute("delete from transacoes_mensal")
+
+    # --- CATEGORIAS ---
+    def get_categories(self) -> list:
+        return self._consultar("select * from categorias order by created_at, nome")
+
+    def add_category(self, nome: str, tipo: str):
+        with self._transacao() as conexao:
+            conexao.execute("insert into categorias (nome, tipo) values (?, ?)", (nome, tipo))
+
+    def delete_category(self, id: str):
+        with self._transacao() as conexao:
+            conexao.execute("delete from categorias where id = ?", (id,))
+
+    def update_category(self, id: str, nome: str, tipo: str):
+        with self._transacao() as conexao:
+            conexao.execute("update categorias set nome = ?, tipo = ? where id = ?", (nome, tipo, id))
+
+    # --- DASHBOARD ---
+    def get_dashboard_data(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> dict:
+        # Mesma agregação da função dashboard_resumo do Supabase, sobre o rollup mensal
+        return agregar_rollups(self._consultar("select * from transacoes_mensal"), data_inicio, data_fim)
+
+    def rebuild_rollups(self) -> int:
+        with self._transacao() as conexao:
+            conexao.execute("delete from transacoes_mensal")
+            cursor = conexao.execute(
+                "insert into transacoes_mensal (mes, categoria, tipo, soma, soma_abs, quantidade) "
+                "select substr(data, 1, 7) || '-01', categoria, tipo, sum(valor), sum(abs(valor)), count(*) "
+                "from transacoes group by 1, 2, 3"
+            )
+            return cursor.rowcount
+
+
+class _Transacao:
+    def __init__(self, conexao: sqlite3.Connection):
+        self.conexao = conexao
+
+    def __enter__(self) -> sqlite3.Connection:
+        # immediate: pega o lock de escrita já no início (evita deadlock de upgrade de lock)
+        self.conexao.execute("begin immediate")
+        return self.conexao
+
+    def __exit__(self, tipo, valor, traceback):
+        self.conexao.execute("rollback" if tipo else "commit")
+        return False
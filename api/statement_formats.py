@@ -0,0 +1,215 @@
+"""
+Registro de formatos de extrato bancário.
+Cada formato tem sua regex de linha pré-compilada e uma impressão digital barata
+(termos de cabeçalho e/ou quantas linhas do início do documento casam com a regex).
+O formato é escolhido uma vez por documento, olhando só a janela inicial de linhas;
+depois disso cada linha passa por uma única regex, sem cascata. Fatura de cartão não é
+um formato de linha: os termos de fatura só ligam a inversão de sinal no formato escolhido.
+
+Para suportar um banco novo (Itaú, Inter...), basta registrar um formato, como o da
+fatura do Nubank registrado abaixo:
+
+    registrar_formato(FormatoExtrato(
+        "nubank", REGEX_NUBANK, _extrair_nubank, termos_cabecalho=["NU PAGAMENTOS"], fatura=True,
+    ))
+"""
+
+import copy
+import re
+from datetime import datetime
+from typing import Callable, Iterable, Optional
+
+# Termos de cabeçalho/resumo que identificam fatura de cartão de crédito
+TERMOS_FATURA = [
+    "LIMITES DE CRÉDITO", "LIMITE DE CRÉDITO", "LIMITE TOTAL DE CRÉDITO",
+    "RESUMO DA FATURA", "TOTAL DESTA FATURA", "TOTAL DA FATURA",
+    "LANÇAMENTOS: COMPRAS E SAQUES", "COMPRAS E SAQUES", "PAGAMENTO MÍNIMO",
+    "ENCARGOS COBRADOS NESTA FATURA"
+]
+_REGEX_FATURA = re.compile("|".join(re.escape(t) for t in TERMOS_FATURA))
+
+
+class FormatoExtrato:
+    """
+    Formato de extrato.
+
+    Args:
+        nome: Identificador do formato (ex: "neon")
+        padrao_linha: Regex de uma linha de transação
+        extrair: Recebe o match e devolve (data DD/MM/YYYY, descrição, valor) ou None para ignorar a linha
+        termos_cabecalho: Termos (em maiúsculas) que, se presentes no início do documento, identificam o formato
+        fatura: Se True, o sinal dos valores é invertido (compras na fatura viram despesa)
+    """
+
+    def __init__(
+        self,
+        nome: str,
+        padrao_linha: str,
+        extrair: Callable[[re.Match], Optional[tuple]],
+        termos_cabecalho: Iterable[str] = (),
+        fatura: bool = False,
+    ):
+        self.nome = nome
+        self.regex_linha = re.compile(padrao_linha)
+        self.extrair = extrair
+        self.fatura = fatura
+        termos = list(termos_cabecalho)
+        self.regex_cabecalho = re.compile("|".join(re.escape(t) for t in termos)) if termos else None
+
+    def como_fatura(self) -> "FormatoExtrato":
+        """Cópia do formato com a inversão de sinal de fatura de cartão"""
+        if self.fatura:
+            return self
+        fatura = copy.copy(self)
+        fatura.fatura = True
+        return fatura
+
+    def tem_cabecalho(self, texto_upper: str) -> bool:
+        return self.regex_cabecalho is not None and self.regex_cabecalho.search(texto_upper) is not None
+
+    def contar_linhas(self, linhas: Iterable[str]) -> int:
+        buscar = self.regex_linha.search
+        return sum(1 for linha in linhas if buscar(linha))
+
+    def parsear_linha(self, linha: str) -> Optional[tuple]:
+        """Retorna (data, descrição, valor) já com o sinal ajustado, ou None se a linha não for transação."""
+        match = self.regex_linha.search(linha)
+        if not match:
+            return None
+        try:
+            resultado = self.extrair(match)
+        except Exception:
+            return None
+        if resultado is None:
+            return None
+        data_str, descricao, valor = resultado
+        # Se for fatura de cartão, inverte o sinal do valor:
+        # Compras (positivo na fatura) viram débito (-) e pagamentos (negativo) viram crédito (+)
+        if self.fatura:
+            valor = -valor
+        return data_str, descricao, valor
+
+    def __repr__(self):
+        return f"FormatoExtrato({self.nome!r})"
+
+
+def _valor_br(valor_str: str) -> float:
+    """Converte "1.234,56" em 1234.56"""
+    return float(valor_str.replace(' ', '').replace('.', '').replace(',', '.'))
+
+
+def _extrair_neon(match: re.Match) -> Optional[tuple]:
+    descricao = match.group(1).strip()
+    valor = _valor_br(match.group(4))
+    if match.group(3) == '-':
+        valor = -abs(valor)
+    # Linhas de saldo vêm zeradas
+    if valor == 0:
+        return None
+    return match.group(2), descricao, valor
+
+
+_REGEX_DATA_NO_FIM = re.compile(r'\d{2}/\d{2}$')
+
+
+def _ano_provavel(mes: int) -> int:
+    """Ano de uma data sem ano: o corrente, ou o anterior se o mês ainda não chegou"""
+    hoje = datetime.now()
+    return hoje.year - 1 if mes > hoje.month else hoje.year
+
+
+def _extrair_generica(match: re.Match) -> Optional[tuple]:
+    data_str = match.group(1).replace('-', '/')
+    descricao = _REGEX_DATA_NO_FIM.sub('', match.group(2).strip()).strip()
+
+    # Data sem ano (DD/MM)
+    if len(data_str) == 5:
+        data_str = f"{data_str}/{_ano_provavel(int(data_str.split('/')[1]))}"
+
+    return data_str, descricao, _valor_br(match.group(3))
+
+
+_MESES = {mes: i for i, mes in enumerate(
+    ["JAN", "FEV", "MAR", "ABR", "MAI", "JUN", "JUL", "AGO", "SET", "OUT", "NOV", "DEZ"], start=1
+)}
+
+
+def _extrair_nubank(match: re.Match) -> Optional[tuple]:
+    mes = _MESES[match.group(2).upper()]
+    valor = _valor_br(match.group(5))
+    if match.group(4):
+        valor = -valor
+    return f"{match.group(1)}/{mes:02d}/{_ano_provavel(mes)}", match.group(3).strip(), valor
+
+
+# Regex para formato Neon: DESCRIÇÃO DD/MM/YYYY HH:MM [-]R$ VALOR R$ SALDO CARTÃO
+# Exemplo: "TED recebido de TECH4HUMANS... 06/02/2026 07 35 R$ 3.325,89 R$ 3.325,89 -"
+# Exemplo negativo: "PIX enviado para NATALIA... 06/02/2026 10 37 -R$ 3.325,89 R$ 0,00 -"
+REGEX_NEON = r'^(.+?)\s+(\d{2}/\d{2}/\d{4})\s+\d{2}\s*\d{2}\s+(-?)R\$\s*([\d.,]+)\s+R\$\s*[\d.,]+\s+-$'
+
+# Regex genérica (outros bancos): DATA DESCRIÇÃO VALOR
+REGEX_GENERICA = r'(?:^|\s)(\d{2}[/-]\d{2}(?:[/-]\d{2,4})?)\s+(.*?)\s+(?:R\$?\s*)?(-?\s*[\d.]+(?:,\d{2})?)$'
+
+# Regex para a fatura do Nubank: DD MÊS DESCRIÇÃO [-][R$] VALOR (data sem ano, mês abreviado)
+# Exemplo: "12 FEV Uber *Trip 23,45"; pagamento: "05 MAR Pagamento recebido −1.234,56"
+REGEX_NUBANK = (
+    r'^(\d{2}) (?i:(JAN|FEV|MAR|ABR|MAI|JUN|JUL|AGO|SET|OUT|NOV|DEZ))\s+(.+?)\s+'
+    r'([-−])?\s*(?:R\$\s*)?([\d.]+,\d{2})$'
+)
+
+NEON = FormatoExtrato("neon", REGEX_NEON, _extrair_neon)
+# Só pelo cabeçalho (não disputa documentos de outros bancos) e sempre fatura: esse
+# layout de linha só aparece na fatura do cartão, mesmo sem os termos de TERMOS_FATURA na janela
+NUBANK = FormatoExtrato("nubank", REGEX_NUBANK, _extrair_nubank, termos_cabecalho=["NU PAGAMENTOS"], fatura=True)
+GENERICA = FormatoExtrato("generica", REGEX_GENERICA, _extrair_generica)
+
+# Ordem de desempate; a genérica é o fallback quando nada mais se destaca
+_formatos: list[FormatoExtrato] = [NEON, NUBANK]
+
+
+def registrar_formato(formato: FormatoExtrato, antes_de: Optional[str] = None):
+    """Registra um formato (ou substitui o de mesmo nome). antes_de dá prioridade sobre outro formato no desempate."""
+    for i, existente in enumerate(_formatos):
+        if existente.nome == formato.nome:
+            _formatos[i] = formato
+            return
+    posicao = next((i for i, f in enumerate(_formatos) if f.nome == antes_de), len(_formatos))
+    _formatos.insert(posicao, formato)
+
+
+def formatos_registrados() -> list[FormatoExtrato]:
+    return list(_formatos) + [GENERICA]
+
+
+def eh_fatura_cartao(texto_upper: str) -> bool:
+    return _REGEX_FATURA.search(texto_upper) is not None
+
+
+def identificar_formato(linhas: list[str]) -> FormatoExtrato:
+    """
+    Escolhe o formato do documento a partir da janela inicial de linhas.
+    Formatos cujo termo de cabeçalho aparece têm preferência; entre eles (ou, se nenhum
+    cabeçalho aparecer, entre os formatos sem cabeçalho) vence o que casar mais linhas.
+    Se a janela tiver termos de fatura de cartão, o formato escolhido volta com o sinal invertido.
+    """
+    texto_upper = "\n".join(linhas).upper()
+    formato = _formato_de_linha(linhas, texto_upper)
+    return formato.como_fatura() if eh_fatura_cartao(texto_upper) else formato
+
+
+def _formato_de_linha(linhas: list[str], texto_upper: str) -> FormatoExtrato:
+    com_cabecalho = [f for f in _formatos if f.tem_cabecalho(texto_upper)]
+    candidatos = com_cabecalho or [f for f in _formatos if f.regex_cabecalho is None]
+
+    melhor, melhor_contagem = None, 0
+    for formato in candidatos:
+        contagem = formato.contar_linhas(linhas)
+        if contagem > melhor_contagem:
+            melhor, melhor_contagem = formato, contagem
+
+    if melhor is None:
+        # Cabeçalho reconhecido mas nenhuma linha casou ainda: confia no cabeçalho
+        return com_cabecalho[0] if com_cabecalho else GENERICA
+    if not com_cabecalho and melhor_contagem < GENERICA.contar_linhas(linhas):
+        return GENERICA
+    return melhor
@@ -0,0 +1,321 @@
+"""
+Interface de armazenamento de transações e categorias, e a escolha do backend.
+
+Backends:
+    - Supabase (database.DatabaseManager): padrão; sem SUPABASE_URL/SUPABASE_KEY fica
+      desconectado (leituras vazias, escritas recusadas)
+    - SQLite local em modo WAL (sqlite_storage.SQLiteStorage): sem rede, para instalações de um
+      usuário só e para testes. Só com STORAGE_BACKEND=sqlite: grava em disco local, que no
+      deploy serverless é somente leitura ou efêmero.
+"""
+
+import base64
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import date
+from email.utils import formatdate
+from typing import Iterable, Optional
+
+from dotenv import load_dotenv
+
+from categorizer import normalizar_texto
+
+load_dotenv()
+
+# Escritas de outros processos só são vistas pela versão dos dados depois deste intervalo
+VERSAO_DADOS_TTL = float(os.environ.get("VERSAO_DADOS_TTL", "300"))
+# GET condicional (ETag/304) pela versão dos dados: "1" liga, "0" desliga; vazio liga só no SQLite.
+# Só é seguro quando este processo faz todas as escritas (uma instância só da API).
+GET_CONDICIONAL = os.environ.get("GET_CONDICIONAL", "").strip()
+
+# Colunas que podem ser pedidas na projeção de /api/transactions (e alteradas nos updates)
+COLUNAS_TRANSACAO = ("id", "created_at", "data", "descricao", "valor", "categoria", "tipo", "fonte", "data_vencimento")
+
+_ESPACOS = re.compile(r"\s+")
+
+
+def codificar_cursor(data: str, id: str) -> str:
+    """Cursor opaco da paginação por (data, id)"""
+    return base64.urlsafe_b64encode(json.dumps([data, id]).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decodificar_cursor(cursor: str) -> tuple[str, str]:
+    """Valida e decodifica o cursor (os valores entram no filtro do banco). Levanta ValueError se inválido."""
+    try:
+        data, id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return date.fromisoformat(data).isoformat(), str(uuid.UUID(id))
+    except Exception:
+        raise ValueError("Cursor inválido")
+
+
+def data_iso(data: str) -> str:
+    """Converte data DD/MM/YYYY para YYYY-MM-DD (formato do banco)"""
+    parts = data.split('/')
+    if len(parts) == 3:
+        return f"{parts[2]}-{parts[1]}-{parts[0]}"
+    return data
+
+
+def chave_transacao(data_iso: str, valor: float, descricao: str, fonte: str) -> str:
+    """Data + valor + descrição normalizada + fonte (mesma fórmula do backfill em v4_impressao_transacoes.sql)"""
+    descricao_normalizada = _ESPACOS.sub(" ", normalizar_texto(descricao.strip()))
+    return f"{data_iso}|{float(valor):.2f}|{descricao_normalizada}|{fonte or ''}"
+
+
+def impressao_transacao(chave: str, ocorrencia: int = 1) -> str:
+    """
+    Impressão digital de uma transação importada.
+    ocorrencia diferencia lançamentos idênticos no mesmo extrato (o 2º café de R$ 5,00 do dia).
+    """
+    return hashlib.md5(f"{chave}|{ocorrencia}".encode("utf-8")).hexdigest()
+
+
+def preparar_transacoes(transactions: list) -> list:
+    """Linhas prontas para inserir: data em ISO e impressão digital para ignorar as já importadas"""
+    linhas = []
+    ocorrencias = Counter()
+    for t in transactions:
+        iso_date = data_iso(t['data'])
+        chave = chave_transacao(iso_date, t['valor'], t['descricao'], t['fonte'])
+        ocorrencias[chave] += 1
+
+        linhas.append({
+            "data": iso_date,
+            "descricao": t['descricao'],
+            "valor": t['valor'],
+            "categoria": t['categoria'],
+            "tipo": t['tipo'],
+            "fonte": t['fonte'],
+            "impressao": impressao_transacao(chave, ocorrencias[chave])
+        })
+    return linhas
+
+
+def totais_transacoes(linhas: Iterable[dict]) -> dict:
+    """Totais de get_transactions_totals a partir de linhas com tipo e valor"""
+    receitas = despesas = 0.0
+    quantidade = 0
+    for t in linhas:
+        quantidade += 1
+        if t['tipo'] == 'Receita':
+            receitas += abs(float(t['valor']))
+        elif t['tipo'] == 'Despesa':
+            despesas += abs(float(t['valor']))
+    return {"receitas": receitas, "despesas": despesas, "saldo": receitas - despesas, "quantidade": quantidade}
+
+
+class StorageBackend(ABC):
+    """Operações de persistência usadas pela API (extraídas do DatabaseManager original)"""
+
+    @property
+    @abstractmethod
+    def conectado(self) -> bool:
+        """False quando o backend não está configurado (as leituras voltam vazias)"""
+        ...
+
+    # --- TRANSAÇÕES ---
+    @abstractmethod
+    def save_transactions(self, transactions: list) -> dict:
+        """Salva transações importadas, ignorando as já existentes. Retorna {"novas", "existentes"}."""
+        ...
+
+    @abstractmethod
+    def get_transactions_page(self, limite: int = 100, cursor: Optional[str] = None,
+                              data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                              categorias: Optional[list] = None, tipos: Optional[list] = None,
+                              fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                              valor_max: Optional[float] = None, campos: Optional[list] = None,
+                              busca: Optional[str] = None, investimentos: bool = False):
+        """
+        Uma página de transações (data, id decrescentes). Retorna (transações, próximo cursor ou None).
+        busca: trecho da descrição ou da categoria, sem diferenciar maiúsculas.
+        investimentos: só categoria Investimentos ou tipo Investimento.
+        """
+        ...
+
+    @abstractmethod
+    def get_transactions_totals(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+                                categorias: Optional[list] = None, tipos: Optional[list] = None,
+                                fontes: Optional[list] = None, valor_min: Optional[float] = None,
+                                valor_max: Optional[float] = None, busca: Optional[str] = None,
+                                investimentos: bool = False) -> dict:
+        """
+        Totais de todas as transações que passam pelos filtros de get_transactions_page:
+        {"receitas", "despesas", "saldo", "quantidade"} (receitas e despesas em valor absoluto).
+        """
+        ...
+
+    @abstractmethod
+    def get_transactions(self) -> list:
+        """Todas as transações, mais recentes primeiro"""
+        ...
+
+    @abstractmethod
+    def get_transactions_since(self, created_at: str) -> list:
+        """Transações com created_at >= created_at (colunas de COLUNAS_TRANSACAO). Levanta exceção em erro."""
+        ...
+
+    @abstractmethod
+    def get_learned_categories(self, limite: int = 50000) -> list:
+        """
+        Correções de categoria feitas pelo usuário: pares (chave, categoria) da mais antiga para
+        a mais recente (só as últimas `limite`). A chave é learned_categories.normalizar_descricao.
+        """
+        ...
+
+    @abstractmethod
+    def save_learned_categories(self, pares: list):
+        """Grava correções (chave, categoria); categoria None esquece a chave. Levanta exceção em erro."""
+        ...
+
+    @abstractmethod
+    def add_manual_transaction(self, t: dict):
+        ...
+
+    @abstractmethod
+    def update_transaction(self, id: str, data: dict) -> Optional[list]:
+        """Altera uma transação. Retorna as linhas atualizadas (None em caso de erro)."""
+        ...
+
+    @abstractmethod
+    def bulk_update_transactions(self, ids: list, data: dict) -> list:
+        ...
+
+    @abstractmethod
+    def delete_transaction(self, id: str):
+        ...
+
+    @abstractmethod
+    def bulk_delete_transactions(self, ids: list) -> int:
+        ...
+
+    @abstractmethod
+    def delete_all_transactions(self):
+        ...
+
+    # --- CATEGORIAS ---
+    @abstractmethod
+    def get_categories(self) -> list:
+        ...
+
+    @abstractmethod
+    def add_category(self, nome: str, tipo: str):
+        ...
+
+    @abstractmethod
+    def delete_category(self, id: str):
+        ...
+
+    @abstractmethod
+    def update_category(self, id: str, nome: str, tipo: str):
+        ...
+
+    # --- DASHBOARD ---
+    @abstractmethod
+    def get_dashboard_data(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> dict:
+        ...
+
+    @abstractmethod
+    def rebuild_rollups(self) -> int:
+        """Reconstrói o rollup mensal a partir das transações. Retorna quantos grupos gravou."""
+        ...
+
+
+class VersaoDados:
+    """
+    Versão dos dados por tabela ("transacoes", "categorias"), avançada a cada escrita feita
+    por este processo. Vira ETag/Last-Modified dos GETs: se a versão não mudou, a resposta
+    anterior do cliente ainda vale.
+
+    Escritas de outros processos (outras instâncias da API, SQL direto) não passam por aqui;
+    por isso a versão também muda a cada VERSAO_DADOS_TTL segundos, o mesmo atraso
+    da recarga do cache de transações. Com várias instâncias (serverless) uma instância
+    responderia 304 depois de a outra apagar uma linha: ver get_condicional_ativo.
+    """
+
+    def __init__(self, ttl: float = VERSAO_DADOS_TTL):
+        self.ttl = ttl
+        self._instancia = uuid.uuid4().hex[:8]
+        self._contadores: Counter = Counter()
+        self._escritas: dict = {}
+        self._iniciada_em = time.time()
+        self._lock = threading.Lock()
+
+    def avancar(self, tabela: str):
+        with self._lock:
+            self._contadores[tabela] += 1
+            self._escritas[tabela] = time.time()
+
+    def validadores(self, *tabelas: str) -> tuple[str, str]:
+        """(ETag, Last-Modified) da combinação de tabelas"""
+        agora = time.time()
+        epoca = int(agora // self.ttl) if self.ttl > 0 else 0
+        with self._lock:
+            contadores = "-".join(str(self._contadores[t]) for t in tabelas)
+            modificado = max([self._iniciada_em, epoca * self.ttl] + [self._escritas.get(t, 0) for t in tabelas])
+        # Fraca: o mesmo conteúdo pode sair com codificações diferentes
+        return f'W/"{self._instancia}-{contadores}-{epoca}"', formatdate(min(modificado, agora), usegmt=True)
+
+
+_versao_dados = VersaoDados()
+
+
+def obter_versao_dados() -> VersaoDados:
+    """Versão dos dados do processo"""
+    return _versao_dados
+
+
+def get_condicional_ativo() -> bool:
+    """
+    Se os GETs podem responder 304 pela versão dos dados. Por padrão só no SQLite, em que a
+    API é a única escritora do arquivo local; no Supabase as escritas podem chegar por
+    qualquer instância, e a versão de uma não vê as das outras (GET_CONDICIONAL=1 força).
+    """
+    if GET_CONDICIONAL:
+        return GET_CONDICIONAL != "0"
+    return backend_configurado() == "sqlite"
+
+
+_sqlite: Optional[StorageBackend] = None
+_sqlite_lock = threading.Lock()
+
+
+def backend_configurado() -> str:
+    """'supabase' (padrão) ou 'sqlite' (só se pedido explicitamente em STORAGE_BACKEND)"""
+    return os.environ.get("STORAGE_BACKEND", "").strip().lower() or "supabase"
+
+
+def obter_armazenamento(cache: bool = True) -> StorageBackend:
+    """
+    Backend de armazenamento do processo. Com cache=True as escritas avançam a versão dos
+    dados e as leituras de transações saem do cache colunar em memória (transaction_cache.py),
+    se ele estiver ativo.
+    """
+    if not cache:
+        return _backend()
+    from transaction_cache import ArmazenamentoComCache, obter_cache_transacoes
+    return ArmazenamentoComCache(_backend(), obter_cache_transacoes())
+
+
+def _backend() -> StorageBackend:
+    global _sqlite
+    backend = backend_configurado()
+    if backend == "supabase":
+        from database import DatabaseManager
+        # Barato: usa o cliente Supabase compartilhado
+        return DatabaseManager()
+    if backend != "sqlite":
+        raise ValueError(f"STORAGE_BACKEND desconhecido: {backend}")
+    if _sqlite is None:
+        with _sqlite_lock:
+            if _sqlite is None:
+                from sqlite_storage import SQLiteStorage
+                _sqlite = SQLiteStorage()
+    return _sqlite
@@ -0,0 +1,42 @@
+"""
+Testes da API contra o backend SQLite local (sem rede).
+
+As variáveis de ambiente são lidas na importação dos módulos: ficam definidas aqui,
+antes de qualquer import da API, apontando banco, snapshot e cache de parse para
+um diretório temporário.
+"""
+
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix="controle-financeiro-testes-")
+os.environ.update({
+    "STORAGE_BACKEND": "sqlite",
+    "SQLITE_PATH": os.path.join(_TMP, "testes.sqlite3"),
+    "CATEGORIAS_APRENDIDAS_SNAPSHOT": os.path.join(_TMP, "categorias-aprendidas.json.gz"),
+    "PARSE_CACHE_DIR": os.path.join(_TMP, "parse-cache"),
+    "SUPABASE_URL": "",
+    "SUPABASE_KEY": "",
+    "UPLOAD_JOB_STORE": "",
+    "GET_CONDICIONAL": "",
+})
+
+API = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [API, os.path.join(API, "benchmarks")]
+
+import pytest  # noqa: E402
+
+from sqlite_storage import SQLiteStorage  # noqa: E402
+from transaction_cache import ArmazenamentoComCache, CacheTransacoes  # noqa: E402
+
+
+@pytest.fixture(params=["sqlite", "cache"])
+def armazenamento(request, tmp_path):
+    """SQLite direto e SQLite atrás do cache colunar: os dois cumprem o mesmo contrato"""
+    backend = SQLiteStorage(str(tmp_path / "contrato.sqlite3"))
+    if request.param == "sqlite":
+        return backend
+    cache = CacheTransacoes(ttl=3600)
+    cache._carregar(backend)  # primeira carga síncrona: as leituras já saem dos arrays
+    return ArmazenamentoComCache(backend, cache)
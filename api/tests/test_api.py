@@ -0,0 +1,94 @@
+"""Endpoints contra o backend SQLite do processo: GET condicional, totais e categorias aprendidas"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import index
+import storage
+from learned_categories import obter_indice_categorias
+
+CSV = (
+    "Data,Descrição,Valor\n"
+    "05/01/2025,UBER *TRIP 1234,\"-23,50\"\n"
+    "06/01/2025,SUPERMERCADO DIA 88,\"-120,00\"\n"
+    "07/01/2025,APLICACAO CDB BANCO INTER,\"-1000,00\"\n"
+    "08/01/2025,Salário EMPRESA LTDA,\"5000,00\"\n"
+).encode("utf-8")
+
+
+@pytest.fixture
+def cliente():
+    with TestClient(index.app) as cliente:
+        cliente.delete("/api/transactions-all")
+        yield cliente
+        cliente.delete("/api/transactions-all")
+
+
+def _enviar(cliente, conteudo: bytes = CSV, nome: str = "extrato.csv") -> dict:
+    resposta = cliente.post("/api/process-upload", files={"file": (nome, conteudo, "text/csv")})
+    assert resposta.status_code == 200, resposta.text
+    return resposta.json()
+
+
+def test_get_condicional_responde_304_ate_a_proxima_escrita(cliente):
+    _enviar(cliente)
+    primeira = cliente.get("/api/transactions")
+    etag = primeira.headers["etag"]
+
+    repetida = cliente.get("/api/transactions", headers={"If-None-Match": etag})
+    assert repetida.status_code == 304
+    assert repetida.headers["etag"] == etag
+    assert cliente.get("/api/dashboard-charts", headers={"If-None-Match": etag}).status_code == 304
+
+    cliente.post("/api/transactions", json={
+        "data": "2025-01-09", "descricao": "Padaria", "valor": -8.5,
+        "categoria": "Comida", "tipo": "Despesa", "fonte": "Manual",
+    })
+    depois = cliente.get("/api/transactions", headers={"If-None-Match": etag})
+    assert depois.status_code == 200
+    assert depois.headers["etag"] != etag
+    assert len(depois.json()["items"]) == 5
+
+
+def test_get_condicional_desligado(cliente, monkeypatch):
+    monkeypatch.setattr(storage, "GET_CONDICIONAL", "0")
+    resposta = cliente.get("/api/transactions", headers={"If-None-Match": "*"})
+    assert resposta.status_code == 200
+    assert "etag" not in resposta.headers
+
+
+def test_upload_repetido_nao_duplica(cliente):
+    assert _enviar(cliente)["novas"] == 4
+    reenvio = _enviar(cliente)
+    assert (reenvio["novas"], reenvio["existentes"]) == (0, 4)
+
+
+def test_totais_com_os_filtros_da_lista(cliente):
+    _enviar(cliente)
+
+    todos = cliente.get("/api/transactions/totals").json()
+    assert todos == {"receitas": 5000.0, "despesas": 1143.5, "saldo": 3856.5, "quantidade": 4}
+    busca = cliente.get("/api/transactions/totals", params={"busca": "uber"}).json()
+    assert busca == {"receitas": 0.0, "despesas": 23.5, "saldo": -23.5, "quantidade": 1}
+    investimentos = cliente.get("/api/transactions", params={"investimentos": "true"}).json()["items"]
+    assert [t["descricao"] for t in investimentos] == ["APLICACAO CDB BANCO INTER"]
+
+
+def test_correcao_do_usuario_vence_as_palavras_chave(cliente):
+    transacoes = {t["descricao"]: t for t in _enviar(cliente)["transacoes"]}
+    assert transacoes["UBER *TRIP 1234"]["categoria"] == "Transporte"
+    assert transacoes["SUPERMERCADO DIA 88"]["categoria"] == "Comida"
+
+    uber = next(t for t in cliente.get("/api/transactions").json()["items"] if t["descricao"].startswith("UBER"))
+    cliente.put(f"/api/transactions/{uber['id']}", json={"categoria": "Lazer"})
+
+    # Mesmo estabelecimento, outro número de pedido: já vem com a categoria corrigida
+    outro = _enviar(cliente, b"Data,Descricao,Valor\n10/01/2025,UBER *TRIP 9876,\"-31,00\"\n", "outro.csv")
+    assert outro["transacoes"][0]["categoria"] == "Lazer"
+    assert ("uber trip", "Lazer") in index.get_db().get_learned_categories()
+
+    # "A Categorizar" esquece a correção: volta a valer a palavra-chave
+    cliente.put(f"/api/transactions/{uber['id']}", json={"categoria": "A Categorizar"})
+    assert obter_indice_categorias().obter("UBER *TRIP 5555") is None
+    terceiro = _enviar(cliente, b"Data,Descricao,Valor\n11/01/2025,UBER *TRIP 5555,\"-12,00\"\n", "terceiro.csv")
+    assert terceiro["transacoes"][0]["categoria"] == "Transporte"
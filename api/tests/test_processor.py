@@ -0,0 +1,113 @@
+"""Parse e categorização: mesma saída do processador original, pelos caminhos otimizados"""
+
+import json
+import os
+
+import pytest
+
+from bench_categorizer import categorizar_antigo, gerar_descricoes
+from categorizer import CATEGORIA_PADRAO, CATEGORIAS_PADRAO, Categorizador, normalizar_texto
+from learned_categories import IndiceCategorias
+from processor import ProcessadorExtratos, encerrar_pools_pdf
+from statement_formats import GENERICA, NEON, NUBANK, identificar_formato
+from synthetic import gerar_csv, gerar_linhas, gerar_pdf
+
+# Entradas e saída do ProcessadorExtratos do commit inicial (d4248df)
+with open(os.path.join(os.path.dirname(__file__), "dados", "extratos_baseline.json"), encoding="utf-8") as f:
+    BASELINE = json.load(f)["casos"]
+
+
+@pytest.fixture
+def processador():
+    processador = ProcessadorExtratos()
+    processador.indice_categorias = IndiceCategorias(arquivo_snapshot=None)
+    return processador
+
+
+@pytest.mark.parametrize("caso", ["generica", "neon", "fatura"])
+def test_texto_de_pdf_igual_ao_baseline(processador, caso):
+    assert processador.parsear_transacoes_pdf(BASELINE[caso]["texto"]) == BASELINE[caso]["transacoes"]
+
+
+@pytest.mark.parametrize("chunksize", [None, 7, 1])
+def test_csv_vetorizado_igual_ao_baseline(processador, chunksize):
+    csv = BASELINE["csv"]["texto"].encode("utf-8")
+    assert processador.processar_csv(csv, chunksize=chunksize) == BASELINE["csv"]["transacoes"]
+
+
+def test_csv_normaliza_datas_de_outros_formatos(processador):
+    csv = b"Data,Descricao,Valor\n2025-03-04,NETFLIX COM,\"-39,90\"\n05/03/25,Salario,\"100,00\"\nontem,POSTO,\"-1,00\"\nx,y,abc\n"
+    transacoes = processador.processar_csv(csv)
+    assert [t["data"] for t in transacoes] == ["04/03/2025", "05/03/2025", "ontem"]
+    assert [t["tipo"] for t in transacoes] == ["Despesa", "Receita", "Despesa"]
+
+
+@pytest.mark.parametrize("formato", ["generica", "neon", "fatura"])
+def test_pdf_igual_ao_texto(processador, formato):
+    linhas = gerar_linhas(200, formato, seed=11)
+    esperado = processador.parsear_transacoes_pdf("\n".join(linhas))
+    assert processador.processar_pdf(gerar_pdf(linhas)) == esperado
+
+
+def test_extracao_paralela_igual_a_serial():
+    pdf = gerar_pdf(gerar_linhas(45 * 30, "neon", seed=5), 45)
+    try:
+        paralelo = ProcessadorExtratos(workers_pdf=2).processar_pdf(pdf, aprendidas=False)
+    finally:
+        encerrar_pools_pdf()
+    assert paralelo == ProcessadorExtratos(workers_pdf=1).processar_pdf(pdf, aprendidas=False)
+    assert len(paralelo) == 45 * 30
+
+
+def test_categorizador_compilado_igual_a_varredura():
+    usuario = ["Pets", "Assinaturas", "uber"]
+    todas = dict(CATEGORIAS_PADRAO, **{nome: [nome.lower()] for nome in usuario if nome not in CATEGORIAS_PADRAO})
+    categorizador = Categorizador(CATEGORIAS_PADRAO, usuario)
+    descricoes = gerar_descricoes(3000, seed=3) + ["PET SHOP pets feliz", "Assinaturas diversas", "rendimento poupança"]
+    # A varredura antiga não tirava acentos: compara só onde os dois textos coincidem
+    descricoes = [d for d in descricoes if normalizar_texto(d) == d.lower()]
+    assert categorizador.categorize_many(descricoes) == [categorizar_antigo(d, todas) for d in descricoes]
+
+
+def test_prioridade_das_categorias():
+    categorizador = Categorizador(CATEGORIAS_PADRAO, ["Mercado Livre", "Pets"])
+    # Primeira categoria na ordem vence, mesmo com a palavra-chave depois na descrição
+    assert categorizador.categorize("RENDIMENTO SUPERMERCADO") == "Comida"
+    # Palavra sobreposta: "mercado" (Comida) começa dentro de "supermercado"
+    assert categorizador.categorize("APLICACAO supermercado") == "Comida"
+    # Categoria do usuário só depois das padrão
+    assert categorizador.categorize("MERCADO LIVRE compra") == "Comida"
+    assert categorizador.categorize("PETS CENTER") == "Pets"
+    assert categorizador.categorize("PET SHOP") == CATEGORIA_PADRAO
+    assert categorizador.categorize("Farmácia") == "Saúde"
+
+
+def test_categoria_aprendida_antes_das_palavras_chave(processador):
+    assert processador.categorizar_transacao("UBER *TRIP 1234", -10) == "Transporte"
+
+    processador.indice_categorias.aprender("UBER *TRIP 1234", "Lazer")
+
+    assert processador.categorizar_transacao("Uber trip 987", -10) == "Lazer"
+    transacoes = processador.processar_csv(b"Data,Descricao,Valor\n01/01/2025,UBER *TRIP 555,\"-9,90\"\n")
+    assert transacoes[0]["categoria"] == "Lazer"
+    # Sem o índice (aprendidas=False) fica a categorização por palavras-chave
+    assert processador.processar_csv(b"Data,Descricao,Valor\n01/01/2025,UBER *TRIP 555,\"-9,90\"\n",
+                                      aprendidas=False)[0]["categoria"] == "Transporte"
+
+
+def test_identificacao_do_formato():
+    assert identificar_formato(gerar_linhas(30, "neon")) is NEON
+    assert identificar_formato(gerar_linhas(30, "generica")) is GENERICA
+    fatura = identificar_formato(gerar_linhas(30, "fatura"))
+    assert fatura.nome == "generica" and fatura.fatura
+    assert identificar_formato(["NU PAGAMENTOS S.A.", "Fatura de março"]) is NUBANK
+
+
+def test_fatura_nubank(processador):
+    texto = "NU PAGAMENTOS S.A.\nResumo\n12 FEV Uber *Trip 23,45\n05 MAR Pagamento recebido −1.234,56\n"
+    transacoes = processador.parsear_transacoes_pdf(texto)
+    assert [(t["descricao"], t["valor"], t["tipo"]) for t in transacoes] == [
+        ("Uber *Trip", -23.45, "Despesa"),
+        ("Pagamento recebido", 1234.56, "Receita"),
+    ]
+    assert transacoes[0]["data"][:6] == "12/02/"
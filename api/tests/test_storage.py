@@ -0,0 +1,153 @@
+"""Contrato do StorageBackend (SQLite direto e atrás do cache colunar)"""
+
+from datetime import date
+
+import pytest
+
+from dashboard import agregar_dashboard
+
+CATEGORIAS = ["Comida", "Transporte", "Investimentos", "Salário", "A Categorizar"]
+
+
+def _importadas(quantidade: int) -> list:
+    """Transações como saem do ProcessadorExtratos (data DD/MM/YYYY)"""
+    transacoes = []
+    for i in range(quantidade):
+        valor = round((i * 37.5) % 900 - 450, 2) or 10.0
+        transacoes.append({
+            "data": f"{1 + i % 28:02d}/{1 + i % 12:02d}/2025",
+            "descricao": f"COMPRA {'MERCADO' if i % 3 else 'Posto'} {i}",
+            "valor": valor,
+            "categoria": CATEGORIAS[i % len(CATEGORIAS)],
+            "tipo": "Receita" if valor > 0 else "Despesa",
+            "fonte": "CSV",
+        })
+    return transacoes
+
+
+def _todas_paginas(db, limite: int = 100, **filtros) -> list:
+    linhas, cursor = db.get_transactions_page(limite, None, **filtros)
+    while cursor:
+        pagina, cursor = db.get_transactions_page(limite, cursor, **filtros)
+        linhas.extend(pagina)
+    return linhas
+
+
+def test_save_transactions_ignora_as_ja_importadas(armazenamento):
+    transacoes = _importadas(5)
+    # Lançamentos idênticos no mesmo extrato (o 2º café do dia) entram os dois
+    transacoes.append(dict(transacoes[0]))
+
+    assert armazenamento.save_transactions(transacoes) == {"novas": 6, "existentes": 0}
+    assert armazenamento.save_transactions(transacoes) == {"novas": 0, "existentes": 6}
+    assert armazenamento.save_transactions(transacoes + _importadas(7)[5:]) == {"novas": 2, "existentes": 6}
+    assert len(armazenamento.get_transactions()) == 8
+
+
+def test_paginas_seguem_o_cursor_sem_repetir(armazenamento):
+    armazenamento.save_transactions(_importadas(250))
+
+    linhas = _todas_paginas(armazenamento, 70)
+
+    assert len(linhas) == 250
+    assert len({t["id"] for t in linhas}) == 250
+    chaves = [(t["data"], t["id"]) for t in linhas]
+    assert chaves == sorted(chaves, reverse=True)
+    assert linhas == armazenamento.get_transactions_page(1000)[0]
+
+
+def test_ultima_pagina_sem_cursor(armazenamento):
+    armazenamento.save_transactions(_importadas(10))
+    assert armazenamento.get_transactions_page(10)[1] is None
+    assert armazenamento.get_transactions_page(9)[1] is not None
+
+
+@pytest.mark.parametrize("filtros, condicao", [
+    ({"categorias": ["Comida", "Salário"]}, lambda t: t["categoria"] in ("Comida", "Salário")),
+    ({"tipos": ["Receita"]}, lambda t: t["tipo"] == "Receita"),
+    ({"fontes": ["Manual"]}, lambda t: t["fonte"] == "Manual"),
+    ({"data_inicio": date(2025, 3, 1), "data_fim": date(2025, 5, 31)}, lambda t: "2025-03-01" <= t["data"] <= "2025-05-31"),
+    ({"valor_min": -100, "valor_max": 200}, lambda t: -100 <= t["valor"] <= 200),
+    ({"busca": "mercado"}, lambda t: "mercado" in t["descricao"].lower()),
+    ({"busca": "transp"}, lambda t: "transp" in t["categoria"].lower() or "transp" in t["descricao"].lower()),
+    ({"investimentos": True}, lambda t: t["categoria"] == "Investimentos" or t["tipo"] == "Investimento"),
+    ({"busca": "posto", "tipos": ["Despesa"], "data_inicio": date(2025, 6, 1)},
+     lambda t: "posto" in t["descricao"].lower() and t["tipo"] == "Despesa" and t["data"] >= "2025-06-01"),
+])
+def test_filtros_da_pagina_e_totais(armazenamento, filtros, condicao):
+    armazenamento.save_transactions(_importadas(120))
+    armazenamento.add_manual_transaction({
+        "data": "2025-02-10", "descricao": "Tesouro Selic", "valor": -500.0,
+        "categoria": "Outros", "tipo": "Investimento",
+    })
+    esperadas = [t for t in armazenamento.get_transactions() if condicao(t)]
+
+    linhas = _todas_paginas(armazenamento, 25, **filtros)
+
+    assert esperadas
+    assert [t["id"] for t in linhas] == [t["id"] for t in esperadas]
+    totais = armazenamento.get_transactions_totals(**filtros)
+    receitas = sum(abs(t["valor"]) for t in esperadas if t["tipo"] == "Receita")
+    despesas = sum(abs(t["valor"]) for t in esperadas if t["tipo"] == "Despesa")
+    assert totais["quantidade"] == len(esperadas)
+    assert totais["receitas"] == pytest.approx(receitas)
+    assert totais["despesas"] == pytest.approx(despesas)
+    assert totais["saldo"] == pytest.approx(receitas - despesas)
+
+
+def test_campos_projetam_as_colunas(armazenamento):
+    armazenamento.save_transactions(_importadas(30))
+    linhas, cursor = armazenamento.get_transactions_page(10, campos=["descricao", "valor"])
+    assert all(set(t) == {"descricao", "valor"} for t in linhas)
+    # O cursor continua valendo sem data e id na projeção
+    seguinte, _ = armazenamento.get_transactions_page(10, cursor, campos=["descricao", "valor"])
+    assert seguinte == [{"descricao": t["descricao"], "valor": t["valor"]}
+                        for t in armazenamento.get_transactions_page(10, armazenamento.get_transactions_page(10)[1])[0]]
+
+
+def test_cursor_invalido(armazenamento):
+    armazenamento.save_transactions(_importadas(3))
+    with pytest.raises(ValueError):
+        armazenamento.get_transactions_page(10, "nao-e-um-cursor")
+
+
+def test_bulk_update_e_bulk_delete(armazenamento):
+    armazenamento.save_transactions(_importadas(40))
+    ids = [t["id"] for t in armazenamento.get_transactions_page(15, categorias=["Comida"])[0]]
+
+    atualizadas = armazenamento.bulk_update_transactions(ids, {"categoria": "Lazer", "id": "ignorado"})
+
+    assert sorted(t["id"] for t in atualizadas) == sorted(ids)
+    assert all(t["categoria"] == "Lazer" for t in atualizadas)
+    assert sorted(t["id"] for t in _todas_paginas(armazenamento, categorias=["Lazer"])) == sorted(ids)
+    assert not _todas_paginas(armazenamento, categorias=["Comida"])
+    assert armazenamento.bulk_update_transactions([], {"categoria": "Lazer"}) == []
+
+    assert armazenamento.bulk_delete_transactions(ids[:5] + ["id-inexistente"]) == 5
+    restantes = {t["id"] for t in armazenamento.get_transactions()}
+    assert len(restantes) == 35
+    assert not restantes & set(ids[:5])
+
+    armazenamento.delete_all_transactions()
+    assert armazenamento.get_transactions() == []
+    assert armazenamento.get_transactions_page(10) == ([], None)
+
+
+def test_dashboard_pelo_rollup_igual_ao_das_transacoes(armazenamento):
+    armazenamento.save_transactions(_importadas(200))
+    ids = [t["id"] for t in armazenamento.get_transactions()[:20]]
+    armazenamento.bulk_update_transactions(ids, {"categoria": "Investimentos"})
+    armazenamento.bulk_delete_transactions(ids[:7])
+
+    for periodo in [(None, None), (date(2025, 4, 1), date(2025, 9, 30))]:
+        esperado = agregar_dashboard(armazenamento.get_transactions(), *periodo)
+        resultado = armazenamento.get_dashboard_data(*periodo)
+        assert resultado["metrics"] == pytest.approx(esperado["metrics"])
+        assert sorted(c["name"] for c in resultado["expenses_by_category"]) == \
+            sorted(c["name"] for c in esperado["expenses_by_category"])
+
+
+def test_categorias_aprendidas(armazenamento):
+    armazenamento.save_learned_categories([("uber trip", "Transporte"), ("padaria", "Comida")])
+    armazenamento.save_learned_categories([("uber trip", "Lazer"), ("padaria", None)])
+    assert armazenamento.get_learned_categories() == [("uber trip", "Lazer")]
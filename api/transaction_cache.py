@@ -0,0 +1,537 @@
+"""
+Cópia colunar das transações em memória (arrays NumPy), por processo.
+
+Listagem paginada, filtros e o dashboard saem daqui com operações vetorizadas, sem ir
+ao banco a cada requisição. As escritas passam pelo backend e depois atualizam o cache
+(write-through):
+    - inserções: busca só as linhas criadas depois da última carga (created_at)
+    - alterações: as linhas devolvidas pelo update substituem as antigas
+    - remoções: tira os ids
+
+Cada escrita publica um conjunto novo de arrays (os leitores nunca veem um pela metade)
+e incrementa `versao`. Escritas feitas por outros processos aparecem na recarga completa,
+a cada TRANSACOES_CACHE_TTL segundos. As cargas rodam em segundo plano: até a primeira
+terminar as leituras vão ao backend, e depois do TTL seguem saindo dos arrays antigos
+enquanto os novos carregam. Acima de TRANSACOES_CACHE_MAX_MB o cache se desliga até a
+tabela ser esvaziada e as leituras vão direto ao backend; 0 desliga de vez.
+"""
+
+import functools
+import os
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+import numpy as np
+
+from dashboard import agregar_rollups
+from storage import COLUNAS_TRANSACAO, StorageBackend, codificar_cursor, decodificar_cursor, obter_versao_dados
+
+TRANSACOES_CACHE_MAX_MB = float(os.environ.get("TRANSACOES_CACHE_MAX_MB", "64"))
+TRANSACOES_CACHE_TTL = float(os.environ.get("TRANSACOES_CACHE_TTL", "300"))
+# Quanto antes da última created_at carregada as inserções são relidas (commits atrasados)
+TRANSACOES_CACHE_JANELA_S = float(os.environ.get("TRANSACOES_CACHE_JANELA_S", "60"))
+
+# Tamanho das páginas da carga completa (o PostgREST limita cada resposta)
+PAGINA_CARGA = 1000
+
+_INICIO = "1970-01-01T00:00:00.000Z"
+
+_CATEGORICAS = ("categoria", "tipo", "fonte")
+_OBJETOS = ("created_at", "descricao", "data_vencimento")
+
+
+class _Vocabulario:
+    """Texto <-> código inteiro de uma coluna categórica. Só cresce (leitores não precisam de lock)."""
+
+    def __init__(self):
+        self.valores: list = []
+        self._codigos: dict = {}
+
+    def codificar(self, valores: list) -> np.ndarray:
+        codigos = np.empty(len(valores), dtype=np.int32)
+        for i, valor in enumerate(valores):
+            codigo = self._codigos.get(valor)
+            if codigo is None:
+                codigo = self._codigos[valor] = len(self.valores)
+                self.valores.append(valor)
+            codigos[i] = codigo
+        return codigos
+
+    def codigos(self, valores: list) -> np.ndarray:
+        """Códigos de um filtro (valores desconhecidos não casam com nada)"""
+        return np.array([self._codigos.get(v, -1) for v in valores], dtype=np.int32)
+
+
+class CacheTransacoes:
+    def __init__(self, max_bytes: int = int(TRANSACOES_CACHE_MAX_MB * 1024 * 1024), ttl: float = TRANSACOES_CACHE_TTL,
+                 janela: float = TRANSACOES_CACHE_JANELA_S):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.janela = janela
+        self.versao = 0
+        self.excedido = False
+        self._colunas: Optional[dict] = None
+        self._rollups: Optional[list] = None  # rollup de _colunas, calculado na primeira leitura
+        self._carregado_em: Optional[float] = None
+        self._marca: Optional[str] = None  # maior created_at já carregado
+        self._escritas = 0  # escritas aplicadas (ou descartadas) desde o início, para as cargas em segundo plano
+        self._carregando = False
+        self._vocabularios = {coluna: _Vocabulario() for coluna in _CATEGORICAS}
+        self._lock = threading.Lock()
+
+    @property
+    def ativo(self) -> bool:
+        return self.max_bytes > 0
+
+    # --- CARGA ---
+    def colunas(self, backend: StorageBackend) -> Optional[dict]:
+        """
+        Arrays atuais, sem esperar pelo backend: vencido o TTL (ou ainda sem carga), agenda a
+        recarga em segundo plano e devolve o que tem (os arrays antigos, ou None até a primeira
+        carga terminar). None também se o cache não cabe em max_bytes.
+        """
+        if not self.ativo or self.excedido:
+            return None
+        colunas = self._colunas
+        if colunas is None or not self._fresco():
+            self._agendar_carga(backend)
+        return colunas
+
+    def _fresco(self) -> bool:
+        return self._carregado_em is not None and time.monotonic() - self._carregado_em < self.ttl
+
+    def _agendar_carga(self, backend: StorageBackend):
+        with self._lock:
+            if self._carregando or self.excedido:
+                return
+            self._carregando = True
+        threading.Thread(target=self._carregar, args=(backend,), name="cache-transacoes", daemon=True).start()
+
+    def _carregar(self, backend: StorageBackend):
+        """Carga completa, fora do lock. Descartada se alguma escrita chegar ao cache no meio dela."""
+        try:
+            with self._lock:
+                escritas = self._escritas
+            blocos, tamanho, marca, cursor = [], 0, None, None
+            while True:
+                pagina, cursor = backend.get_transactions_page(PAGINA_CARGA, cursor)
+                if pagina:
+                    with self._lock:  # os vocabulários também crescem nas escritas
+                        blocos.append(self._montar(pagina))
+                    tamanho += _tamanho(blocos[-1])
+                    marca = max([marca or ""] + [linha["created_at"] for linha in pagina])
+                if tamanho > self.max_bytes:
+                    # Para de ler já: não vai caber
+                    with self._lock:
+                        self._excedeu()
+                    return
+                if not cursor:
+                    break
+            with self._lock:
+                vazio = self._montar([])
+            colunas = {nome: np.concatenate([vazio[nome]] + [bloco[nome] for bloco in blocos]) for nome in vazio}
+            with self._lock:
+                if self._escritas != escritas:
+                    return  # os arrays lidos já estão velhos: a próxima leitura agenda outra carga
+                self._carregado_em = time.monotonic()
+                self._marca = marca
+                self._publicar(colunas)
+        except Exception as e:
+            print(f"Aviso: cache de transações não carregou ({e})")
+        finally:
+            self._carregando = False
+
+    def _montar(self, linhas: list) -> dict:
+        colunas = {
+            "id": np.array([linha["id"] for linha in linhas], dtype="U36"),
+            "data": np.array([str(linha["data"])[:10] for linha in linhas], dtype="datetime64[D]"),
+            "valor": np.array([linha["valor"] for linha in linhas], dtype=np.float64),
+        }
+        for coluna in _CATEGORICAS:
+            colunas[coluna] = self._vocabularios[coluna].codificar([linha.get(coluna) for linha in linhas])
+        for coluna in _OBJETOS:
+            colunas[coluna] = np.array([linha.get(coluna) for linha in linhas], dtype=object)
+        return colunas
+
+    def _publicar(self, colunas: dict):
+        """Troca os arrays de uma vez (ordenados por data, id decrescentes) e avança a versão"""
+        ordem = np.lexsort((colunas["id"], colunas["data"]))[::-1]
+        colunas = {nome: array[ordem] for nome, array in colunas.items()}
+        if _tamanho(colunas) > self.max_bytes:
+            self._excedeu()
+            return
+        self._colunas = colunas
+        self._rollups = None
+        self.versao += 1
+
+    def _excedeu(self):
+        """
+        Desliga o cache até a tabela ser esvaziada (limpar): recarregar a cada TTL só para
+        descobrir de novo que não cabe custaria a tabela inteira por vez
+        """
+        print(f"Aviso: cache de transações passou de {self.max_bytes / (1024 * 1024):g} MB, desligado")
+        self.excedido = True
+        self._colunas = None
+        self._rollups = None
+        self._carregado_em = None
+        self.versao += 1
+
+    # --- ESCRITAS (depois de confirmadas no backend) ---
+    def inserir_novas(self, backend: StorageBackend, tentativas: int = 3):
+        """
+        Traz as linhas criadas desde a última carga. Relê a janela de `janela` segundos antes
+        da marca (inserções de outras conexões podem confirmar com created_at anterior a ela)
+        e descarta os ids que já estão no cache.
+
+        A consulta ao backend roda fora do lock; se outra escrita chegar ao cache enquanto
+        ela roda, a consulta é refeita (depois de `tentativas`, o cache é invalidado).
+        """
+        for _ in range(tentativas):
+            with self._lock:
+                self._escritas += 1
+                escritas = self._escritas
+                if self._colunas is None:
+                    return
+                # Sem marca a tabela estava vazia: tudo o que existe acabou de entrar
+                desde = _recuar(self._marca, self.janela) if self._marca else _INICIO
+            try:
+                linhas = backend.get_transactions_since(desde)
+            except Exception as e:
+                print(f"Aviso: cache de transações invalidado ({e})")
+                self.invalidar()
+                return
+            with self._lock:
+                if self._colunas is None:
+                    return  # invalidado ou desligado no meio: a próxima carga completa traz tudo
+                if self._escritas != escritas:
+                    continue  # remoção/alteração no meio: as linhas lidas podem estar velhas
+                ja_carregadas = np.isin(np.array([linha["id"] for linha in linhas], dtype="U36"), self._colunas["id"])
+                linhas = [linha for linha, repetida in zip(linhas, ja_carregadas.tolist()) if not repetida]
+                if linhas:
+                    self._marca = max([self._marca or ""] + [linha["created_at"] for linha in linhas])
+                    self._publicar(_concatenar(self._colunas, self._montar(linhas)))
+                return
+        self.invalidar()
+
+    def atualizar(self, linhas: list):
+        """Substitui as linhas alteradas (como o banco as devolveu)"""
+        with self._lock:
+            self._escritas += 1
+            if self._colunas is None or not linhas:
+                return
+            restantes = _sem_ids(self._colunas, [linha["id"] for linha in linhas])
+            self._publicar(_concatenar(restantes, self._montar(linhas)))
+
+    def remover(self, ids: list):
+        with self._lock:
+            self._escritas += 1
+            if self._colunas is not None and ids:
+                self._publicar(_sem_ids(self._colunas, ids))
+
+    def limpar(self):
+        with self._lock:
+            self._escritas += 1
+            self.excedido = False  # tabela vazia: volta a caber
+            self._carregado_em = time.monotonic()
+            self._marca = None
+            self._publicar(self._montar([]))
+
+    def invalidar(self):
+        with self._lock:
+            self._escritas += 1
+            self._invalidar()
+
+    def _invalidar(self):
+        self._carregado_em = None
+        self._colunas = None
+        self._rollups = None
+        self.versao += 1
+
+    # --- LEITURAS ---
+    def pagina(self, colunas: dict, limite: int = 100, cursor: Optional[str] = None,
+               data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+               categorias: Optional[list] = None, tipos: Optional[list] = None,
+               fontes: Optional[list] = None, valor_min: Optional[float] = None,
+               valor_max: Optional[float] = None, campos: Optional[list] = None,
+               busca: Optional[str] = None, investimentos: bool = False):
+        """Mesmo contrato de StorageBackend.get_transactions_page"""
+        mascara = self._mascara(colunas, data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, investimentos)
+        if cursor:
+            ultima_data, ultimo_id = decodificar_cursor(cursor)
+            ultima_data = np.datetime64(ultima_data, "D")
+            mascara &= (colunas["data"] < ultima_data) | ((colunas["data"] == ultima_data) & (colunas["id"] < ultimo_id))
+        if busca:
+            # Texto livre por último: só nas linhas que passaram pelos filtros vetorizados
+            mascara &= self._mascara_busca(colunas, mascara, busca.casefold())
+
+        indices = np.flatnonzero(mascara)[:limite + 1]
+        proximo = None
+        if len(indices) > limite:
+            indices = indices[:limite]
+            ultimo = indices[-1]
+            proximo = codificar_cursor(str(colunas["data"][ultimo]), str(colunas["id"][ultimo]))
+        campos = [c for c in dict.fromkeys(campos or COLUNAS_TRANSACAO) if c in COLUNAS_TRANSACAO]
+        return self._linhas(colunas, indices, campos), proximo
+
+    def totais(self, colunas: dict, data_inicio: Optional[date] = None, data_fim: Optional[date] = None,
+               categorias: Optional[list] = None, tipos: Optional[list] = None,
+               fontes: Optional[list] = None, valor_min: Optional[float] = None,
+               valor_max: Optional[float] = None, busca: Optional[str] = None,
+               investimentos: bool = False) -> dict:
+        """Mesmo contrato de StorageBackend.get_transactions_totals"""
+        mascara = self._mascara(colunas, data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max, investimentos)
+        if busca:
+            mascara &= self._mascara_busca(colunas, mascara, busca.casefold())
+        valores = np.abs(colunas["valor"])
+        receitas = float(valores[mascara & np.isin(colunas["tipo"], self._vocabularios["tipo"].codigos(["Receita"]))].sum())
+        despesas = float(valores[mascara & np.isin(colunas["tipo"], self._vocabularios["tipo"].codigos(["Despesa"]))].sum())
+        return {"receitas": receitas, "despesas": despesas, "saldo": receitas - despesas, "quantidade": int(mascara.sum())}
+
+    def _mascara(self, colunas: dict, data_inicio, data_fim, categorias, tipos, fontes, valor_min, valor_max,
+                 investimentos) -> np.ndarray:
+        """Filtros vetorizados comuns de pagina e totais"""
+        mascara = np.ones(len(colunas["id"]), dtype=bool)
+        if data_inicio:
+            mascara &= colunas["data"] >= np.datetime64(data_inicio, "D")
+        if data_fim:
+            mascara &= colunas["data"] <= np.datetime64(data_fim, "D")
+        for coluna, valores in (("categoria", categorias), ("tipo", tipos), ("fonte", fontes)):
+            if valores:
+                mascara &= np.isin(colunas[coluna], self._vocabularios[coluna].codigos(valores))
+        if valor_min is not None:
+            mascara &= colunas["valor"] >= valor_min
+        if valor_max is not None:
+            mascara &= colunas["valor"] <= valor_max
+        if investimentos:
+            mascara &= (
+                np.isin(colunas["categoria"], self._vocabularios["categoria"].codigos(["Investimentos"]))
+                | np.isin(colunas["tipo"], self._vocabularios["tipo"].codigos(["Investimento"]))
+            )
+        return mascara
+
+    def _mascara_busca(self, colunas: dict, mascara: np.ndarray, termo: str) -> np.ndarray:
+        categorias = [i for i, nome in enumerate(self._vocabularios["categoria"].valores) if termo in (nome or "").casefold()]
+        resultado = np.isin(colunas["categoria"], np.array(categorias, dtype=np.int32))
+        candidatos = np.flatnonzero(mascara & ~resultado)
+        descricoes = colunas["descricao"][candidatos].tolist()
+        resultado[candidatos[[termo in (d or "").casefold() for d in descricoes]]] = True
+        return resultado
+
+    def todas(self, colunas: dict) -> list:
+        return self._linhas(colunas, np.arange(len(colunas["id"])), list(COLUNAS_TRANSACAO))
+
+    def rollups(self, colunas: dict) -> list:
+        """Linhas do rollup mensal (como calcular_rollups), agrupadas com NumPy. Memorizado por versão."""
+        rollups = self._rollups
+        if rollups is not None and colunas is self._colunas:
+            return rollups
+        if not len(colunas["id"]):
+            return []
+        meses = colunas["data"].astype("datetime64[M]")
+        chaves = np.stack([meses.astype(np.int64), colunas["categoria"], colunas["tipo"]], axis=1)
+        grupos, inverso = np.unique(chaves, axis=0, return_inverse=True)
+        inverso = inverso.ravel()
+        somas = np.bincount(inverso, weights=colunas["valor"], minlength=len(grupos))
+        somas_abs = np.bincount(inverso, weights=np.abs(colunas["valor"]), minlength=len(grupos))
+        quantidades = np.bincount(inverso, minlength=len(grupos))
+        categorias, tipos = self._vocabularios["categoria"].valores, self._vocabularios["tipo"].valores
+        rollups = [
+            {"mes": mes, "categoria": categorias[c], "tipo": tipos[t], "soma": soma, "soma_abs": soma_abs, "quantidade": quantidade}
+            for mes, c, t, soma, soma_abs, quantidade in zip(
+                np.datetime_as_string(grupos[:, 0].astype("datetime64[M]"), unit="D").tolist(),
+                grupos[:, 1].tolist(), grupos[:, 2].tolist(),
+                somas.tolist(), somas_abs.tolist(), quantidades.tolist(),
+            )
+        ]
+        with self._lock:
+            if colunas is self._colunas:  # não foi trocado por uma escrita enquanto calculava
+                self._rollups = rollups
+        return rollups
+
+    def _linhas(self, colunas: dict, indices: np.ndarray, campos: list) -> list:
+        valores = []
+        for campo in campos:
+            selecionados = colunas[campo][indices]
+            if campo == "data":
+                valores.append(np.datetime_as_string(selecionados, unit="D").tolist())
+            elif campo in self._vocabularios:
+                vocabulario = self._vocabularios[campo].valores
+                valores.append([vocabulario[c] for c in selecionados.tolist()])
+            else:
+                valores.append(selecionados.tolist())
+        return [dict(zip(campos, linha)) for linha in zip(*valores)]
+
+
+def _concatenar(a: dict, b: dict) -> dict:
+    return {nome: np.concatenate([a[nome], b[nome]]) for nome in b}
+
+
+def _sem_ids(colunas: dict, ids: list) -> dict:
+    manter = ~np.isin(colunas["id"], np.array(ids, dtype="U36"))
+    return {nome: array[manter] for nome, array in colunas.items()}
+
+
+def _recuar(created_at: str, segundos: float) -> str:
+    """created_at (ISO 8601) `segundos` antes, no formato UTC usado pelos dois backends"""
+    try:
+        instante = datetime.fromisoformat(created_at)
+    except ValueError:
+        return created_at
+    if instante.tzinfo is None:
+        instante = instante.replace(tzinfo=timezone.utc)
+    instante = instante.astimezone(timezone.utc) - timedelta(seconds=segundos)
+    return instante.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def _tamanho(colunas: dict) -> int:
+    """Bytes aproximados: arrays + os objetos str apontados pelas colunas de texto livre"""
+    total = sum(array.nbytes for array in colunas.values())
+    for coluna in _OBJETOS:
+        total += sum(sys.getsizeof(valor) for valor in colunas[coluna].tolist() if valor is not None)
+    return total
+
+
+def _escrita(tabela: str):
+    """Avança a versão da tabela depois da escrita (também se ela falhar no meio: pode ter gravado parte)"""
+    def decorador(metodo):
+        @functools.wraps(metodo)
+        def envolvido(self, *args, **kwargs):
+            try:
+                return metodo(self, *args, **kwargs)
+            finally:
+                obter_versao_dados().avancar(tabela)
+        return envolvido
+    return decorador
+
+
+class ArmazenamentoComCache(StorageBackend):
+    """
+    Backend com as leituras de transações servidas pelo cache colunar (quando ativo)
+    e as escritas repassadas, avançando a versão dos dados
+    """
+
+    def __init__(self, backend: StorageBackend, cache: CacheTransacoes):
+        self.backend = backend
+        self.cache = cache
+
+    @property
+    def conectado(self) -> bool:
+        return self.backend.conectado
+
+    def _colunas(self) -> Optional[dict]:
+        return self.cache.colunas(self.backend) if self.backend.conectado else None
+
+    # --- TRANSAÇÕES ---
+    @_escrita("transacoes")
+    def save_transactions(self, transactions: list) -> dict:
+        resultado = self.backend.save_transactions(transactions)
+        if resultado.get("novas"):
+            self.cache.inserir_novas(self.backend)
+        return resultado
+
+    def get_transactions_page(self, *args, **kwargs):
+        colunas = self._colunas()
+        if colunas is None:
+            return self.backend.get_transactions_page(*args, **kwargs)
+        return self.cache.pagina(colunas, *args, **kwargs)
+
+    def get_transactions_totals(self, **filtros) -> dict:
+        colunas = self._colunas()
+        if colunas is None:
+            return self.backend.get_transactions_totals(**filtros)
+        return self.cache.totais(colunas, **filtros)
+
+    def get_transactions(self) -> list:
+        colunas = self._colunas()
+        if colunas is None:
+            return self.backend.get_transactions()
+        return self.cache.todas(colunas)
+
+    def get_transactions_since(self, created_at: str) -> list:
+        return self.backend.get_transactions_since(created_at)
+
+    def get_learned_categories(self, limite: int = 50000) -> list:
+        return self.backend.get_learned_categories(limite)
+
+    def save_learned_categories(self, pares: list):
+        return self.backend.save_learned_categories(pares)
+
+    @_escrita("transacoes")
+    def add_manual_transaction(self, t: dict):
+        resultado = self.backend.add_manual_transaction(t)
+        self.cache.inserir_novas(self.backend)
+        return resultado
+
+    @_escrita("transacoes")
+    def update_transaction(self, id: str, data: dict) -> Optional[list]:
+        linhas = self.backend.update_transaction(id, data)
+        self.cache.atualizar(linhas or [])
+        return linhas
+
+    @_escrita("transacoes")
+    def bulk_update_transactions(self, ids: list, data: dict) -> list:
+        linhas = self.backend.bulk_update_transactions(ids, data)
+        self.cache.atualizar(linhas)
+        return linhas
+
+    @_escrita("transacoes")
+    def delete_transaction(self, id: str):
+        resultado = self.backend.delete_transaction(id)
+        self.cache.remover([id])
+        return resultado
+
+    @_escrita("transacoes")
+    def bulk_delete_transactions(self, ids: list) -> int:
+        removidas = self.backend.bulk_delete_transactions(ids)
+        self.cache.remover(ids)
+        return removidas
+
+    @_escrita("transacoes")
+    def delete_all_transactions(self):
+        resultado = self.backend.delete_all_transactions()
+        self.cache.limpar()
+        return resultado
+
+    # --- CATEGORIAS ---
+    def get_categories(self) -> list:
+        return self.backend.get_categories()
+
+    @_escrita("categorias")
+    def add_category(self, nome: str, tipo: str):
+        return self.backend.add_category(nome, tipo)
+
+    @_escrita("categorias")
+    def delete_category(self, id: str):
+        return self.backend.delete_category(id)
+
+    @_escrita("categorias")
+    def update_category(self, id: str, nome: str, tipo: str):
+        return self.backend.update_category(id, nome, tipo)
+
+    # --- DASHBOARD ---
+    def get_dashboard_data(self, data_inicio: Optional[date] = None, data_fim: Optional[date] = None) -> dict:
+        colunas = self._colunas()
+        if colunas is None:
+            return self.backend.get_dashboard_data(data_inicio, data_fim)
+        return agregar_rollups(self.cache.rollups(colunas), data_inicio, data_fim)
+
+    @_escrita("transacoes")
+    def rebuild_rollups(self) -> int:
+        return self.backend.rebuild_rollups()
+
+
+_cache: Optional[CacheTransacoes] = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache_transacoes() -> CacheTransacoes:
+    """Cache colunar do processo"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CacheTransacoes()
+    return _cache
@@ -0,0 +1,147 @@
+"""
+Exportação de transações em CSV ou Parquet, em streaming.
+
+As linhas saem do backend de armazenamento em páginas (mesma paginação por cursor de
+/api/transactions) e cada página vira bytes assim que chega: a memória usada não depende
+do tamanho da tabela (no Parquet, no máximo um row group de EXPORTACAO_LINHAS_POR_GRUPO linhas).
+
+Parquet é opcional: precisa do pyarrow (pip install pyarrow), que fica fora do
+requirements.txt da API pelo tamanho do pacote (o deploy serverless tem limite). Sem ele
+o formato some da API (formatos_exportacao, /api/health) e só o CSV é aceito.
+"""
+
+import csv
+import io
+import os
+from typing import Iterable, Iterator, Optional
+
+from storage import StorageBackend
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    _pyarrow_disponivel = True
+except ImportError:
+    _pyarrow_disponivel = False
+
+# O PostgREST devolve no máximo 1000 linhas por resposta
+EXPORTACAO_PAGINA = int(os.environ.get("EXPORTACAO_PAGINA", "1000"))
+EXPORTACAO_LINHAS_POR_GRUPO = int(os.environ.get("EXPORTACAO_LINHAS_POR_GRUPO", "50000"))
+
+FORMATOS_EXPORTACAO = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+
+_COLUNAS_DATA = ("data", "data_vencimento")
+
+
+def parquet_disponivel() -> bool:
+    return _pyarrow_disponivel
+
+
+def formatos_exportacao() -> list:
+    """Formatos de FORMATOS_EXPORTACAO que este servidor consegue gerar"""
+    return [formato for formato in FORMATOS_EXPORTACAO if formato != "parquet" or _pyarrow_disponivel]
+
+
+def paginas_transacoes(db: StorageBackend, campos: list, **filtros) -> Iterator[list]:
+    """Páginas de transações (data, id decrescentes) até o fim, com os filtros de get_transactions_page"""
+    cursor = None
+    while True:
+        linhas, cursor = db.get_transactions_page(EXPORTACAO_PAGINA, cursor, campos=campos, **filtros)
+        if linhas:
+            yield linhas
+        if not cursor:
+            return
+
+
+def exportar_csv(paginas: Iterable[list], campos: list) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(campos)
+    for linhas in paginas:
+        escritor.writerows([linha.get(campo) for campo in campos] for linha in linhas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _Saida:
+    """Destino do ParquetWriter que guarda os bytes até o próximo pedaço da resposta"""
+
+    def __init__(self):
+        self._pedacos: list = []
+        self._posicao = 0
+        self.closed = False
+
+    def write(self, dados) -> int:
+        dados = bytes(dados)
+        self._pedacos.append(dados)
+        self._posicao += len(dados)
+        return len(dados)
+
+    def tell(self) -> int:
+        return self._posicao
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drenar(self) -> bytes:
+        dados = b"".join(self._pedacos)
+        self._pedacos.clear()
+        return dados
+
+
+def _esquema_parquet(campos: list):
+    tipos = {
+        "id": pa.string(),
+        "created_at": pa.string(),
+        "data": pa.date32(),
+        "descricao": pa.string(),
+        "valor": pa.float64(),
+        "categoria": pa.string(),
+        "tipo": pa.string(),
+        "fonte": pa.string(),
+        "data_vencimento": pa.date32(),
+    }
+    return pa.schema([(campo, tipos[campo]) for campo in campos])
+
+
+def _tabela_parquet(linhas: list, esquema) -> "pa.Table":
+    colunas = []
+    for campo in esquema:
+        valores = [linha.get(campo.name) for linha in linhas]
+        if campo.name in _COLUNAS_DATA:
+            # "2025-01-31" ou timestamp: só a data
+            colunas.append(pa.array([str(v)[:10] if v else None for v in valores], pa.string()).cast(pa.date32()))
+        else:
+            colunas.append(pa.array(valores, campo.type))
+    return pa.Table.from_arrays(colunas, schema=esquema)
+
+
+def exportar_parquet(paginas: Iterable[list], campos: list,
+                     linhas_por_grupo: int = EXPORTACAO_LINHAS_POR_GRUPO) -> Iterator[bytes]:
+    esquema = _esquema_parquet(campos)
+    saida = _Saida()
+    escritor = pq.ParquetWriter(saida, esquema, compression="zstd")
+    grupo: list = []
+
+    def gravar_grupo() -> Optional[bytes]:
+        escritor.write_table(_tabela_parquet(grupo, esquema), row_group_size=len(grupo))
+        grupo.clear()
+        return saida.drenar()
+
+    for linhas in paginas:
+        grupo.extend(linhas)
+        if len(grupo) >= linhas_por_grupo:
+            yield gravar_grupo()
+    if grupo:
+        yield gravar_grupo()
+    escritor.close()
+    yield saida.drenar()
@@ -0,0 +1,191 @@
+"""
+Fila de jobs de ingestão de extratos.
+O upload só enfileira o arquivo e devolve um id; a extração, o parse e o insert no
+banco rodam num pool de workers fora do event loop, e o progresso (páginas
+processadas, transações encontradas) fica disponível para polling em /api/jobs/{id}.
+
+O armazenamento dos jobs é plugável (JobStore); o backend local guarda tudo em
+memória no próprio processo. Por isso a fila só é ligada com UPLOAD_JOB_STORE=memoria,
+num servidor de processo único e longo (uvicorn). Em serverless (Vercel) o worker congela
+depois da resposta 202 e o polling pode cair em outra instância: sem UPLOAD_JOB_STORE
+o upload continua síncrono (/api/process-upload).
+"""
+
+import os
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from processor import ProcessadorExtratos
+
+# Backend dos jobs: "" (fila desligada, upload síncrono) ou "memoria"
+UPLOAD_JOB_STORE = os.environ.get("UPLOAD_JOB_STORE", "").strip().lower()
+UPLOAD_JOB_WORKERS = int(os.environ.get("UPLOAD_JOB_WORKERS", "2"))
+
+# Jobs finalizados ficam consultáveis por este tempo (segundos)
+JOB_TTL = int(os.environ.get("UPLOAD_JOB_TTL", "3600"))
+
+STATUS_PENDENTE = "pendente"
+STATUS_PROCESSANDO = "processando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_ERRO = "erro"
+
+
+class JobStore(ABC):
+    """Interface de armazenamento dos jobs"""
+
+    @abstractmethod
+    def criar(self, job: dict):
+        ...
+
+    @abstractmethod
+    def atualizar(self, job_id: str, **campos):
+        ...
+
+    @abstractmethod
+    def atualizar_progresso(self, job_id: str, **contadores):
+        ...
+
+    @abstractmethod
+    def obter(self, job_id: str) -> Optional[dict]:
+        ...
+
+
+class MemoryJobStore(JobStore):
+    """Backend local: jobs num dict do processo, com expiração dos finalizados"""
+
+    def __init__(self, ttl: int = JOB_TTL):
+        self.ttl = ttl
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+
+    def criar(self, job: dict):
+        with self._lock:
+            self._expirar()
+            self._jobs[job["id"]] = job
+
+    def atualizar(self, job_id: str, **campos):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.update(campos, atualizado_em=time.time())
+
+    def atualizar_progresso(self, job_id: str, **contadores):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job["progresso"].update(contadores)
+                job["atualizado_em"] = time.time()
+
+    def obter(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # Cópia: o worker continua alterando o original
+            return None if job is None else {**job, "progresso": dict(job["progresso"])}
+
+    def _expirar(self):
+        limite = time.time() - self.ttl
+        expirados = [
+            job_id for job_id, job in self._jobs.items()
+            if job["status"] in (STATUS_CONCLUIDO, STATUS_ERRO) and job["atualizado_em"] < limite
+        ]
+        for job_id in expirados:
+            del self._jobs[job_id]
+
+
+class FilaUploads:
+    def __init__(self, store: JobStore, workers: int = UPLOAD_JOB_WORKERS):
+        self.store = store
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload-job")
+
+    def enfileirar(self, nome_arquivo: str, conteudo: bytes, categorias_usuario: list,
+                   salvar: Optional[Callable[[list], Optional[dict]]] = None) -> str:
+        """
+        Cria o job e agenda o processamento. Retorna o id do job.
+        salvar recebe as transações parseadas e persiste no banco (None para só parsear).
+        """
+        agora = time.time()
+        job_id = uuid.uuid4().hex
+        self.store.criar({
+            "id": job_id,
+            "arquivo": nome_arquivo,
+            "status": STATUS_PENDENTE,
+            "progresso": {"paginas": 0, "total_paginas": None, "transacoes": 0},
+            "resultado": None,
+            "erro": None,
+            "criado_em": agora,
+            "atualizado_em": agora,
+        })
+        self._executor.submit(self._executar, job_id, nome_arquivo, conteudo, categorias_usuario, salvar)
+        return job_id
+
+    def obter(self, job_id: str) -> Optional[dict]:
+        return self.store.obter(job_id)
+
+    def encerrar(self):
+        """Espera os jobs em andamento; os que ainda não começaram são cancelados"""
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _executar(self, job_id, nome_arquivo, conteudo, categorias_usuario, salvar):
+        self.store.atualizar(job_id, status=STATUS_PROCESSANDO)
+        try:
+            processador = ProcessadorExtratos(categorias_usuario)
+            transacoes = processador.processar_arquivo(
+                nome_arquivo, conteudo,
+                progresso=lambda **contadores: self.store.atualizar_progresso(job_id, **contadores),
+            )
+            salvamento = salvar(transacoes) if salvar else None
+            if isinstance(salvamento, dict) and "novas" in salvamento:
+                resumo = f"{len(transacoes)} transações encontradas: {salvamento['novas']} novas, {salvamento['existentes']} já importadas."
+            else:
+                resumo = f"{len(transacoes)} transações encontradas e salvas."
+            self.store.atualizar(
+                job_id,
+                status=STATUS_CONCLUIDO,
+                resultado={
+                    "message": f"Processado com sucesso. {resumo}",
+                    "transacoes": transacoes,
+                    "salvamento": salvamento if isinstance(salvamento, dict) else None,
+                },
+            )
+        except Exception as e:
+            self.store.atualizar(job_id, status=STATUS_ERRO, erro=str(e))
+
+
+_fila: Optional[FilaUploads] = None
+_fila_lock = threading.Lock()
+
+
+def _criar_store() -> Optional[JobStore]:
+    if UPLOAD_JOB_STORE == "memoria":
+        return MemoryJobStore()
+    if UPLOAD_JOB_STORE:
+        print(f"Aviso: UPLOAD_JOB_STORE desconhecido ({UPLOAD_JOB_STORE!r}); fila de uploads desligada")
+    return None
+
+
+def fila_uploads_disponivel() -> bool:
+    return obter_fila_uploads() is not None
+
+
+def obter_fila_uploads() -> Optional[FilaUploads]:
+    """Fila compartilhada pelo processo, ou None se nenhum JobStore estiver configurado"""
+    global _fila
+    if _fila is None and UPLOAD_JOB_STORE:
+        with _fila_lock:
+            if _fila is None:
+                store = _criar_store()
+                if store is not None:
+                    _fila = FilaUploads(store)
+    return _fila
+
+
+def encerrar_fila_uploads():
+    global _fila
+    with _fila_lock:
+        fila, _fila = _fila, None
+    if fila is not None:
+        fila.encerrar()
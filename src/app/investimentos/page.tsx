@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { AlertCircle, Calendar, Pencil, X } from "lucide-react";
 
 interface Transaction {
@@ -16,7 +16,11 @@ interface Transaction {
 export default function InvestmentsPage() {
     const [data, setData] = useState<Transaction[]>([]);
     const [loading, setLoading] = useState(true);
-    const [selectedMonth, setSelectedMonth] = useState("Todos");
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
+    const [selectedMonth, setSelectedMonth] = useState(""); // "YYYY-MM" ou "" (todos)
+    const [totalInvestido, setTotalInvestido] = useState(0);
+    const requestId = useRef(0);
 
     // Form state
     const [formData, setFormData] = useState({
@@ -39,20 +43,53 @@ export default function InvestmentsPage() {
 
     useEffect(() => {
         fetchInvestments();
-    }, []);
+    }, [selectedMonth]);
+
+    // Filtro no servidor (categoria Investimentos ou tipo Investimento), paginado por cursor
+    const filterParams = () => {
+        const params = new URLSearchParams({ investimentos: "true" });
+        if (selectedMonth) {
+            const [ano, mes] = selectedMonth.split("-").map(Number);
+            const ultimoDia = new Date(ano, mes, 0).getDate();
+            params.set("data_inicio", `${selectedMonth}-01`);
+            params.set("data_fim", `${selectedMonth}-${String(ultimoDia).padStart(2, "0")}`);
+        }
+        return params;
+    };
 
-    const fetchInvestments = () => {
+    const fetchInvestments = async () => {
+        // Respostas de filtros antigos que chegarem depois são descartadas
+        const id = ++requestId.current;
         setLoading(true);
-        fetch("/api/transactions")
-            .then((res) => res.json())
-            .then((data) => {
-                const investments = data.filter(
-                    (t: Transaction) => t.categoria === "Investimentos" || t.tipo === "Investimento"
-                );
-                setData(investments);
-                setLoading(false);
-            })
-            .catch(() => setLoading(false));
+        try {
+            const params = filterParams();
+            const [res, resTotais] = await Promise.all([
+                fetch(`/api/transactions?limit=200&${params}`),
+                fetch(`/api/transactions/totals?${params}`),
+            ]);
+            const [page, totais] = await Promise.all([res.json(), resTotais.json()]);
+            if (id !== requestId.current) return;
+            setData(page.items || []);
+            setNextCursor(page.next_cursor || null);
+            // Aporte (Despesa) soma, resgate (Receita) subtrai
+            setTotalInvestido((totais.despesas ?? 0) - (totais.receitas ?? 0));
+        } catch (e) { console.error(e) } finally { if (id === requestId.current) setLoading(false) }
+    };
+
+    const fetchMore = async () => {
+        if (!nextCursor) return;
+        const id = requestId.current;
+        setLoadingMore(true);
+        try {
+            const params = filterParams();
+            params.set("limit", "200");
+            params.set("cursor", nextCursor);
+            const res = await fetch(`/api/transactions?${params}`);
+            const page = await res.json();
+            if (id !== requestId.current) return;
+            setData(prev => [...prev, ...(page.items || [])]);
+            setNextCursor(page.next_cursor || null);
+        } catch (e) { console.error(e) } finally { setLoadingMore(false) }
     };
 
     const handleAdd = async (e: React.FormEvent) => {
@@ -125,42 +162,10 @@ export default function InvestmentsPage() {
         }
     };
 
-    // --- FILTER & CALCULATIONS ---
-
-    // 1. Get Unique Months
-    const availableMonths = Array.from(new Set(data.map(t => {
-        const date = new Date(t.data);
-        const monthYear = date.toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-        return monthYear.charAt(0).toUpperCase() + monthYear.slice(1);
-    }))).sort((a, b) => {
-        // Simple Sort relying on string for now or use finding ref
-        const tA = data.find(t => {
-            const d = new Date(t.data).toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-            return (d.charAt(0).toUpperCase() + d.slice(1)) === a;
-        });
-        const tB = data.find(t => {
-            const d = new Date(t.data).toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-            return (d.charAt(0).toUpperCase() + d.slice(1)) === b;
-        });
-        if (!tA || !tB) return 0;
-        return new Date(tB.data).getTime() - new Date(tA.data).getTime();
-    });
-
-    // 2. Filter Transactions by Month
-    const filteredData = data.filter(t => {
-        if (selectedMonth === "Todos") return true;
-        const date = new Date(t.data);
-        const monthYear = date.toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-        const formatted = monthYear.charAt(0).toUpperCase() + monthYear.slice(1);
-        return formatted === selectedMonth;
-    });
-
-    // 3. Calc Total Invested
-    const totalInvestido = filteredData.reduce((acc, curr) => {
-        return acc + (curr.tipo === 'Despesa' ? Math.abs(curr.valor) : -1 * Math.abs(curr.valor));
-    }, 0);
+    // --- CALCULATIONS ---
+    // Mês e total vêm do servidor (fetchInvestments)
 
-    // 4. Notification Logic (Vencimento Check)
+    // Notification Logic (Vencimento Check)
     const checkApproachingMaturity = (dateStr?: string) => {
         if (!dateStr) return false;
         const today = new Date();
@@ -179,16 +184,14 @@ export default function InvestmentsPage() {
                 <h1 className="text-3xl font-bold text-gray-900 dark:text-white">Investimentos</h1>
 
                 <div className="flex items-center gap-4">
-                    <select
+                    {/* Month Selector (vazio = todos os meses) */}
+                    <input
+                        type="month"
                         value={selectedMonth}
                         onChange={(e) => setSelectedMonth(e.target.value)}
+                        title="Mês (vazio = todos)"
                         className="rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 bg-white dark:bg-gray-700 dark:border-gray-600 dark:text-white p-2"
-                    >
-                        <option value="Todos">Todos os Meses</option>
-                        {availableMonths.map(m => (
-                            <option key={m} value={m}>{m}</option>
-                        ))}
-                    </select>
+                    />
 
                     <div className="bg-green-100 text-green-800 px-4 py-2 rounded-lg font-bold border border-green-200">
                         Total: {totalInvestido.toLocaleString('pt-BR', { style: 'currency', currency: 'BRL' })}
@@ -275,7 +278,7 @@ export default function InvestmentsPage() {
                             </tr>
                         </thead>
                         <tbody className="bg-white dark:bg-gray-800 divide-y divide-gray-200 dark:divide-gray-700">
-                            {filteredData.map((transaction) => {
+                            {data.map((transaction) => {
                                 const isApproaching = checkApproachingMaturity(transaction.data_vencimento);
                                 return (
                                     <tr key={transaction.id} className={isApproaching ? "bg-orange-50 dark:bg-orange-900/10" : ""}>
@@ -311,7 +314,7 @@ export default function InvestmentsPage() {
                                 )
                             })}
 
-                            {filteredData.length === 0 && !loading && (
+                            {data.length === 0 && !loading && (
                                 <tr>
                                     <td colSpan={4} className="px-6 py-4 text-center text-gray-500">Nenhum investimento encontrado para este período.</td>
                                 </tr>
@@ -322,6 +325,18 @@ export default function InvestmentsPage() {
 
             </div>
 
+            {nextCursor && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={fetchMore}
+                        disabled={loadingMore}
+                        className="bg-indigo-600 hover:bg-indigo-800 disabled:opacity-50 text-white px-4 py-2 rounded-md text-sm shadow-md transition"
+                    >
+                        {loadingMore ? "Carregando..." : "Carregar mais"}
+                    </button>
+                </div>
+            )}
+
             {/* Edit Modal */}
             {
                 editingId && (
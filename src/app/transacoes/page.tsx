@@ -1,6 +1,6 @@
 "use client";
 
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import { Search } from "lucide-react";
 
 interface Transaction {
@@ -17,28 +17,101 @@ interface Category {
     nome: string;
 }
 
+interface Totals {
+    receitas: number;
+    despesas: number;
+    saldo: number;
+    quantidade: number;
+}
+
 export default function TransactionsPage() {
     const [transactions, setTransactions] = useState<Transaction[]>([]);
     const [categories, setCategories] = useState<Category[]>([]);
     const [loading, setLoading] = useState(true);
+    const [nextCursor, setNextCursor] = useState<string | null>(null);
+    const [loadingMore, setLoadingMore] = useState(false);
     const [editingId, setEditingId] = useState<string | null>(null);
     const [editCategory, setEditCategory] = useState<string>("");
 
-    // Search & Filter state
+    // Busca e mês vão para o servidor: a lista é paginada e não contém todas as transações
     const [searchTerm, setSearchTerm] = useState("");
-    const [selectedMonth, setSelectedMonth] = useState("Todos");
+    const [debouncedSearch, setDebouncedSearch] = useState("");
+    const [selectedMonth, setSelectedMonth] = useState(""); // "YYYY-MM" ou "" (todos)
+    const [totals, setTotals] = useState<Totals | null>(null);
+    const requestId = useRef(0);
 
     useEffect(() => {
-        fetchData();
         fetchCategories();
     }, []);
 
+    // Espera o usuário parar de digitar antes de consultar
+    useEffect(() => {
+        const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 300);
+        return () => clearTimeout(timer);
+    }, [searchTerm]);
+
+    useEffect(() => {
+        fetchData();
+        fetchTotals();
+    }, [debouncedSearch, selectedMonth]);
+
+    const periodParams = () => {
+        const params = new URLSearchParams();
+        if (selectedMonth) {
+            const [ano, mes] = selectedMonth.split("-").map(Number);
+            const ultimoDia = new Date(ano, mes, 0).getDate();
+            params.set("data_inicio", `${selectedMonth}-01`);
+            params.set("data_fim", `${selectedMonth}-${String(ultimoDia).padStart(2, "0")}`);
+        }
+        return params;
+    };
+
+    const filterParams = () => {
+        const params = periodParams();
+        if (debouncedSearch) params.set("busca", debouncedSearch);
+        return params;
+    };
+
     const fetchData = async () => {
+        // Respostas de filtros antigos que chegarem depois são descartadas
+        const id = ++requestId.current;
+        setLoading(true);
+        try {
+            const params = filterParams();
+            params.set("limit", "200");
+            const res = await fetch(`/api/transactions?${params}`);
+            const data = await res.json();
+            if (id !== requestId.current) return;
+            setTransactions(data.items || []);
+            setNextCursor(data.next_cursor || null);
+        } catch (e) { console.error(e) } finally { if (id === requestId.current) setLoading(false) }
+    };
+
+    const fetchMore = async () => {
+        if (!nextCursor) return;
+        const id = requestId.current;
+        setLoadingMore(true);
+        try {
+            const params = filterParams();
+            params.set("limit", "200");
+            params.set("cursor", nextCursor);
+            const res = await fetch(`/api/transactions?${params}`);
+            const data = await res.json();
+            if (id !== requestId.current) return;
+            setTransactions(prev => [...prev, ...(data.items || [])]);
+            setNextCursor(data.next_cursor || null);
+        } catch (e) { console.error(e) } finally { setLoadingMore(false) }
+    };
+
+    // Totais com os mesmos filtros da lista (todas as transações, não só as páginas carregadas)
+    const fetchTotals = async () => {
+        const id = requestId.current;
         try {
-            const res = await fetch("/api/transactions");
+            const res = await fetch(`/api/transactions/totals?${filterParams()}`);
             const data = await res.json();
-            setTransactions(data || []);
-        } catch (e) { console.error(e) } finally { setLoading(false) }
+            if (id !== requestId.current) return;
+            setTotals(data.quantidade !== undefined ? data : null);
+        } catch (e) { console.error(e) }
     };
 
     const fetchCategories = async () => {
@@ -54,6 +127,7 @@ export default function TransactionsPage() {
         try {
             await fetch(`/api/transactions/${id}`, { method: "DELETE" });
             setTransactions(transactions.filter(t => t.id !== id));
+            fetchTotals();
         } catch (e) { alert("Erro ao excluir") }
     };
 
@@ -65,6 +139,8 @@ export default function TransactionsPage() {
             setLoading(true);
             await fetch("/api/transactions-all", { method: "DELETE" });
             setTransactions([]);
+            setNextCursor(null);
+            setTotals(null);
         } catch (e) {
             alert("Erro ao excluir tudo");
         } finally {
@@ -86,55 +162,16 @@ export default function TransactionsPage() {
             });
             setTransactions(transactions.map(t => t.id === id ? { ...t, categoria: editCategory } : t));
             setEditingId(null);
-            setEditingId(null);
+            fetchTotals(); // A busca também casa com a categoria
         } catch (e) { alert("Erro ao salvar") }
     };
 
-    // --- Search & Grouping Logic ---
-
-    // 1. Get Unique Months for Selector
-    const availableMonths = Array.from(new Set(transactions.map(t => {
-        const date = new Date(t.data);
-        const monthYear = date.toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-        return monthYear.charAt(0).toUpperCase() + monthYear.slice(1);
-    }))).sort((a, b) => {
-        const tA = transactions.find(t => {
-            const d = new Date(t.data).toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-            return (d.charAt(0).toUpperCase() + d.slice(1)) === a;
-        });
-        const tB = transactions.find(t => {
-            const d = new Date(t.data).toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-            return (d.charAt(0).toUpperCase() + d.slice(1)) === b;
-        });
-        if (!tA || !tB) return 0;
-        return new Date(tB.data).getTime() - new Date(tA.data).getTime();
-    });
-
-    // 2. Filter
-    const filteredTransactions = transactions.filter(t => {
-        const searchLower = searchTerm.toLowerCase();
-        const matchesSearch = (
-            t.descricao.toLowerCase().includes(searchLower) ||
-            (t.categoria || "").toLowerCase().includes(searchLower) ||
-            t.data.includes(searchLower) ||
-            t.valor.toString().includes(searchLower)
-        );
-
-        let matchesMonth = true;
-        if (selectedMonth !== "Todos") {
-            const date = new Date(t.data);
-            const monthYear = date.toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
-            const formatted = monthYear.charAt(0).toUpperCase() + monthYear.slice(1);
-            if (formatted !== selectedMonth) matchesMonth = false;
-        }
-
-        return matchesSearch && matchesMonth;
-    });
+    // --- Grouping Logic ---
 
-    // 3. Group by Month
+    // Group by Month
     const groupedTransactions: Record<string, Transaction[]> = {};
 
-    filteredTransactions.forEach(t => {
+    transactions.forEach(t => {
         const date = new Date(t.data);
         const monthYear = date.toLocaleDateString("pt-BR", { month: "long", year: "numeric" });
         const formattedGroup = monthYear.charAt(0).toUpperCase() + monthYear.slice(1);
@@ -151,38 +188,31 @@ export default function TransactionsPage() {
         return dateB.getTime() - dateA.getTime(); // Descending
     });
 
-    // --- Totals Calculation ---
-    const totalReceitas = filteredTransactions
-        .filter(t => t.tipo === 'Receita')
-        .reduce((acc, t) => acc + Math.abs(Number(t.valor)), 0);
-
-    const totalDespesas = filteredTransactions
-        .filter(t => t.tipo === 'Despesa')
-        .reduce((acc, t) => acc + Math.abs(Number(t.valor)), 0);
-
-    const saldo = totalReceitas - totalDespesas;
+    // --- Totals (servidor, mesmos filtros da lista) ---
+    const totalReceitas = totals?.receitas ?? 0;
+    const totalDespesas = totals?.despesas ?? 0;
+    const saldo = totals?.saldo ?? 0;
 
     return (
         <div className="space-y-6">
             <div className="flex flex-col md:flex-row justify-between items-center gap-4">
                 <div>
                     <h1 className="text-3xl font-bold text-gray-900 dark:text-white">Gerenciar Transações</h1>
-                    <span className="text-gray-500 text-sm">{filteredTransactions.length} registros exibidos</span>
+                    <span className="text-gray-500 text-sm">
+                        {transactions.length} de {totals?.quantidade ?? transactions.length} registros carregados
+                    </span>
                 </div>
 
                 <div className="flex flex-col md:flex-row gap-4 w-full md:w-auto items-center">
 
-                    {/* Month Selector */}
-                    <select
+                    {/* Month Selector (vazio = todos os meses) */}
+                    <input
+                        type="month"
                         value={selectedMonth}
                         onChange={(e) => setSelectedMonth(e.target.value)}
+                        title="Mês (vazio = todos)"
                         className="block w-full md:w-48 rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 bg-white dark:bg-gray-700 dark:border-gray-600 dark:text-white p-2"
-                    >
-                        <option value="Todos">Todos os Meses</option>
-                        {availableMonths.map(m => (
-                            <option key={m} value={m}>{m}</option>
-                        ))}
-                    </select>
+                    />
 
                     {/* Search Input */}
                     <div className="relative flex-1 md:w-64 w-full">
@@ -191,13 +221,21 @@ export default function TransactionsPage() {
                         </div>
                         <input
                             type="text"
-                            placeholder="Buscar..."
+                            placeholder="Buscar descrição ou categoria..."
                             value={searchTerm}
                             onChange={(e) => setSearchTerm(e.target.value)}
                             className="pl-10 block w-full rounded-md border-gray-300 shadow-sm focus:border-indigo-500 focus:ring-indigo-500 bg-white dark:bg-gray-700 dark:border-gray-600 dark:text-white p-2"
                         />
                     </div>
 
+                    <a
+                        href={`/api/transactions/export?format=csv&${filterParams()}`}
+                        className="bg-indigo-600 hover:bg-indigo-800 text-white px-4 py-2 rounded-md font-bold text-sm shadow-md transition whitespace-nowrap hidden md:block"
+                        title="Exportar as transações filtradas (CSV)"
+                    >
+                        ⬇️ CSV
+                    </a>
+
                     <button
                         onClick={handleDeleteAll}
                         className="bg-red-600 hover:bg-red-800 text-white px-4 py-2 rounded-md font-bold text-sm shadow-md transition whitespace-nowrap hidden md:block"
@@ -304,7 +342,7 @@ export default function TransactionsPage() {
                             {sortedGroupKeys.length === 0 && !loading && (
                                 <tr>
                                     <td colSpan={5} className="px-6 py-10 text-center text-gray-500">
-                                        {searchTerm ? "Nenhuma transação encontrada com esse filtro." : "Nenhuma transação cadastrada."}
+                                        {debouncedSearch || selectedMonth ? "Nenhuma transação encontrada com esse filtro." : "Nenhuma transação cadastrada."}
                                     </td>
                                 </tr>
                             )}
@@ -312,6 +350,18 @@ export default function TransactionsPage() {
                     </table>
                 </div>
             </div>
+
+            {nextCursor && (
+                <div className="flex justify-center">
+                    <button
+                        onClick={fetchMore}
+                        disabled={loadingMore}
+                        className="bg-indigo-600 hover:bg-indigo-800 disabled:opacity-50 text-white px-4 py-2 rounded-md text-sm shadow-md transition"
+                    >
+                        {loadingMore ? "Carregando..." : "Carregar mais"}
+                    </button>
+                </div>
+            )}
         </div>
     );
 }
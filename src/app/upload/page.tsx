@@ -7,6 +7,7 @@ export default function UploadPage() {
     const [file, setFile] = useState<File | null>(null);
     const [loading, setLoading] = useState(false);
     const [message, setMessage] = useState("");
+    const [progress, setProgress] = useState("");
     const router = useRouter();
 
     const handleFileChange = (e: React.ChangeEvent<HTMLInputElement>) => {
@@ -21,25 +22,78 @@ export default function UploadPage() {
 
         setLoading(true);
         setMessage("");
+        setProgress("");
 
         const formData = new FormData();
         formData.append("file", file);
 
         try {
-            const res = await fetch("/api/process-upload", {
+            // A fila de jobs só existe quando o servidor tem um JobStore configurado;
+            // sem ela (ex: serverless) o upload é síncrono
+            const saude = await fetch("/api/health")
+                .then((r) => (r.ok ? r.json() : {}))
+                .catch(() => ({}));
+
+            if (!saude.uploadJobs) {
+                const res = await fetch("/api/process-upload", {
+                    method: "POST",
+                    body: formData,
+                });
+                const data = await res.json();
+
+                if (res.ok) {
+                    setMessage("✅ " + data.message);
+                    setTimeout(() => {
+                        router.push("/");
+                    }, 2000);
+                } else {
+                    setMessage("❌ " + data.detail);
+                }
+                return;
+            }
+
+            const res = await fetch("/api/upload-jobs", {
                 method: "POST",
                 body: formData,
             });
 
             const data = await res.json();
 
-            if (res.ok) {
-                setMessage("✅ " + data.message);
-                setTimeout(() => {
-                    router.push("/");
-                }, 2000);
-            } else {
+            if (!res.ok) {
                 setMessage("❌ " + data.detail);
+                return;
+            }
+
+            // Acompanha o job até terminar
+            while (true) {
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                const jobRes = await fetch(`/api/jobs/${data.job_id}`);
+                const job = await jobRes.json();
+
+                if (!jobRes.ok) {
+                    setMessage("❌ " + job.detail);
+                    return;
+                }
+                if (job.status === "concluido") {
+                    setProgress("");
+                    setMessage("✅ " + job.resultado.message);
+                    setTimeout(() => {
+                        router.push("/");
+                    }, 2000);
+                    return;
+                }
+                if (job.status === "erro") {
+                    setProgress("");
+                    setMessage("❌ " + job.erro);
+                    return;
+                }
+
+                const { paginas, total_paginas, transacoes } = job.progresso;
+                setProgress(
+                    total_paginas
+                        ? `Página ${paginas} de ${total_paginas} · ${transacoes} transações encontradas`
+                        : `${transacoes} transações encontradas`
+                );
             }
         } catch (err) {
             setMessage("Erro ao enviar arquivo.");
@@ -83,6 +137,10 @@ export default function UploadPage() {
                     {loading ? "Processando..." : "Enviar e Processar"}
                 </button>
 
+                {loading && progress && (
+                    <div className="text-sm text-gray-600 text-center">{progress}</div>
+                )}
+
                 {message && (
                     <div className={`p-4 rounded-md ${message.startsWith('✅') ? 'bg-green-50 text-green-700' : 'bg-red-50 text-red-700'}`}>
                         {message}